@@ -27,7 +27,7 @@ def create_app():
     
     # Use SQLite for development if MySQL is not available
     database_url = os.getenv('DATABASE_URL')
-    if database_url and 'mysql' in database_url:
+    if database_url and ('mysql' in database_url or database_url.startswith('sqlite')):
         app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     else:
         # Fallback to SQLite
@@ -36,6 +36,60 @@ def create_app():
     
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # Background job configuration
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))
+    app.config['JOB_QUEUE_SIZE'] = int(os.getenv('JOB_QUEUE_SIZE', 100))
+    app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    app.config['JOB_RETRY_DELAY'] = float(os.getenv('JOB_RETRY_DELAY', 5))
+    app.config['JOB_RUNNER_EAGER'] = os.getenv('JOB_RUNNER_EAGER', 'False').lower() == 'true'
+    app.config['JOB_LEASE_SECONDS'] = int(os.getenv('JOB_LEASE_SECONDS', 600))
+    
+    # Audit log configuration
+    app.config['AUDIT_QUEUE_SIZE'] = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+    app.config['AUDIT_BATCH_SIZE'] = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+    app.config['AUDIT_FLUSH_INTERVAL'] = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+    
+    # Request instrumentation
+    app.config['SQL_INSTRUMENTATION'] = os.getenv('SQL_INSTRUMENTATION', 'True').lower() == 'true'
+    app.config['SERVER_TIMING_HEADER'] = os.getenv('SERVER_TIMING_HEADER', 'True').lower() == 'true'
+    
+    # Slow-query log (disabled unless a threshold is set)
+    slow_query_threshold = os.getenv('SLOW_QUERY_THRESHOLD_MS')
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = float(slow_query_threshold) if slow_query_threshold else None
+    app.config['SLOW_QUERY_LOG_SIZE'] = int(os.getenv('SLOW_QUERY_LOG_SIZE', 100))
+    
+    # Prometheus metrics; set METRICS_MULTIPROC_DIR when running pre-forked workers
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    app.config['METRICS_MULTIPROC_DIR'] = os.getenv('METRICS_MULTIPROC_DIR')
+    app.config['METRICS_FLUSH_INTERVAL'] = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    
+    # Template caching; an empty JINJA_BYTECODE_CACHE_DIR disables the bytecode cache
+    app.config['JINJA_BYTECODE_CACHE_DIR'] = os.getenv('JINJA_BYTECODE_CACHE_DIR',
+                                                       os.path.join(app.instance_path, 'jinja_cache'))
+    app.config['FRAGMENT_CACHE_ENABLED'] = os.getenv('FRAGMENT_CACHE_ENABLED', 'True').lower() == 'true'
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.getenv('FRAGMENT_CACHE_SIZE', 5000))
+    app.config['FRAGMENT_CACHE_TTL'] = int(os.getenv('FRAGMENT_CACHE_TTL', 300))
+    
+    # Stream large list pages instead of rendering them in memory
+    app.config['STREAM_LIST_PAGES'] = os.getenv('STREAM_LIST_PAGES', 'True').lower() == 'true'
+    app.config['STREAM_YIELD_PER'] = int(os.getenv('STREAM_YIELD_PER', 500))
+    app.config['STREAM_BUFFER_SIZE'] = int(os.getenv('STREAM_BUFFER_SIZE', 8192))
+    
+    # Response compression (zstd needs the optional zstandard package)
+    app.config['COMPRESSION_ENABLED'] = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    app.config['COMPRESSION_LEVEL'] = int(os.getenv('COMPRESSION_LEVEL', 6))
+    app.config['COMPRESSION_ZSTD_LEVEL'] = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.getenv('COMPRESSION_MIN_SIZE', 500))
+    
+    # Rows fetched per batch when loading the trends page's columns
+    app.config['ANALYTICS_BATCH_SIZE'] = int(os.getenv('ANALYTICS_BATCH_SIZE', 10000))
+    # Seconds before they are reloaded in full, to pick up other processes' edits
+    app.config['ANALYTICS_MAX_AGE'] = int(os.getenv('ANALYTICS_MAX_AGE', 300))
+    
+    # Seconds before the adopter matching features are reloaded in full
+    app.config['MATCHING_MAX_AGE'] = int(os.getenv('MATCHING_MAX_AGE', 300))
+    
     # Initialize extensions with app
     db.init_app(app)
     login_manager.init_app(app)
@@ -47,7 +101,56 @@ def create_app():
     login_manager.login_message_category = 'info'
     
     # Import models
-    from app.models import User, Pet, Donation, Adoption, MedicalRecord
+    from app.models import (User, Shelter, Pet, Donor, Donation, DonationDailyTotal,
+                            DonationMonthlyTotal, Adoption, MedicalRecord, Vaccination, DueTreatment,
+                            PetStatusChange, PetStayTotal, Job, AuditLog)
+    
+    # Background job runner
+    from app.jobs import job_runner
+    job_runner.init_app(app)
+    
+    # Audit log writer
+    from app.audit import audit_writer
+    audit_writer.init_app(app)
+    
+    # Per-request SQL instrumentation
+    from app.instrumentation import request_profiler, slow_query_log
+    request_profiler.init_app(app)
+    slow_query_log.init_app(app)
+    
+    # Prometheus metrics endpoint
+    from app.metrics import metrics
+    metrics.init_app(app)
+    metrics.gauge('job_queue_depth', 'Background jobs waiting for a worker',
+                  callback=lambda: job_runner.stats()['queue_depth'])
+    metrics.gauge('audit_queue_depth', 'Audit entries waiting to be written',
+                  callback=lambda: audit_writer.stats()['queue_depth'])
+    
+    # Jinja bytecode cache and {% cache %} fragment tag
+    from app.template_cache import fragment_cache
+    fragment_cache.init_app(app)
+    metrics.gauge('fragment_cache_entries', 'Rendered template fragments held in memory',
+                  callback=lambda: fragment_cache.stats()['size'])
+    
+    # gzip/deflate/zstd response compression
+    from app.compression import compression
+    compression.init_app(app)
+    
+    # Denormalized medical summary on pets, normalized vaccinations, the
+    # due-treatment schedule, donation rollups, pet status history, shelter
+    # occupancy and donor links (importing registers their session events),
+    # and the CLI commands that rebuild derived data
+    from app import (medical_summary, vaccinations, due_treatments, donation_rollups,
+                     status_history, shelters, donors, commands)
+    commands.init_app(app)
+    
+    # Columnar cache behind the trends page (NumPy when installed)
+    from app.analytics import analytics
+    analytics.init_app(app)
+    
+    # Feature matrix behind adopter matching (NumPy when installed)
+    from app.matching import matcher
+    matcher.init_app(app)
     
     # User loader for Flask-Login
     @login_manager.user_loader
@@ -58,10 +161,12 @@ def create_app():
     from app.routes_auth import auth_bp
     from app.routes_admin import admin_bp
     from app.routes_employee import employee_bp
+    from app.routes_api import api_bp
     
     app.register_blueprint(auth_bp, url_prefix='/')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(employee_bp, url_prefix='/employee')
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
     
     # Root route
     @app.route('/')
@@ -74,6 +179,7 @@ def create_app():
         try:
             db.create_all()
             print("✅ Database tables created successfully")
+            job_runner.recover(app)
         except Exception as e:
             print(f"⚠️  Database setup warning: {e}")
     
@@ -0,0 +1,375 @@
+"""
+In-memory analytics for the trends page
+
+Donation amounts and dates, pet intake dates, breeds and ages, and
+adoption dates are held as typed columns (one per field, one array per
+column) instead of ORM objects. Each table is loaded once with a single
+streamed query; later refreshes only fetch rows with a higher id and
+append them. Updates and deletes to rows already loaded (caught by the
+session events below) mark the table for a full reload instead, and every
+table is reloaded once it is ANALYTICS_MAX_AGE seconds old, so edits made
+by other processes or through Core show up too. Queries run without the
+lock: a reload builds new columns and swaps them in.
+
+Statistics are computed vectorized with NumPy (in requirements.txt), and
+with plain Python over the same columns when it is missing.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Pet, Donation, Adoption
+
+try:
+    import numpy as np
+except ImportError:  # optional
+    np = None
+
+PERCENTILES = (25, 50, 75, 90, 99)
+
+# Lower bounds, in years, of the age bands
+AGE_BANDS = ((0, 'Under 1'), (1, '1-2'), (3, '3-6'), (7, '7-10'), (11, '11+'))
+
+# Lower bounds, in days, of the length-of-stay histogram buckets
+STAY_BUCKETS = ((0, '0-7 days'), (8, '8-30 days'), (31, '31-90 days'),
+                (91, '91-180 days'), (181, '181-365 days'), (366, 'Over a year'))
+
+_DTYPES = {'q': 'int64', 'i': 'int32', 'd': 'float64'}
+
+def age_band(age):
+    """Label of the AGE_BANDS band an age in years falls in"""
+    return AGE_BANDS[bisect_right([lower for lower, _ in AGE_BANDS], age or 0) - 1][1]
+
+def _day(value):
+    """Day number (proleptic ordinal) of a date or datetime, 0 when missing"""
+    return value.toordinal() if value is not None else 0
+
+class ColumnStore:
+    """Typed, append-only columns of one table, in id order"""
+
+    def __init__(self, name, typecodes):
+        self.name = name
+        self.typecodes = typecodes
+        self.clear()
+
+    def clear(self):
+        self.columns = {column: array(code) for column, code in self.typecodes.items()}
+        self.categories = {}
+        self.last_id = 0
+        self.stale = True
+        self.loaded_at = None
+        self._snapshot = None
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def category(self, value):
+        """Small-integer code of a categorical value such as a breed"""
+        return self.categories.setdefault(value, len(self.categories))
+
+    def category_names(self):
+        names = [None] * len(self.categories)
+        for value, code in self.categories.items():
+            names[code] = value
+        return names
+
+    def append(self, rows):
+        """Append (id, ...) tuples in column order"""
+        columns = list(self.columns.values())
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append(value)
+        if len(self):
+            self.last_id = self.columns['id'][-1]
+        self._snapshot = None
+
+    def snapshot(self):
+        """Columns as NumPy arrays (copies, so appends stay possible), or the arrays themselves"""
+        if np is None:
+            return self.columns
+        if self._snapshot is None:
+            self._snapshot = {column: np.frombuffer(values, dtype=_DTYPES[values.typecode]).copy()
+                              if len(values) else np.zeros(0, dtype=_DTYPES[values.typecode])
+                              for column, values in self.columns.items()}
+        return self._snapshot
+
+class Analytics:
+    """Cached columns of donations, pets and adoptions, and the statistics over them"""
+
+    STORES = ('donations', 'pets', 'adoptions')
+
+    def __init__(self):
+        self.batch_size = 10000
+        self.max_age = 300
+        self._lock = threading.Lock()
+        self.donations = ColumnStore('donations', {'id': 'q', 'day': 'i', 'amount': 'd'})
+        self.pets = ColumnStore('pets', {'id': 'q', 'day': 'i', 'breed': 'i', 'age': 'i'})
+        self.adoptions = ColumnStore('adoptions', {'id': 'q', 'pet_id': 'q', 'day': 'i'})
+        # Bumped by invalidate(), so a reload that started earlier stays stale
+        self._invalidations = dict.fromkeys(self.STORES, 0)
+
+    def init_app(self, app):
+        """Read the configuration and start from empty columns"""
+        app.config.setdefault('ANALYTICS_BATCH_SIZE', 10000)
+        app.config.setdefault('ANALYTICS_MAX_AGE', 300)
+        self.batch_size = app.config['ANALYTICS_BATCH_SIZE']
+        self.max_age = app.config['ANALYTICS_MAX_AGE']
+        with self._lock:
+            for name in self.STORES:
+                getattr(self, name).clear()
+        app.extensions['analytics'] = self
+
+    def invalidate(self, *names):
+        """Make the next refresh reload these tables from scratch"""
+        with self._lock:
+            for name in names:
+                getattr(self, name).stale = True
+                self._invalidations[name] += 1
+
+    def _load(self, name, statement, id_column, convert):
+        """Fetch one table's new rows, or all of them when stale or too old, and add them
+
+        The query runs without the lock; only swapping in the reloaded
+        columns, or appending the new rows, holds it.
+        """
+        with self._lock:
+            store = getattr(self, name)
+            reload = store.stale or time.monotonic() - (store.loaded_at or 0) > self.max_age
+            last_id = 0 if reload else store.last_id
+            invalidations = self._invalidations[name]
+        started = time.monotonic()
+        statement = statement.where(id_column > last_id).order_by(id_column)
+        result = db.session.execute(statement.execution_options(yield_per=self.batch_size))
+
+        if reload:
+            fresh = ColumnStore(name, store.typecodes)
+            for rows in result.partitions():
+                fresh.append(convert(fresh, row) for row in rows)
+            fresh.loaded_at = started
+            with self._lock:
+                fresh.stale = self._invalidations[name] != invalidations
+                setattr(self, name, fresh)
+            return
+
+        rows = [row for partition in result.partitions() for row in partition]
+        with self._lock:
+            store = getattr(self, name)
+            if rows and not store.stale:
+                # Another request may have appended some of these already
+                store.append(convert(store, row) for row in rows if row[0] > store.last_id)
+
+    def refresh(self):
+        """Bring every table up to date; cheap when nothing was added"""
+        self._load('donations', db.select(Donation.id, Donation.date, Donation.amount), Donation.id,
+                   lambda store, row: (row[0], _day(row[1]), float(row[2])))
+        self._load('pets', db.select(Pet.pet_id, Pet.created_at, Pet.breed, Pet.age), Pet.pet_id,
+                   lambda store, row: (row[0], _day(row[1]), store.category(row[2]), row[3]))
+        self._load('adoptions', db.select(Adoption.id, Adoption.pet_id, Adoption.date), Adoption.id,
+                   lambda store, row: (row[0], row[1], _day(row[2])))
+
+    def trends(self, days=90, today=None):
+        """Everything the trends page shows"""
+        today = today or date.today()
+        self.refresh()
+        with self._lock:
+            donations = self.donations.snapshot()
+            pets = self.pets.snapshot()
+            adoptions = self.adoptions.snapshot()
+            return {
+                'donations': donation_stats(donations, days, today.toordinal()),
+                'adoption_rates': adoption_rates(pets, adoptions, self.pets.category_names()),
+                'length_of_stay': length_of_stay(pets, adoptions)
+            }
+
+def _percentiles_python(values):
+    """Linearly interpolated percentiles, as numpy.percentile computes them"""
+    ordered = sorted(values)
+    result = {}
+    for p in PERCENTILES:
+        position = (len(ordered) - 1) * p / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        result[f'p{p}'] = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+    return result
+
+def _percentiles(values):
+    if not len(values):
+        return {f'p{p}': None for p in PERCENTILES}
+    if np is None:
+        return _percentiles_python(values)
+    return {f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+def donation_stats(donations, days, today):
+    """Totals, amount percentiles, and daily totals with 7- and 30-day rolling averages"""
+    amounts, day_numbers = donations['amount'], donations['day']
+    windows = (7, 30)
+    # Enough days before the range for the first point's 30-day average
+    start = today - days - max(windows) + 2
+    length = today - start + 1
+
+    if np is not None:
+        in_range = (day_numbers >= start) & (day_numbers <= today)
+        daily = np.bincount(day_numbers[in_range] - start, weights=amounts[in_range], minlength=length)
+        cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+        rolling = {w: (cumulative[w:] - cumulative[:-w]) / w for w in windows}
+        total, count = float(amounts.sum()), len(amounts)
+    else:
+        daily = [0.0] * length
+        for day, amount in zip(day_numbers, amounts):
+            if start <= day <= today:
+                daily[day - start] += amount
+        rolling = {w: [sum(daily[i - w + 1:i + 1]) / w for i in range(w - 1, length)] for w in windows}
+        total, count = sum(amounts), len(amounts)
+
+    series = []
+    for i in range(length - days, length):
+        series.append({
+            'date': date.fromordinal(start + i).isoformat(),
+            'total': round(float(daily[i]), 2),
+            **{f'avg_{w}d': round(float(rolling[w][i - w + 1]), 2) for w in windows}
+        })
+    return {
+        'count': count,
+        'total': round(total, 2),
+        'mean': round(total / count, 2) if count else None,
+        'percentiles': _percentiles(amounts),
+        'daily': series
+    }
+
+def _band_labels(bounds):
+    return [label for _, label in bounds]
+
+def adoption_rates(pets, adoptions, breeds, limit=15):
+    """Share of pets adopted, by breed (largest breeds first) and by age band"""
+    band_edges = [lower for lower, _ in AGE_BANDS[1:]]
+    if np is not None:
+        adopted = np.isin(pets['id'], adoptions['pet_id']).astype(np.float64)
+        breed_pets = np.bincount(pets['breed'], minlength=len(breeds))
+        breed_adopted = np.bincount(pets['breed'], weights=adopted, minlength=len(breeds))
+        bands = np.digitize(pets['age'], band_edges)
+        band_pets = np.bincount(bands, minlength=len(AGE_BANDS))
+        band_adopted = np.bincount(bands, weights=adopted, minlength=len(AGE_BANDS))
+    else:
+        adopted_ids = set(adoptions['pet_id'])
+        breed_pets, breed_adopted = [0] * len(breeds), [0] * len(breeds)
+        band_pets, band_adopted = [0] * len(AGE_BANDS), [0] * len(AGE_BANDS)
+        for pet_id, breed, age in zip(pets['id'], pets['breed'], pets['age']):
+            band = bisect_right(band_edges, age)
+            breed_pets[breed] += 1
+            band_pets[band] += 1
+            if pet_id in adopted_ids:
+                breed_adopted[breed] += 1
+                band_adopted[band] += 1
+
+    def rows(labels, totals, adopted_counts, key):
+        return [{key: label, 'pets': int(total), 'adopted': int(adopted_count),
+                 'rate': round(float(adopted_count) / float(total), 3) if total else None}
+                for label, total, adopted_count in zip(labels, totals, adopted_counts)]
+
+    by_breed = sorted(rows(breeds, breed_pets, breed_adopted, 'breed'), key=lambda row: -row['pets'])
+    return {
+        'by_breed': by_breed[:limit],
+        'by_age_band': rows(_band_labels(AGE_BANDS), band_pets, band_adopted, 'age_band')
+    }
+
+def length_of_stay(pets, adoptions):
+    """Days from intake to adoption: summary figures and a histogram"""
+    bucket_edges = [lower for lower, _ in STAY_BUCKETS[1:]]
+    if np is not None:
+        # Pets are stored in pet_id order, so each adoption's pet is found by binary search
+        positions = np.searchsorted(pets['id'], adoptions['pet_id'])
+        found = positions < len(pets['id'])
+        found[found] = pets['id'][positions[found]] == adoptions['pet_id'][found]
+        stays = adoptions['day'][found] - pets['day'][positions[found]]
+        stays = stays[(adoptions['day'][found] > 0) & (pets['day'][positions[found]] > 0)]
+        stays = np.clip(stays, 0, None).astype(np.float64)
+        histogram = np.bincount(np.digitize(stays, bucket_edges), minlength=len(STAY_BUCKETS))
+        count = len(stays)
+        mean = float(stays.mean()) if count else None
+    else:
+        intake = dict(zip(pets['id'], pets['day']))
+        stays = [max(0, adopted_day - intake[pet_id])
+                 for pet_id, adopted_day in zip(adoptions['pet_id'], adoptions['day'])
+                 if adopted_day and intake.get(pet_id)]
+        histogram = [0] * len(STAY_BUCKETS)
+        for stay in stays:
+            histogram[bisect_right(bucket_edges, stay)] += 1
+        count = len(stays)
+        mean = sum(stays) / count if count else None
+
+    percentiles = _percentiles(stays)
+    return {
+        'count': count,
+        'mean_days': round(mean, 1) if mean is not None else None,
+        'median_days': percentiles['p50'],
+        'p90_days': percentiles['p90'],
+        'histogram': [{'bucket': label, 'adoptions': int(n)}
+                      for label, n in zip(_band_labels(STAY_BUCKETS), histogram)]
+    }
+
+analytics = Analytics()
+
+# Columns the statistics read; edits to anything else don't invalidate
+_WATCHED = {
+    Donation: ('donations', ('date', 'amount')),
+    Pet: ('pets', ('created_at', 'breed', 'age')),
+    Adoption: ('adoptions', ('pet_id', 'date'))
+}
+
+def _changes(session):
+    """{table name: lowest new id, or None for a full reload} for the current transaction"""
+    return session.info.setdefault('analytics_changes', {})
+
+def _note_reload(session, name):
+    _changes(session)[name] = None
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    """Note inserted ids, and tables whose loaded rows were edited or deleted"""
+    changes = _changes(session)
+    for obj in session.new:
+        if type(obj) in _WATCHED:
+            name = _WATCHED[type(obj)][0]
+            if changes.get(name, 0) is not None:
+                record_id = inspect(obj).mapper.primary_key_from_instance(obj)[0]
+                changes[name] = min(changes.get(name) or record_id, record_id)
+    for obj in session.deleted:
+        if type(obj) in _WATCHED:
+            _note_reload(session, _WATCHED[type(obj)][0])
+    for obj in session.dirty:
+        if type(obj) not in _WATCHED:
+            continue
+        name, keys = _WATCHED[type(obj)]
+        state = inspect(obj)
+        if any(state.attrs[key].history.has_changes() for key in keys):
+            _note_reload(session, name)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_changes(orm_execute_state):
+    """Query.update()/Query.delete() reload the table they touched"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _WATCHED:
+        _note_reload(orm_execute_state.session, _WATCHED[mapper.class_][0])
+    return None
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    """Once committed, reload edited tables, and tables that were already
+    loaded past an id this transaction inserted (it committed late)"""
+    for name, first_new_id in session.info.pop('analytics_changes', {}).items():
+        store = getattr(analytics, name)
+        if first_new_id is None or first_new_id <= store.last_id:
+            analytics.invalidate(name)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('analytics_changes', None)
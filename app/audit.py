@@ -0,0 +1,231 @@
+"""
+Audit log for the Pet Management System
+
+Inserts, updates and deletes on the domain tables are captured from
+SQLAlchemy session events, held per session until the transaction
+commits, then handed to a bounded in-memory queue. A background thread
+drains the queue into the audit_log table in batches, so request
+handlers never wait on an extra INSERT.
+"""
+
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.utils import current_user_id
+
+# Tables whose writes are recorded
+AUDITED_TABLES = {'users', 'pets', 'donations', 'adoptions', 'medical_records'}
+
+# Columns never copied into the log
+REDACTED_COLUMNS = {'password_hash'}
+
+def _serialize(value):
+    """Make column values JSON friendly"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+def _column_changes(obj, action):
+    """Column values (create/delete) or old/new pairs (update) for an instance"""
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if key in REDACTED_COLUMNS:
+            continue
+        if action == 'update':
+            history = state.attrs[key].history
+            if history.has_changes():
+                old = history.deleted[0] if history.deleted else None
+                new = history.added[0] if history.added else None
+                changes[key] = [_serialize(old), _serialize(new)]
+        else:
+            changes[key] = _serialize(state.dict.get(key))
+    return changes
+
+def _entry(entity, entity_id, action, changes):
+    """Build one audit_log row"""
+    return {
+        'entity': entity,
+        'entity_id': None if entity_id is None else str(entity_id),
+        'action': action,
+        'user_id': current_user_id(),
+        'changes': json.dumps(changes),
+        'created_at': datetime.utcnow()
+    }
+
+def _identity(obj):
+    """Primary key of an instance as a string-friendly value"""
+    # The identity key of new objects is only assigned after the flush
+    # completes, but the primary key attributes are already populated
+    identity = inspect(obj).mapper.primary_key_from_instance(obj)
+    if not identity or identity[0] is None:
+        return None
+    return identity[0] if len(identity) == 1 else '/'.join(str(v) for v in identity)
+
+@event.listens_for(Session, 'after_flush')
+def _capture_flush(session, flush_context):
+    """Record the rows written by this flush"""
+    pending = session.info.setdefault('audit_pending', [])
+    for action, objects in (('create', session.new),
+                            ('update', session.dirty),
+                            ('delete', session.deleted)):
+        for obj in objects:
+            table = getattr(obj, '__tablename__', None)
+            if table not in AUDITED_TABLES:
+                continue
+            if action == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            changes = _column_changes(obj, action)
+            if action == 'update' and not changes:
+                continue
+            pending.append(_entry(table, _identity(obj), action, changes))
+
+def _capture_bulk(action, context):
+    """Record a Query.update()/Query.delete() by its criteria"""
+    table = context.mapper.local_table.name
+    if table not in AUDITED_TABLES:
+        return
+    whereclause = context.query.whereclause
+    try:
+        criteria = str(whereclause.compile(compile_kwargs={'literal_binds': True}))
+    except Exception:
+        criteria = str(whereclause)
+    changes = {'criteria': criteria, 'rowcount': context.result.rowcount}
+    if action == 'bulk_update':
+        changes['values'] = {str(k): _serialize(v) for k, v in context.values.items()}
+    context.session.info.setdefault('audit_pending', []).append(
+        _entry(table, None, action, changes))
+
+@event.listens_for(Session, 'after_bulk_delete')
+def _capture_bulk_delete(delete_context):
+    _capture_bulk('bulk_delete', delete_context)
+
+@event.listens_for(Session, 'after_bulk_update')
+def _capture_bulk_update(update_context):
+    _capture_bulk('bulk_update', update_context)
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed(session):
+    """Queue entries whose transaction committed"""
+    entries = session.info.pop('audit_pending', None)
+    if entries:
+        audit_writer.enqueue(entries)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    """Drop entries for writes that never happened"""
+    session.info.pop('audit_pending', None)
+
+class AuditWriter:
+    """Bounded queue drained into audit_log by a background thread"""
+
+    def __init__(self):
+        self._app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+
+    def init_app(self, app):
+        """Register the writer with the application"""
+        app.config.setdefault('AUDIT_QUEUE_SIZE', 10000)
+        app.config.setdefault('AUDIT_BATCH_SIZE', 500)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('AUDIT_PUT_TIMEOUT', 0.5)
+        app.config.setdefault('AUDIT_SYNCHRONOUS', False)
+        self._app = app
+        self._queue = queue.Queue(maxsize=app.config['AUDIT_QUEUE_SIZE'])
+        app.extensions['audit_writer'] = self
+
+    def _ensure_thread(self):
+        """Start the writer thread lazily, and again after a fork"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def enqueue(self, entries):
+        """Add entries, blocking briefly when the queue is full (back-pressure)"""
+        app = self._app
+        if app is None:
+            return
+        timeout = app.config['AUDIT_PUT_TIMEOUT']
+        for entry in entries:
+            try:
+                self._queue.put(entry, timeout=timeout)
+            except queue.Full:
+                with self._lock:
+                    self._dropped += 1
+                app.logger.error('Audit queue full, dropped entry for %s %s',
+                                 entry['entity'], entry['entity_id'])
+
+        if app.config['AUDIT_SYNCHRONOUS'] or app.testing:
+            self.flush()
+        else:
+            self._ensure_thread()
+
+    def _take_batch(self, block):
+        """Pull up to AUDIT_BATCH_SIZE entries off the queue"""
+        batch_size = self._app.config['AUDIT_BATCH_SIZE']
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self._app.config['AUDIT_FLUSH_INTERVAL']))
+            while len(batch) < batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch):
+        """Insert one batch on a dedicated connection"""
+        from app.models import AuditLog
+
+        with self._app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(AuditLog.__table__.insert(), batch)
+        with self._lock:
+            self._written += len(batch)
+
+    def flush(self):
+        """Write everything currently queued, in the calling thread"""
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _run(self):
+        """Writer thread loop"""
+        while True:
+            batch = self._take_batch(block=True)
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception as e:
+                with self._lock:
+                    self._dropped += len(batch)
+                self._app.logger.error('Failed to write %d audit entries: %r', len(batch), e)
+
+    def stats(self):
+        """Queue depth and totals for monitoring"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize() if self._queue else 0,
+                'written': self._written,
+                'dropped': self._dropped
+            }
+
+audit_writer = AuditWriter()
@@ -0,0 +1,90 @@
+"""
+Flask CLI maintenance commands for the Pet Management System
+
+Run with the app factory, e.g.:
+
+    flask --app run backfill-medical-summary
+"""
+
+import click
+
+def init_app(app):
+    """Register the maintenance commands with the application"""
+
+    @app.cli.command('backfill-medical-summary')
+    @click.option('--batch-size', default=1000, show_default=True,
+                  help='Pets recomputed per transaction')
+    def backfill_medical_summary(batch_size):
+        """Recompute every pet's medical record count and last treatment dates"""
+        from app.medical_summary import backfill
+
+        updated = backfill(batch_size)
+        click.echo(f'Recomputed the medical summary of {updated} pets')
+
+    @app.cli.command('backfill-vaccinations')
+    @click.option('--batch-size', default=1000, show_default=True,
+                  help='Medical records parsed per transaction')
+    def backfill_vaccinations(batch_size):
+        """Rebuild the vaccinations table from every medical record's vaccines text"""
+        from app.vaccinations import backfill
+
+        inserted = backfill(batch_size)
+        click.echo(f'Wrote {inserted} vaccinations')
+
+    @app.cli.command('backfill-due-treatments')
+    @click.option('--batch-size', default=1000, show_default=True,
+                  help='Pets rescheduled per transaction')
+    def backfill_due_treatments(batch_size):
+        """Rebuild every pet's due treatments from its medical records"""
+        from app.due_treatments import backfill
+
+        inserted = backfill(batch_size)
+        click.echo(f'Scheduled {inserted} due treatments')
+
+    @app.cli.command('rebuild-donation-rollups')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Only rebuild buckets from this date (rounded down to the month) on')
+    def rebuild_donation_rollups(since):
+        """Recompute the daily and monthly donation totals from donations"""
+        from app.donation_rollups import rebuild
+
+        days = rebuild(since.date() if since else None)
+        click.echo(f'Rebuilt {days} daily donation buckets')
+
+    @app.cli.command('backfill-status-history')
+    @click.option('--batch-size', default=1000, show_default=True,
+                  help='Pets seeded per transaction')
+    def backfill_status_history(batch_size):
+        """Seed the status history of pets that have none, then rebuild the stay totals"""
+        from app.status_history import backfill
+
+        seeded = backfill(batch_size)
+        click.echo(f'Seeded the status history of {seeded} pets')
+
+    @app.cli.command('rebuild-stay-totals')
+    def rebuild_stay_totals():
+        """Recompute the length-of-stay totals from the pet status history"""
+        from app.status_history import rebuild_totals
+
+        stays = rebuild_totals()
+        click.echo(f'Rebuilt the stay totals from {stays} status changes')
+
+    @app.cli.command('normalize-shelters')
+    @click.option('--batch-size', default=1000, show_default=True,
+                  help='Pets normalized per transaction')
+    def normalize_shelters(batch_size):
+        """Normalize pets' shelter numbers, create missing shelters and recount their occupancy"""
+        from app.shelters import normalize_existing
+
+        changed = normalize_existing(batch_size)
+        click.echo(f'Normalized the shelter number of {changed} pets')
+
+    @app.cli.command('dedupe-donors')
+    @click.option('--batch-size', default=1000, show_default=True,
+                  help='Donations linked per transaction')
+    def dedupe_donors(batch_size):
+        """Link donations without a donor to one, by normalized email or phone"""
+        from app.donors import dedupe
+
+        linked = dedupe(batch_size)
+        click.echo(f'Linked {linked} donations to their donors')
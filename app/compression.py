@@ -0,0 +1,166 @@
+"""
+Response compression for the Pet Management System
+
+HTML and JSON responses are compressed with the best encoding the
+client accepts: zstd when the optional zstandard package is installed,
+then gzip, then deflate. Small bodies, content types outside the
+allowlist, and responses that already carry a Content-Encoding (or are
+file passthroughs such as uploaded images) are sent as they are.
+
+Streamed responses are compressed chunk by chunk and flushed after each
+one, so the first rows of a streamed list page still reach the browser
+before the rest has been rendered.
+"""
+
+import zlib
+
+from flask import request
+
+from app.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+DEFAULT_MIMETYPES = (
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml'
+)
+
+class _ZlibEncoder:
+    """gzip or deflate stream"""
+
+    def __init__(self, level, wbits):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class _ZstdEncoder:
+    """zstd stream"""
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+class Compression:
+    """after_request hook that compresses eligible responses"""
+
+    def __init__(self):
+        self.enabled = True
+        self.level = 6
+        self.zstd_level = 3
+        self.min_size = 500
+        self.mimetypes = frozenset(DEFAULT_MIMETYPES)
+        self.encodings = ['gzip', 'deflate']
+
+    def init_app(self, app):
+        """Register the compression hook with the application"""
+        app.config.setdefault('COMPRESSION_ENABLED', True)
+        app.config.setdefault('COMPRESSION_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_ZSTD_LEVEL', 3)
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESSION_MIMETYPES', DEFAULT_MIMETYPES)
+        self.enabled = app.config['COMPRESSION_ENABLED']
+        self.level = app.config['COMPRESSION_LEVEL']
+        self.zstd_level = app.config['COMPRESSION_ZSTD_LEVEL']
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.mimetypes = frozenset(app.config['COMPRESSION_MIMETYPES'])
+        self.encodings = (['zstd'] if zstandard else []) + ['gzip', 'deflate']
+        app.extensions['compression'] = self
+
+        if not self.enabled:
+            return
+
+        @app.after_request
+        def _compress_response(response):
+            return self.compress(response)
+
+    def encoder(self, encoding):
+        """A fresh compressor for the given Content-Encoding"""
+        if encoding == 'zstd':
+            return _ZstdEncoder(self.zstd_level)
+        if encoding == 'gzip':
+            return _ZlibEncoder(self.level, 16 + zlib.MAX_WBITS)
+        return _ZlibEncoder(self.level, zlib.MAX_WBITS)
+
+    def should_compress(self, response):
+        """Whether the response is worth compressing at all"""
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        if request.method == 'HEAD' or response.direct_passthrough:
+            return False
+        if 'Content-Encoding' in response.headers:
+            return False
+        if 'no-transform' in response.headers.get('Cache-Control', ''):
+            return False
+        if response.mimetype not in self.mimetypes:
+            return False
+        if not response.is_streamed:
+            return response.content_length is None or response.content_length >= self.min_size
+        return True
+
+    def compress(self, response):
+        """Compress the response in place if the client accepts an encoding we offer"""
+        if not self.should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        encoder = self.encoder(encoding)
+        if response.is_streamed:
+            response.response = self._stream(encoder, response.response, response.iter_encoded())
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            compressed = encoder.compress(data) + encoder.finish()
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+            metrics.inc('compression_bytes_saved_total', len(data) - len(compressed), encoding=encoding)
+
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            # The compressed body is a different representation
+            response.headers['ETag'] = response.headers['ETag'].rstrip('"') + f'-{encoding}"'
+        metrics.inc('compressed_responses_total', encoding=encoding)
+        return response
+
+    def _stream(self, encoder, body, chunks):
+        """Compress a streamed body, flushing after every chunk"""
+        try:
+            for chunk in chunks:
+                compressed = encoder.compress(chunk) + encoder.flush()
+                if compressed:
+                    yield compressed
+            yield encoder.finish()
+        finally:
+            # Let a stream_with_context body tear its request down
+            if hasattr(body, 'close'):
+                body.close()
+
+compression = Compression()
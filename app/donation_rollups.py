@@ -0,0 +1,192 @@
+"""
+Donation rollups
+
+donation_daily_totals and donation_monthly_totals hold the count and sum
+of donations per bucket, purpose and employee (Donation.user_id), so the
+chart endpoints read a few hundred pre-aggregated rows instead of every
+donation.
+
+Session events turn each flushed insert, edit or delete of a donation
+into +/- deltas on its old and new buckets, applied with an upsert in
+the same transaction (create_donation, donate and edit_my_donation all
+go through them). Rows written with Core bypass the events;
+`flask rebuild-donation-rollups` recomputes the rollups from donations,
+optionally only from a given date on for late corrections.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import User, Donation, DonationDailyTotal, DonationMonthlyTotal
+from app.utils import upsert_add
+
+ROLLUPS = {'day': DonationDailyTotal, 'month': DonationMonthlyTotal}
+
+# Donation columns whose change moves the donation between buckets
+TRACKED = ('amount', 'purpose', 'date', 'user_id')
+
+CENT = Decimal('0.01')
+
+def bucket_keys(donated_at, purpose, user_id):
+    """(period, bucket, purpose, user_id) keys a donation counts towards"""
+    day = donated_at.date() if isinstance(donated_at, datetime) else donated_at
+    purpose = purpose or ''
+    user_id = user_id or 0
+    return [('day', day, purpose, user_id), ('month', day.replace(day=1), purpose, user_id)]
+
+def _amount(value):
+    return Decimal(str(value)).quantize(CENT)
+
+def _add(deltas, donated_at, purpose, user_id, amount, sign):
+    if donated_at is None or amount is None:
+        return
+    for key in bucket_keys(donated_at, purpose, user_id):
+        count, total = deltas[key]
+        deltas[key] = (count + sign, total + sign * _amount(amount))
+
+def _upsert(connection, table, rows):
+    """Add each row's count and total to its bucket, creating missing buckets"""
+    upsert_add(connection, table, rows, ('bucket', 'purpose', 'user_id'), ('donation_count', 'total_amount'))
+
+def apply(connection, deltas):
+    """Apply {(period, bucket, purpose, user_id): (count, total)} deltas to the rollups"""
+    rows = defaultdict(list)
+    for (period, bucket, purpose, user_id), (count, total) in deltas.items():
+        if count or total:
+            rows[period].append({'bucket': bucket, 'purpose': purpose, 'user_id': user_id,
+                                 'donation_count': count, 'total_amount': total})
+    for period, period_rows in rows.items():
+        _upsert(connection, ROLLUPS[period].__table__, period_rows)
+    return sum(len(period_rows) for period_rows in rows.values())
+
+def rebuild(since=None, batch_size=5000):
+    """Recompute the rollups from donations, every bucket or those from a date on
+
+    Donations are summed per day in SQL; months are summed from the days.
+    Returns the number of daily buckets written.
+    """
+    day = db.func.date(Donation.date)
+    purpose = db.func.coalesce(Donation.purpose, '')
+    user_id = db.func.coalesce(Donation.user_id, 0)
+    statement = db.select(
+        day, purpose, user_id, db.func.count(Donation.id), db.func.sum(Donation.amount)
+    ).where(Donation.date.isnot(None)).group_by(day, purpose, user_id)
+    if since is not None:
+        since = since.replace(day=1)
+        statement = statement.where(Donation.date >= since)
+
+    for model in ROLLUPS.values():
+        delete = model.__table__.delete()
+        if since is not None:
+            delete = delete.where(model.__table__.c.bucket >= since)
+        db.session.execute(delete)
+
+    months = defaultdict(lambda: (0, Decimal(0)))
+    days = 0
+    batch = []
+    # Daily aggregates are few enough to fetch whole, leaving the
+    # connection free for the inserts
+    for bucket, purpose, user_id, count, total in db.session.execute(statement).all():
+        if isinstance(bucket, str):
+            bucket = date.fromisoformat(bucket)
+        total = _amount(total)
+        batch.append({'bucket': bucket, 'purpose': purpose, 'user_id': user_id,
+                      'donation_count': count, 'total_amount': total})
+        month = (bucket.replace(day=1), purpose, user_id)
+        months[month] = (months[month][0] + count, months[month][1] + total)
+        if len(batch) >= batch_size:
+            _upsert(db.session.connection(), DonationDailyTotal.__table__, batch)
+            days += len(batch)
+            batch = []
+    if batch:
+        _upsert(db.session.connection(), DonationDailyTotal.__table__, batch)
+        days += len(batch)
+    apply(db.session.connection(), {('month',) + key: value for key, value in months.items()})
+    db.session.commit()
+    return days
+
+def totals(period='month', by=None, start=None, end=None, user_id=None):
+    """Rollup rows summed per bucket, and per purpose or employee when by says so"""
+    model = ROLLUPS[period]
+    columns = [model.bucket]
+    if by == 'purpose':
+        columns.append(model.purpose)
+    elif by == 'user':
+        columns.append(model.user_id)
+    statement = db.select(
+        *columns,
+        db.func.sum(model.donation_count).label('donation_count'),
+        db.func.sum(model.total_amount).label('total_amount')
+    ).group_by(*columns).having(db.func.sum(model.donation_count) > 0).order_by(*columns)
+    if start is not None:
+        statement = statement.where(model.bucket >= start)
+    if end is not None:
+        statement = statement.where(model.bucket <= end)
+    if user_id is not None:
+        statement = statement.where(model.user_id == user_id)
+    rows = db.session.execute(statement).all()
+
+    usernames = {}
+    if by == 'user':
+        user_ids = {row.user_id for row in rows if row.user_id}
+        if user_ids:
+            usernames = dict(db.session.execute(
+                db.select(User.id, User.username).where(User.id.in_(user_ids))).all())
+
+    result = []
+    for row in rows:
+        item = {'bucket': row.bucket.isoformat()}
+        if by == 'purpose':
+            item['purpose'] = row.purpose or None
+        elif by == 'user':
+            item['user_id'] = row.user_id or None
+            item['username'] = usernames.get(row.user_id)
+        item['donation_count'] = int(row.donation_count)
+        item['total_amount'] = float(row.total_amount)
+        result.append(item)
+    return result
+
+def _previous(state, key):
+    """Value of a column as last loaded from the database"""
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return state.attrs[key].value
+
+@event.listens_for(Session, 'after_flush')
+def _collect_deltas(session, flush_context):
+    """Turn the donations this flush wrote into bucket deltas"""
+    deltas = session.info.setdefault('donation_rollup_deltas', defaultdict(lambda: (0, Decimal(0))))
+    for obj in session.new:
+        if isinstance(obj, Donation):
+            _add(deltas, obj.date, obj.purpose, obj.user_id, obj.amount, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Donation):
+            state = inspect(obj)
+            _add(deltas, *(_previous(state, key) for key in ('date', 'purpose', 'user_id', 'amount')), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Donation):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in TRACKED):
+            continue
+        _add(deltas, *(_previous(state, key) for key in ('date', 'purpose', 'user_id', 'amount')), -1)
+        _add(deltas, obj.date, obj.purpose, obj.user_id, obj.amount, 1)
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_after_flush(session, flush_context):
+    """Write the collected deltas to the rollup tables"""
+    deltas = session.info.pop('donation_rollup_deltas', None)
+    if deltas:
+        apply(session.connection(), deltas)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_deltas(session):
+    session.info.pop('donation_rollup_deltas', None)
@@ -0,0 +1,173 @@
+"""
+Donor identity
+
+Donations carry the donor's name, email and phone as typed. A donor row
+is keyed on the normalized email (trimmed, lower case), with the
+normalized phone (digits only) indexed as a second key, and every
+donation points to its donor. A donation is linked to the donor with the
+same email, else to the first donor with the same phone, else to a new
+donor.
+
+Donations are linked when a flush writes them (admin.create_donation,
+employee.donate and anything else that goes through the session), and
+relinked when their email or phone is edited. A new donor is inserted
+with the dialect's conflict handling, so two first donations from the
+same email at once share one donor instead of one failing on
+donors.email_key. `flask dedupe-donors`
+links the donations that have no donor yet, in batches. A donor's totals
+and history are then read through the (donor_id, date) index.
+"""
+
+import re
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Donor, Donation
+from app.utils import insert_missing
+
+# Fewer digits than this is not a usable phone number
+MIN_PHONE_DIGITS = 7
+
+def normalize_email(email):
+    """Donor key of an email address, None when blank"""
+    return (email or '').strip().lower()[:120] or None
+
+def normalize_phone(phone):
+    """Donor key of a phone number (its digits), None when too short"""
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[:20] if len(digits) >= MIN_PHONE_DIGITS else None
+
+def find(query):
+    """Donors whose email, or phone when query has no '@', matches query"""
+    if '@' in query:
+        email_key = normalize_email(query)
+        return Donor.query.filter(Donor.email_key == email_key).all() if email_key else []
+    phone_key = normalize_phone(query)
+    return Donor.query.filter(Donor.phone_key == phone_key).order_by(Donor.id).all() if phone_key else []
+
+def totals(donor_ids):
+    """{donor_id: count, total and first/last date of their donations}"""
+    if not donor_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(Donation.donor_id, db.func.count(Donation.id), db.func.sum(Donation.amount),
+                  db.func.min(Donation.date), db.func.max(Donation.date))
+        .where(Donation.donor_id.in_(donor_ids))
+        .group_by(Donation.donor_id)
+    ).all()
+    return {donor_id: {'donation_count': count, 'total_amount': float(total or 0),
+                       'first_donation': first, 'last_donation': last}
+            for donor_id, count, total, first, last in rows}
+
+def totals_json(summary):
+    """JSON fields of one donor's totals (None: no donations)"""
+    summary = summary or {'donation_count': 0, 'total_amount': 0.0, 'first_donation': None, 'last_donation': None}
+    return {
+        'donation_count': summary['donation_count'],
+        'total_amount': round(summary['total_amount'], 2),
+        'first_donation': summary['first_donation'].isoformat() if summary['first_donation'] else None,
+        'last_donation': summary['last_donation'].isoformat() if summary['last_donation'] else None
+    }
+
+def history(donor_id):
+    """A donor's donations, newest first"""
+    return Donation.query.filter(Donation.donor_id == donor_id).order_by(Donation.date.desc()).all()
+
+def dedupe(batch_size=1000):
+    """Link donations without a donor in id batches, creating donors as needed; returns the donations linked"""
+    donations, donors = Donation.__table__, Donor.__table__
+    statement = donations.update().where(donations.c.id == db.bindparam('b_id')) \
+        .values(donor_id=db.bindparam('b_donor_id'))
+    linked = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Donation.id, Donation.donor_name, Donation.donor_email, Donation.donor_phone)
+            .where(Donation.donor_id.is_(None), Donation.id > last_id)
+            .order_by(Donation.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        connection = db.session.connection()
+        keyed = [(row, normalize_email(row.donor_email), normalize_phone(row.donor_phone)) for row in rows]
+
+        # Donors already known by any of the batch's keys: {email_key: id}, {phone_key: email_key}
+        by_email, by_phone = {}, {}
+        known = connection.execute(
+            db.select(donors.c.id, donors.c.email_key, donors.c.phone_key)
+            .where(db.or_(donors.c.email_key.in_({email for _, email, _ in keyed if email}),
+                          donors.c.phone_key.in_({phone for _, _, phone in keyed if phone})))
+            .order_by(donors.c.id))
+        for donor_id, email_key, phone_key in known:
+            by_email[email_key] = donor_id
+            if phone_key:
+                by_phone.setdefault(phone_key, email_key)
+
+        new, links = {}, []
+        for row, email_key, phone_key in keyed:
+            if email_key is None:
+                continue
+            key = email_key
+            if email_key not in by_email and email_key not in new and phone_key in by_phone:
+                key = by_phone[phone_key]
+            if key not in by_email and key not in new:
+                new[key] = {'email_key': key, 'phone_key': phone_key, 'name': row.donor_name,
+                            'email': row.donor_email, 'phone': row.donor_phone}
+            if phone_key:
+                by_phone.setdefault(phone_key, key)
+            links.append((row.id, key))
+
+        if new:
+            insert_missing(connection, donors, list(new.values()), ('email_key',))
+            by_email.update(connection.execute(
+                db.select(donors.c.email_key, donors.c.id).where(donors.c.email_key.in_(new))).all())
+        if links:
+            connection.execute(statement, [{'b_id': donation_id, 'b_donor_id': by_email[key]}
+                                           for donation_id, key in links])
+        db.session.commit()
+        linked += len(links)
+        last_id = rows[-1].id
+    return linked
+
+def _donor_for(session, donation, created):
+    """The donor a donation belongs to, added to the session when new"""
+    email_key, phone_key = normalize_email(donation.donor_email), normalize_phone(donation.donor_phone)
+    if email_key is None:
+        return None
+    donor = created.get(email_key) or session.execute(
+        db.select(Donor).where(Donor.email_key == email_key)).scalar_one_or_none()
+    if donor is None and phone_key:
+        donor = next((donor for donor in created.values() if donor.phone_key == phone_key), None) or \
+            session.execute(db.select(Donor).where(Donor.phone_key == phone_key)
+                            .order_by(Donor.id).limit(1)).scalar()
+    if donor is None:
+        insert_missing(session.connection(), Donor.__table__, [{
+            'email_key': email_key, 'phone_key': phone_key, 'name': donation.donor_name,
+            'email': donation.donor_email, 'phone': donation.donor_phone, 'created_at': datetime.utcnow()
+        }], ('email_key',))
+        # A locking read sees a donor another transaction committed meanwhile
+        donor = session.execute(
+            db.select(Donor).where(Donor.email_key == email_key).with_for_update()).scalar_one()
+        created[email_key] = donor
+    elif donor.phone_key is None and phone_key:
+        donor.phone_key, donor.phone = phone_key, donation.donor_phone
+    return donor
+
+@event.listens_for(Session, 'before_flush')
+def _link_donations(session, flush_context, instances):
+    """Link new donations, and donations whose email or phone changed, to their donor"""
+    donations = [obj for obj in session.new if isinstance(obj, Donation)]
+    for obj in session.dirty:
+        if isinstance(obj, Donation) and obj not in session.deleted:
+            state = inspect(obj)
+            if state.attrs.donor_email.history.has_changes() or state.attrs.donor_phone.history.has_changes():
+                donations.append(obj)
+    if not donations:
+        return
+    created = {}
+    with session.no_autoflush:
+        for donation in donations:
+            donation.donor = _donor_for(session, donation, created)
@@ -0,0 +1,112 @@
+"""
+Precomputed treatment schedule
+
+due_treatments holds one row per pet and recurring treatment (each
+vaccine, plus treatment types that repeat such as checkups and
+deworming) with the date it is next due, so "what is due this week" is
+a range scan of the due_date index instead of a pass over the whole
+medical history.
+
+The rows of a pet are recomputed from its own medical records whenever
+a flush inserts, edits or deletes one of them (admin.create_medical_record
+among others), and after Query.delete() bulk deletes, as reported by
+app.medical_changes. Rows written with
+Core bypass the events; `flask backfill-due-treatments` rebuilds the table
+in batches.
+"""
+
+from datetime import timedelta
+
+from app import db, medical_changes
+from app.models import Pet, MedicalRecord, DueTreatment
+from app.vaccinations import parse_vaccines, vaccine_code, DUE_INTERVALS, DEFAULT_DUE_INTERVAL
+
+# Treatment types that repeat, with the days until the next one is due
+TREATMENT_INTERVALS = {
+    'CHECKUP': 365,
+    'HEALTH_CHECKUP': 365,
+    'DENTAL_CLEANING': 365,
+    'DEWORMING': 90
+}
+
+def schedule(records):
+    """Due rows for (id, pet_id, treatment_type, treat_date, vaccines) records
+
+    Only the latest record of each pet and treatment counts.
+    """
+    latest = {}
+    for record_id, pet_id, treatment_type, treat_date, vaccines in records:
+        due = [(code, 'vaccine', DUE_INTERVALS.get(code, DEFAULT_DUE_INTERVAL))
+               for code in parse_vaccines(vaccines)]
+        code = vaccine_code(treatment_type or '')
+        if code in TREATMENT_INTERVALS:
+            due.append((code, 'treatment', TREATMENT_INTERVALS[code]))
+        for code, kind, interval in due:
+            current = latest.get((pet_id, code))
+            if current is None or treat_date >= current['last_date']:
+                latest[(pet_id, code)] = {
+                    'pet_id': pet_id,
+                    'treatment': code,
+                    'kind': kind,
+                    'last_record_id': record_id,
+                    'last_date': treat_date,
+                    'due_date': treat_date + timedelta(days=interval)
+                }
+    return list(latest.values())
+
+def recompute(connection, pet_ids):
+    """Rewrite the due rows of the given pets from their medical records"""
+    pet_ids = sorted(pet_id for pet_id in pet_ids if pet_id is not None)
+    if not pet_ids:
+        return 0
+    records = MedicalRecord.__table__
+    table = DueTreatment.__table__
+    rows = schedule(connection.execute(
+        db.select(records.c.id, records.c.pet_id, records.c.treatment_type,
+                  records.c.treat_date, records.c.vaccines)
+        .where(records.c.pet_id.in_(pet_ids)).order_by(records.c.id)
+    ))
+    connection.execute(table.delete().where(table.c.pet_id.in_(pet_ids)))
+    if rows:
+        connection.execute(table.insert(), rows)
+    return len(rows)
+
+def backfill(batch_size=1000):
+    """Rebuild the schedule of every pet in pet_id batches, committing after each"""
+    inserted = 0
+    last_id = 0
+    while True:
+        pet_ids = db.session.execute(
+            db.select(Pet.pet_id).where(Pet.pet_id > last_id).order_by(Pet.pet_id).limit(batch_size)
+        ).scalars().all()
+        if not pet_ids:
+            return inserted
+        inserted += recompute(db.session.connection(), pet_ids)
+        db.session.commit()
+        last_id = pet_ids[-1]
+
+def due_between(start, end, limit=20):
+    """Treatments due from start (None: any time before) to end inclusive,
+    soonest first, with the pet's name
+
+    A single range query over idx_due_treatments_due_date. Adopted pets
+    are no longer in our care, so their schedules are left out.
+    """
+    window = DueTreatment.due_date <= end if start is None else DueTreatment.due_date.between(start, end)
+    return db.session.execute(
+        db.select(DueTreatment.pet_id, Pet.pet_name, DueTreatment.treatment, DueTreatment.kind,
+                  DueTreatment.last_date, DueTreatment.due_date)
+        .join(Pet, DueTreatment.pet_id == Pet.pet_id)
+        .where(window, Pet.status != 'adopted')
+        .order_by(DueTreatment.due_date, DueTreatment.pet_id)
+        .limit(limit)
+    ).all()
+
+def due_this_week(today, limit=20):
+    """Overdue treatments, most overdue first, then those due in the seven days starting today"""
+    return due_between(None, today + timedelta(days=6), limit)
+
+@medical_changes.on_change
+def _recompute_changed(session, pet_ids):
+    """Reschedule the pets whose records changed"""
+    recompute(session.connection(), pet_ids)
@@ -0,0 +1,230 @@
+"""
+Per-request SQL instrumentation for the Pet Management System
+
+Cursor-level engine events count every statement a request issues,
+including lazy loads triggered while a template renders. Each response
+gets a Server-Timing header, and a rolling window of samples per
+endpoint is kept in memory for the /admin/perf page.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS (opt-in) are also kept
+in a bounded ring buffer together with their parameters, the route and
+code that issued them, and the database's query plan.
+"""
+
+import os
+import threading
+import time
+import traceback
+from collections import defaultdict, deque
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def current_sql_stats():
+    """SQL stats for the current app context, or None outside of one"""
+    if not has_app_context():
+        return None
+    return g.get('_sql_stats')
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start_time')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    if has_app_context():
+        slow_query_log.maybe_record(conn, statement, parameters, executemany, duration)
+    stats = current_sql_stats()
+    if stats is None:
+        return
+    stats['count'] += 1
+    stats['time'] += duration
+    if duration > stats['slowest_time']:
+        stats['slowest_time'] = duration
+        stats['slowest_statement'] = statement
+
+class RequestProfiler:
+    """Collects per-request SQL figures and aggregates them by endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=200))
+
+    def init_app(self, app):
+        """Register request hooks with the application"""
+        app.config.setdefault('SQL_INSTRUMENTATION', True)
+        app.config.setdefault('SERVER_TIMING_HEADER', True)
+        app.config.setdefault('PERF_WINDOW', 200)
+        self._samples = defaultdict(lambda: deque(maxlen=app.config['PERF_WINDOW']))
+        app.extensions['request_profiler'] = self
+
+        if not app.config['SQL_INSTRUMENTATION']:
+            return
+
+        @app.before_request
+        def _start_sql_stats():
+            g._request_start_time = time.perf_counter()
+            g._sql_stats = {
+                'count': 0,
+                'time': 0.0,
+                'slowest_time': 0.0,
+                'slowest_statement': None
+            }
+
+        @app.after_request
+        def _finish_sql_stats(response):
+            stats = g.get('_sql_stats')
+            if stats is None:
+                return response
+            total = time.perf_counter() - g._request_start_time
+
+            if app.config['SERVER_TIMING_HEADER']:
+                response.headers.add('Server-Timing',
+                                     f'db;dur={stats["time"] * 1000:.2f};desc="{stats["count"]} queries"')
+                response.headers.add('Server-Timing', f'app;dur={total * 1000:.2f}')
+
+            endpoint = request.endpoint or 'unknown'
+            if response.is_streamed:
+                # Streamed bodies keep querying after the headers are sent, so
+                # the sample is recorded once the body has been consumed
+                start = g._request_start_time
+                response.call_on_close(
+                    lambda: self.record(endpoint, stats, time.perf_counter() - start))
+            else:
+                self.record(endpoint, stats, total)
+            return response
+
+    def record(self, endpoint, stats, total):
+        """Add one request sample to the rolling window"""
+        sample = (stats['count'], stats['time'], total,
+                  stats['slowest_time'], stats['slowest_statement'])
+        with self._lock:
+            self._samples[endpoint].append(sample)
+
+    def summary(self):
+        """Aggregate the rolling window, slowest endpoints first"""
+        with self._lock:
+            snapshot = {endpoint: list(samples) for endpoint, samples in self._samples.items()}
+
+        rows = []
+        for endpoint, samples in snapshot.items():
+            if not samples:
+                continue
+            n = len(samples)
+            slowest = max(samples, key=lambda s: s[3])
+            rows.append({
+                'endpoint': endpoint,
+                'requests': n,
+                'avg_queries': sum(s[0] for s in samples) / n,
+                'max_queries': max(s[0] for s in samples),
+                'avg_sql_ms': sum(s[1] for s in samples) / n * 1000,
+                'avg_total_ms': sum(s[2] for s in samples) / n * 1000,
+                'slowest_query_ms': slowest[3] * 1000,
+                'slowest_statement': slowest[4]
+            })
+        rows.sort(key=lambda r: r['avg_total_ms'], reverse=True)
+        return rows
+
+    def reset(self):
+        """Clear all collected samples"""
+        with self._lock:
+            self._samples.clear()
+
+request_profiler = RequestProfiler()
+
+def _calling_frames(limit=5):
+    """Application frames (innermost first) that led to a statement"""
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if not filename.startswith(_APP_DIR) or filename == os.path.abspath(__file__):
+            continue
+        frames.append(f'{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.lineno} in {frame.name}')
+        if len(frames) >= limit:
+            break
+    return frames
+
+class SlowQueryLog:
+    """Ring buffer of statements that exceeded the slow-query threshold"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=100)
+
+    def init_app(self, app):
+        """Register the log with the application"""
+        app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', None)
+        app.config.setdefault('SLOW_QUERY_LOG_SIZE', 100)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN', True)
+        self._entries = deque(maxlen=app.config['SLOW_QUERY_LOG_SIZE'])
+        app.extensions['slow_query_log'] = self
+
+    def explain(self, conn, statement, parameters):
+        """Query plan for a statement, run on a raw DBAPI cursor
+
+        The raw cursor bypasses engine events, so the EXPLAIN is neither
+        counted nor logged itself.
+        """
+        dialect = conn.dialect.name
+        if dialect == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        elif dialect == 'mysql':
+            prefix = 'EXPLAIN '
+        else:
+            return None
+
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            columns = [c[0] for c in cursor.description or []]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def maybe_record(self, conn, statement, parameters, executemany, duration):
+        """Record the statement if it crossed the configured threshold"""
+        threshold = current_app.config.get('SLOW_QUERY_THRESHOLD_MS')
+        if not threshold or duration * 1000 < threshold:
+            return
+
+        plan = None
+        if (current_app.config['SLOW_QUERY_EXPLAIN'] and not executemany
+                and statement.lstrip().upper().startswith('SELECT')):
+            try:
+                plan = self.explain(conn, statement, parameters)
+            except Exception as e:
+                plan = [{'error': repr(e)}]
+
+        entry = {
+            'time': datetime.utcnow(),
+            'duration_ms': duration * 1000,
+            'statement': statement,
+            'parameters': repr(parameters)[:500],
+            'endpoint': request.endpoint if has_request_context() else None,
+            'frames': _calling_frames(),
+            'plan': plan
+        }
+        with self._lock:
+            self._entries.append(entry)
+        current_app.logger.warning('Slow query (%.1f ms) at %s: %s', entry['duration_ms'],
+                                   entry['frames'][0] if entry['frames'] else entry['endpoint'],
+                                   statement)
+
+    def entries(self):
+        """Logged statements, newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+slow_query_log = SlowQueryLog()
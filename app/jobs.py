@@ -0,0 +1,260 @@
+"""
+Background job runner for the Pet Management System
+
+Slow side effects (file cleanup, recomputations) are queued with
+enqueue_after_commit() inside the request's transaction. The job row is
+committed together with the data it belongs to, and only once the commit
+succeeds is it handed to a bounded thread pool. Failed jobs are retried
+up to JOB_MAX_ATTEMPTS times; jobs left pending by a crash are picked up
+again on startup.
+
+A job is claimed with a conditional UPDATE (pending -> running) before it
+runs, so it runs once even when several worker processes submit it. A
+job still 'running' after JOB_LEASE_SECONDS is taken to belong to a dead
+worker and is made pending again by recover().
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.utils import delete_uploaded_file
+
+# Registered job functions, keyed by name
+_tasks = {}
+
+def task(name):
+    """Register a function as a background job under the given name"""
+    def decorator(f):
+        _tasks[name] = f
+        return f
+    return decorator
+
+def enqueue_after_commit(name, **kwargs):
+    """Queue a job that runs once the current db.session transaction commits
+
+    Keyword arguments must be JSON serializable. If the transaction is
+    rolled back the job row is discarded along with it.
+    """
+    from app.models import Job
+
+    if name not in _tasks:
+        raise KeyError(f'Unknown job: {name}')
+
+    job = Job(
+        name=name,
+        payload=json.dumps(kwargs),
+        max_attempts=current_app.config['JOB_MAX_ATTEMPTS']
+    )
+    db.session.add(job)
+    db.session.info.setdefault('pending_jobs', []).append((job, datetime.utcnow()))
+    return job
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_committed_jobs(session):
+    """Hand jobs committed by this session to the runner"""
+    jobs = session.info.pop('pending_jobs', None)
+    if not jobs:
+        return
+    app = current_app._get_current_object()
+    for job, enqueued_at in jobs:
+        # Attributes are expired after commit; the identity key is not,
+        # so no SQL is emitted here
+        identity = inspect(job).identity
+        if identity:
+            job_runner.submit(app, identity[0], enqueued_at)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_jobs(session):
+    """Forget jobs whose transaction never committed"""
+    session.info.pop('pending_jobs', None)
+
+class JobRunner:
+    """Bounded thread pool that executes persisted jobs"""
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._retried = 0
+        self._latencies = deque(maxlen=500)
+        self._durations = deque(maxlen=500)
+
+    def init_app(self, app):
+        """Register the runner with the application"""
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_QUEUE_SIZE', 100)
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 3)
+        app.config.setdefault('JOB_RETRY_DELAY', 5)
+        app.config.setdefault('JOB_RUNNER_EAGER', False)
+        app.config.setdefault('JOB_LEASE_SECONDS', 600)
+        app.extensions['job_runner'] = self
+
+    def _ensure_executor(self, app):
+        """Create the pool lazily, and again after a fork"""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                workers = app.config['JOB_WORKERS']
+                self._executor = ThreadPoolExecutor(max_workers=workers,
+                                                    thread_name_prefix='job-worker')
+                self._slots = threading.BoundedSemaphore(workers + app.config['JOB_QUEUE_SIZE'])
+                self._pid = os.getpid()
+
+    def submit(self, app, job_id, created_at=None):
+        """Schedule a committed job for execution"""
+        enqueued_at = created_at or datetime.utcnow()
+
+        if app.config['JOB_RUNNER_EAGER'] or app.testing:
+            self._run(app, job_id, enqueued_at)
+            return
+
+        self._ensure_executor(app)
+        if not self._slots.acquire(blocking=False):
+            # Queue is full: apply back-pressure by running in the caller
+            self._run(app, job_id, enqueued_at)
+            return
+
+        with self._lock:
+            self._queued += 1
+        self._executor.submit(self._run_queued, app, job_id, enqueued_at)
+
+    def _run_queued(self, app, job_id, enqueued_at):
+        """Executor entry point; frees the queue slot when done"""
+        with self._lock:
+            self._queued -= 1
+        try:
+            self._run(app, job_id, enqueued_at)
+        finally:
+            self._slots.release()
+
+    def _run(self, app, job_id, enqueued_at):
+        """Execute one attempt of a job in its own app context"""
+        from app.models import Job
+
+        with self._lock:
+            self._running += 1
+        started = time.perf_counter()
+        outcome = None
+
+        try:
+            with app.app_context():
+                # Claim the job; another worker may have claimed it already
+                claimed = db.session.execute(
+                    db.update(Job)
+                    .where(Job.id == job_id, Job.status == 'pending')
+                    .values(status='running', attempts=Job.attempts + 1, started_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.session.commit()
+                if not claimed:
+                    return
+                job = db.session.get(Job, job_id)
+
+                try:
+                    func = _tasks[job.name]
+                    func(**json.loads(job.payload or '{}'))
+                except Exception as e:
+                    db.session.rollback()
+                    job.last_error = repr(e)
+                    if job.attempts < job.max_attempts:
+                        job.status = 'pending'
+                        outcome = 'retry'
+                    else:
+                        job.status = 'failed'
+                        job.finished_at = datetime.utcnow()
+                        outcome = 'failed'
+                    db.session.commit()
+                    app.logger.warning('Job %s (%s) failed: %r', job_id, job.name, e)
+                else:
+                    job.status = 'done'
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+                    outcome = 'done'
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._durations.append(time.perf_counter() - started)
+                if outcome == 'retry':
+                    self._retried += 1
+                elif outcome == 'failed':
+                    self._failed += 1
+                elif outcome == 'done':
+                    self._completed += 1
+                    self._latencies.append((datetime.utcnow() - enqueued_at).total_seconds())
+
+        if outcome == 'retry':
+            self._schedule_retry(app, job_id, enqueued_at)
+
+    def _schedule_retry(self, app, job_id, enqueued_at):
+        """Re-submit a failed job after JOB_RETRY_DELAY seconds"""
+        if app.config['JOB_RUNNER_EAGER'] or app.testing:
+            self._run(app, job_id, enqueued_at)
+            return
+        timer = threading.Timer(app.config['JOB_RETRY_DELAY'], self.submit,
+                                args=(app, job_id, enqueued_at))
+        timer.daemon = True
+        timer.start()
+
+    def recover(self, app):
+        """Re-submit pending jobs, and jobs whose worker's lease has expired
+
+        Every worker process calls this on startup; the claim in _run()
+        keeps each job from running more than once.
+        """
+        from app.models import Job
+
+        with app.app_context():
+            now = datetime.utcnow()
+            expired = db.and_(Job.status == 'running',
+                              Job.started_at < now - timedelta(seconds=app.config['JOB_LEASE_SECONDS']))
+            db.session.execute(
+                db.update(Job).where(expired, Job.attempts >= Job.max_attempts)
+                .values(status='failed', last_error='Lease expired', finished_at=now)
+                .execution_options(synchronize_session=False))
+            db.session.execute(
+                db.update(Job).where(expired)
+                .values(status='pending')
+                .execution_options(synchronize_session=False))
+            db.session.commit()
+            rows = db.session.query(Job.id, Job.created_at).filter(
+                Job.status == 'pending').order_by(Job.id).all()
+        for job_id, created_at in rows:
+            self.submit(app, job_id, created_at)
+        return len(rows)
+
+    def stats(self):
+        """Queue depth and latency figures for monitoring"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            durations = list(self._durations)
+            return {
+                'queue_depth': self._queued,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'retried': self._retried,
+                'avg_latency_seconds': sum(latencies) / len(latencies) if latencies else 0.0,
+                'p95_latency_seconds': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+                'avg_run_seconds': sum(durations) / len(durations) if durations else 0.0
+            }
+
+job_runner = JobRunner()
+
+@task('delete_uploaded_file')
+def _delete_uploaded_file_job(filename):
+    """Remove an image that is no longer referenced"""
+    delete_uploaded_file(filename)
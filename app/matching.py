@@ -0,0 +1,346 @@
+"""
+Adopter-to-pet matching
+
+Every available pet is held as one row of a feature matrix: species and
+breed (both derived from Pet.breed), age, gender, and an energy level
+read from the description's keywords. An adopter's preferences are
+scored against all rows at once and the top K are returned, so a match
+costs a few array operations however many pets are available.
+
+The matrix is loaded once. Afterwards, pets created, edited, adopted or
+deleted in this process (caught by the session events below) are
+re-read one by one, pets created elsewhere are appended by id, and the
+whole matrix is reloaded every MATCHING_MAX_AGE seconds to pick up other
+processes' edits.
+
+Scoring is vectorized with NumPy (in requirements.txt), and done in plain
+Python over the same columns when it is missing.
+"""
+
+import heapq
+import re
+import threading
+import time
+from array import array
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Pet
+
+try:
+    import numpy as np
+except ImportError:  # optional
+    np = None
+
+# Breed keywords per species, checked in this order ('Persian Cat' is a cat)
+SPECIES_KEYWORDS = (
+    ('cat', ('cat', 'shorthair', 'longhair', 'siamese', 'maine coon', 'persian', 'bengal',
+             'ragdoll', 'tabby', 'sphynx')),
+    ('rabbit', ('rabbit', 'bunny')),
+    ('small_animal', ('guinea pig', 'hamster', 'gerbil', 'ferret', 'rat', 'mouse', 'chinchilla')),
+    ('bird', ('parakeet', 'parrot', 'budgie', 'cockatiel', 'canary', 'bird')),
+    ('dog', ('dog', 'retriever', 'labrador', 'shepherd', 'beagle', 'bulldog', 'poodle', 'boxer',
+             'dachshund', 'husky', 'pit bull', 'chihuahua', 'collie', 'shih tzu', 'terrier',
+             'spaniel', 'hound', 'corgi', 'rottweiler', 'doberman', 'pug'))
+)
+SPECIES = ('other',) + tuple(species for species, _ in SPECIES_KEYWORDS)
+
+# Breeds that count as the same family when an adopter asks for one of them
+BREED_FAMILIES = {
+    'retriever': ('retriever', 'labrador'),
+    'shepherd': ('shepherd', 'collie', 'husky'),
+    'terrier': ('terrier', 'pit bull'),
+    'hound': ('hound', 'beagle', 'dachshund'),
+    'longhair': ('longhair', 'persian', 'maine coon', 'ragdoll'),
+    'shorthair': ('shorthair', 'tabby', 'siamese', 'bengal')
+}
+
+ENERGY_KEYWORDS = {
+    1: ('energetic', 'active', 'playful', 'hyper', 'athletic', 'lively', 'bouncy',
+        'long walks', 'fetch', 'loves to run'),
+    -1: ('calm', 'gentle', 'quiet', 'relaxed', 'mellow', 'lazy', 'laid-back', 'couch',
+         'cuddles', 'shy')
+}
+ENERGY_LEVELS = {'low': -1.0, 'medium': 0.0, 'high': 1.0}
+GENDERS = ('male', 'female')
+
+# NumPy dtype of each array typecode the matrix uses
+_DTYPES = {'q': 'int64', 'i': 'int32', 'b': 'int8', 'd': 'float64'}
+
+# Points each preference adds at a perfect match
+WEIGHTS = {'breed': 3.0, 'age': 2.0, 'gender': 1.0, 'energy': 2.0}
+# Years outside the wanted age range at which the age points reach zero
+AGE_TOLERANCE = 3.0
+
+_ENERGY_PATTERNS = {level: re.compile(r'\b(' + '|'.join(re.escape(word) for word in words) + r')\b')
+                    for level, words in ENERGY_KEYWORDS.items()}
+
+def species_of(breed):
+    """Species of a breed name, 'other' when no keyword matches"""
+    breed = (breed or '').lower()
+    for species, keywords in SPECIES_KEYWORDS:
+        if any(keyword in breed for keyword in keywords):
+            return species
+    return 'other'
+
+def energy_of(description):
+    """Energy level from -1 (calm) to 1 (energetic) by the description's keywords; 0 when none"""
+    description = (description or '').lower()
+    high = len(_ENERGY_PATTERNS[1].findall(description))
+    low = len(_ENERGY_PATTERNS[-1].findall(description))
+    return (high - low) / (high + low) if high + low else 0.0
+
+def breed_matches(wanted, breed):
+    """Whether a breed is one the adopter asked for, or of the same family"""
+    wanted, breed = wanted.lower().strip(), (breed or '').lower()
+    if not wanted:
+        return False
+    if wanted in breed:
+        return True
+    families = [keywords for family, keywords in BREED_FAMILIES.items()
+                if family in wanted or any(keyword in wanted for keyword in keywords)]
+    return any(keyword in breed for keywords in families for keyword in keywords)
+
+def features(pet_id, breed, age, gender, description):
+    """Feature row of a pet, in FeatureMatrix column order"""
+    return (pet_id, SPECIES.index(species_of(breed)), float(age or 0),
+            GENDERS.index(gender) if gender in GENDERS else -1, energy_of(description))
+
+class FeatureMatrix:
+    """Feature rows of the available pets; removed rows are blanked until a compaction drops them"""
+
+    TYPECODES = {'id': 'q', 'species': 'b', 'age': 'd', 'gender': 'b', 'energy': 'd', 'alive': 'b'}
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.columns = {column: array(code) for column, code in self.TYPECODES.items()}
+        self.positions = {}
+        self.breeds = []  # breed name per breed code, for breed preferences
+        self.breed_codes = {}
+        self.breed_column = array('i')
+        self.last_id = 0
+        self._snapshot = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def upsert(self, breed, row):
+        """Add a pet's feature row, or overwrite the one it already has"""
+        code = self.breed_codes.setdefault(breed or '', len(self.breed_codes))
+        if code == len(self.breeds):
+            self.breeds.append(breed or '')
+        position = self.positions.get(row[0])
+        if position is None:
+            position = len(self.columns['id'])
+            self.positions[row[0]] = position
+            for column, value in zip(self.columns.values(), row + (1,)):
+                column.append(value)
+            self.breed_column.append(code)
+        else:
+            for column, value in zip(self.columns.values(), row + (1,)):
+                column[position] = value
+            self.breed_column[position] = code
+        self.last_id = max(self.last_id, row[0])
+        self._snapshot = None
+
+    def remove(self, pet_id):
+        position = self.positions.pop(pet_id, None)
+        if position is None:
+            return
+        self.columns['alive'][position] = 0
+        self._snapshot = None
+        # Compact once most rows are blank
+        blank = len(self.columns['id']) - len(self.positions)
+        if blank > 1000 and blank > len(self.positions):
+            self._compact()
+
+    def _compact(self):
+        columns, breed_column = self.columns, self.breed_column
+        keep = sorted(self.positions.values())
+        self.columns = {name: array(code, (columns[name][i] for i in keep))
+                        for name, code in self.TYPECODES.items()}
+        self.breed_column = array('i', (breed_column[i] for i in keep))
+        self.positions = {self.columns['id'][i]: i for i in range(len(keep))}
+
+    def snapshot(self):
+        """Columns as NumPy arrays (copies, so updates stay possible), or the arrays themselves"""
+        if np is None:
+            return dict(self.columns, breed=self.breed_column)
+        if self._snapshot is None:
+            columns = dict(self.columns, breed=self.breed_column)
+            self._snapshot = {name: np.frombuffer(values, dtype=_DTYPES[values.typecode]).copy()
+                              if len(values) else np.zeros(0, dtype=_DTYPES[values.typecode])
+                              for name, values in columns.items()}
+        return self._snapshot
+
+class Matcher:
+    """Feature matrix of the available pets, and top-K scoring against it"""
+
+    def __init__(self):
+        self.batch_size = 10000
+        self.max_age = 300
+        self._lock = threading.Lock()
+        self.matrix = FeatureMatrix()
+        self._pending = set()
+        self._loaded_at = None
+
+    def init_app(self, app):
+        """Read the configuration and start from an empty matrix"""
+        app.config.setdefault('MATCHING_MAX_AGE', 300)
+        app.config.setdefault('ANALYTICS_BATCH_SIZE', 10000)
+        self.max_age = app.config['MATCHING_MAX_AGE']
+        self.batch_size = app.config['ANALYTICS_BATCH_SIZE']
+        with self._lock:
+            self.matrix.clear()
+            self._pending.clear()
+            self._loaded_at = None
+        app.extensions['matcher'] = self
+
+    def changed(self, pet_ids):
+        """Re-read these pets before the next match"""
+        with self._lock:
+            self._pending.update(pet_ids)
+
+    def _load(self, statement):
+        result = db.session.execute(statement.execution_options(yield_per=self.batch_size))
+        for rows in result.partitions():
+            for row in rows:
+                self.matrix.upsert(row.breed, features(row.pet_id, row.breed, row.age, row.gender,
+                                                       row.description))
+
+    def refresh(self):
+        """Reload when too old, else append new pets and re-read the changed ones"""
+        columns = db.select(Pet.pet_id, Pet.breed, Pet.age, Pet.gender, Pet.description)
+        available = columns.where(Pet.status == 'available')
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age:
+            self.matrix.clear()
+            self._pending.clear()
+            self._loaded_at = time.monotonic()
+            self._load(available.order_by(Pet.pet_id))
+            return
+        self._load(available.where(Pet.pet_id > self.matrix.last_id).order_by(Pet.pet_id))
+        if self._pending:
+            pending, self._pending = self._pending, set()
+            for pet_id in pending:
+                self.matrix.remove(pet_id)
+            self._load(available.where(Pet.pet_id.in_(pending)))
+
+    def match(self, species=None, breed=None, min_age=None, max_age=None, gender=None,
+              energy=None, limit=10):
+        """[(pet_id, score, share of the best possible score)] of the best matching available pets
+
+        species is a hard filter; the other preferences add points. Ties
+        go to the pet that has waited longest (lowest pet_id).
+        """
+        with self._lock:
+            self.refresh()
+            matrix = self.matrix
+            columns = matrix.snapshot()
+            breed_codes = [code for code, name in enumerate(matrix.breeds)
+                           if breed and breed_matches(breed, name)]
+            preferences = {
+                'species': SPECIES.index(species) if species else None,
+                'breed': breed_codes if breed else None,
+                'age': (min_age, max_age) if min_age is not None or max_age is not None else None,
+                'gender': GENDERS.index(gender) if gender else None,
+                'energy': ENERGY_LEVELS[energy] if energy else None
+            }
+            score = _score_numpy if np is not None else _score_python
+            best = score(columns, preferences, limit)
+        possible = sum(weight for key, weight in WEIGHTS.items() if preferences[key] is not None)
+        return [(pet_id, round(points, 3), round(points / possible, 3) if possible else None)
+                for pet_id, points in best]
+
+def _age_points(age, min_age, max_age):
+    distance = max(0.0, (min_age if min_age is not None else age) - age) + \
+        max(0.0, age - (max_age if max_age is not None else age))
+    return WEIGHTS['age'] * max(0.0, 1 - distance / AGE_TOLERANCE)
+
+def _score_numpy(columns, preferences, limit):
+    """Scores for every row in a few array operations, then a partial sort for the top K"""
+    points = np.zeros(len(columns['id']))
+    candidates = columns['alive'] == 1
+    if preferences['species'] is not None:
+        candidates &= columns['species'] == preferences['species']
+    if preferences['breed'] is not None:
+        points += WEIGHTS['breed'] * np.isin(columns['breed'], preferences['breed'])
+    if preferences['age'] is not None:
+        min_age, max_age = preferences['age']
+        age = columns['age']
+        distance = np.zeros(len(age))
+        if min_age is not None:
+            distance += np.clip(min_age - age, 0, None)
+        if max_age is not None:
+            distance += np.clip(age - max_age, 0, None)
+        points += WEIGHTS['age'] * np.clip(1 - distance / AGE_TOLERANCE, 0, 1)
+    if preferences['gender'] is not None:
+        points += WEIGHTS['gender'] * (columns['gender'] == preferences['gender'])
+    if preferences['energy'] is not None:
+        points += WEIGHTS['energy'] * (1 - np.abs(columns['energy'] - preferences['energy']) / 2)
+
+    rows = np.flatnonzero(candidates)
+    if not len(rows) or limit <= 0:
+        return []
+    limit = min(limit, len(rows))
+    # Everything scoring at least the K-th best, then ordered by score and pet_id
+    kth = np.partition(points[rows], len(rows) - limit)[len(rows) - limit]
+    rows = rows[points[rows] >= kth]
+    order = np.lexsort((columns['id'][rows], -points[rows]))[:limit]
+    return [(int(columns['id'][row]), float(points[row])) for row in rows[order]]
+
+def _score_python(columns, preferences, limit):
+    """The same scores row by row, with a heap for the top K"""
+    breed_codes = set(preferences['breed'] or ())
+
+    def scored():
+        for pet_id, species, age, gender, energy, alive, breed in zip(
+                columns['id'], columns['species'], columns['age'], columns['gender'],
+                columns['energy'], columns['alive'], columns['breed']):
+            if not alive or (preferences['species'] is not None and species != preferences['species']):
+                continue
+            points = 0.0
+            if preferences['breed'] is not None and breed in breed_codes:
+                points += WEIGHTS['breed']
+            if preferences['age'] is not None:
+                points += _age_points(age, *preferences['age'])
+            if preferences['gender'] is not None and gender == preferences['gender']:
+                points += WEIGHTS['gender']
+            if preferences['energy'] is not None:
+                points += WEIGHTS['energy'] * (1 - abs(energy - preferences['energy']) / 2)
+            yield points, -pet_id
+
+    return [(-negative_id, points) for points, negative_id in heapq.nlargest(limit, scored())]
+
+matcher = Matcher()
+
+# Columns the features are built from; edits to anything else don't matter
+_WATCHED = ('status', 'breed', 'age', 'gender', 'description')
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_pets(session, flush_context):
+    """Note pets this flush created, deleted, or changed a feature of"""
+    pets = session.info.setdefault('matching_pets', set())
+    for obj in session.new | session.deleted:
+        if isinstance(obj, Pet):
+            state = inspect(obj)
+            pets.add(state.identity[0] if state.identity else state.mapper.primary_key_from_instance(obj)[0])
+    for obj in session.dirty:
+        if isinstance(obj, Pet):
+            state = inspect(obj)
+            if any(state.attrs[key].history.has_changes() for key in _WATCHED):
+                pets.add(obj.pet_id)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changed_pets(session):
+    """Once committed, have the matcher re-read the noted pets"""
+    pet_ids = session.info.pop('matching_pets', None)
+    if pet_ids:
+        matcher.changed(pet_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_pets(session):
+    session.info.pop('matching_pets', None)
@@ -0,0 +1,82 @@
+"""
+Pets whose medical records changed
+
+medical_summary and due_treatments both rebuild per-pet data from the
+pet's medical records. Instead of each watching the session, they
+register a handler here: the pets whose records a flush inserted, edited
+or deleted, or that a Query.delete() removed, are collected once and
+handed to every handler in the same transaction.
+"""
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import MedicalRecord
+
+# Record columns whose change affects the pet's derived data
+TRACKED = ('pet_id', 'treatment_type', 'treat_date', 'vaccines')
+
+_handlers = []
+
+def on_change(handler):
+    """Register handler(session, pet_ids), called with the pets whose records changed"""
+    _handlers.append(handler)
+    return handler
+
+def _notify(session, pet_ids):
+    pet_ids = {pet_id for pet_id in pet_ids if pet_id is not None}
+    if not pet_ids:
+        return
+    for handler in _handlers:
+        handler(session, pet_ids)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_records(session, flush_context):
+    """Note the pets whose records this flush changed
+
+    Runs after the flush so foreign keys set through relationships are
+    populated, while new/dirty/deleted and attribute history still
+    describe what was written.
+    """
+    pets = session.info.setdefault('medical_changed_pets', set())
+    for obj in session.new | session.deleted:
+        if isinstance(obj, MedicalRecord):
+            pets.add(obj.pet_id)
+    for obj in session.dirty:
+        if not isinstance(obj, MedicalRecord):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in TRACKED):
+            continue
+        pets.update(state.attrs.pet_id.history.deleted)
+        pets.add(obj.pet_id)
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _notify_after_flush(session, flush_context):
+    """Hand the pets noted during the flush to the handlers"""
+    pet_ids = session.info.pop('medical_changed_pets', None)
+    if pet_ids:
+        _notify(session, pet_ids)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_delete_records(orm_execute_state):
+    """Query.delete() on medical records: find the pets first, notify after"""
+    if not orm_execute_state.is_delete:
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not MedicalRecord:
+        return None
+
+    session = orm_execute_state.session
+    affected = db.select(MedicalRecord.pet_id).distinct()
+    if orm_execute_state.statement.whereclause is not None:
+        affected = affected.where(orm_execute_state.statement.whereclause)
+    pet_ids = set(session.execute(affected).scalars())
+    result = orm_execute_state.invoke_statement()
+    _notify(session, pet_ids)
+    return result
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pets(session):
+    session.info.pop('medical_changed_pets', None)
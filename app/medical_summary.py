@@ -0,0 +1,68 @@
+"""
+Denormalized medical summary on pets
+
+Pet.medical_record_count, Pet.last_treat_date and Pet.last_vaccine_date
+mirror the pet's medical_records rows so lists can sort and filter by
+health status without a correlated subquery per pet.
+
+app.medical_changes reports the pets whose records were inserted,
+updated or deleted (including Query.delete() bulk deletes) and their
+summary is recomputed from medical_records in the same transaction, so the columns
+can never drift from the rows they describe. Rows written with Core
+(bulk loaders, raw SQL) bypass the events; `flask backfill-medical-summary`
+recomputes every pet.
+"""
+
+from sqlalchemy import inspect
+
+from app import db, medical_changes
+from app.models import Pet, MedicalRecord
+
+SUMMARY_COLUMNS = ('medical_record_count', 'last_treat_date', 'last_vaccine_date')
+
+def _summary_values():
+    """Correlated subqueries computing each summary column for the pets row being updated"""
+    for_pet = MedicalRecord.pet_id == Pet.__table__.c.pet_id
+    return {
+        'medical_record_count': db.select(db.func.count(MedicalRecord.id)).where(for_pet).scalar_subquery(),
+        'last_treat_date': db.select(db.func.max(MedicalRecord.treat_date)).where(for_pet).scalar_subquery(),
+        'last_vaccine_date': db.select(db.func.max(MedicalRecord.treat_date)).where(
+            for_pet, MedicalRecord.has_vaccines()).scalar_subquery()
+    }
+
+def recompute(connection, pet_ids):
+    """Recompute the summary of the given pets from their medical records"""
+    pet_ids = sorted(pet_id for pet_id in pet_ids if pet_id is not None)
+    if not pet_ids:
+        return 0
+    pets = Pet.__table__
+    result = connection.execute(
+        pets.update().where(pets.c.pet_id.in_(pet_ids)).values(**_summary_values()))
+    return result.rowcount
+
+def backfill(batch_size=1000):
+    """Recompute every pet's summary in pet_id batches, committing after each"""
+    updated = 0
+    last_id = 0
+    while True:
+        pet_ids = db.session.execute(
+            db.select(Pet.pet_id).where(Pet.pet_id > last_id).order_by(Pet.pet_id).limit(batch_size)
+        ).scalars().all()
+        if not pet_ids:
+            return updated
+        updated += recompute(db.session.connection(), pet_ids)
+        db.session.commit()
+        last_id = pet_ids[-1]
+
+@medical_changes.on_change
+def _recompute_changed(session, pet_ids):
+    """Bring the summary columns of pets whose records changed up to date"""
+    recompute(session.connection(), pet_ids)
+    _expire_loaded(session, pet_ids)
+
+def _expire_loaded(session, pet_ids):
+    """Make already-loaded pets reload the columns updated behind the ORM's back"""
+    for pet_id in pet_ids:
+        pet = session.identity_map.get(inspect(Pet).identity_key_from_primary_key((pet_id,)))
+        if pet is not None:
+            session.expire(pet, SUMMARY_COLUMNS)
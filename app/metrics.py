@@ -0,0 +1,362 @@
+"""
+Prometheus metrics for the Pet Management System
+
+Counters, gauges and histograms live in a per-process registry guarded
+by a single short lock. When METRICS_MULTIPROC_DIR is set, every process
+periodically writes its snapshot to that directory and /metrics sums
+the snapshots of all workers, so a scrape that lands on any pre-forked
+worker sees the whole server. At the next scrape, the counters and
+histograms of a worker that has exited are merged into an archive
+snapshot and its own file is deleted, so recycling workers never makes a
+counter go down (which Prometheus would read as a reset); its gauges are
+dropped.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+
+from app import db
+
+try:
+    import fcntl
+except ImportError:  # optional (Windows)
+    fcntl = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Totals of exited workers, in METRICS_MULTIPROC_DIR
+ARCHIVE_FILENAME = 'archive.json'
+
+def _label_key(labels):
+    """Hashable, order-independent form of a label dict"""
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value):
+    """Escape a label value for the text exposition format"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(label_key, extra=()):
+    """Render {name="value",...} for a label key"""
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+def _pid_alive(pid):
+    """Whether a worker process is still running"""
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        # Running, but as another user
+        return True
+    except OSError:
+        return False
+    return True
+
+def _read_snapshot(path):
+    """A snapshot file's contents, or None if it is missing or half-written"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_snapshot(path, snap):
+    """Replace a snapshot file atomically"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snap, f)
+    os.replace(tmp_path, path)
+
+def _aggregate(snapshots):
+    """Sum counters, gauges and histograms over snapshots, by name and labels"""
+    counters = defaultdict(float)
+    gauges = defaultdict(float)
+    histograms = {}
+    for snap in snapshots:
+        for name, labels, value in snap['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, value in snap['gauges']:
+            gauges[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, buckets, total, count in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            hist = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            hist[0] = [a + b for a, b in zip(hist[0], buckets)]
+            hist[1] += total
+            hist[2] += count
+    return counters, gauges, histograms
+
+@contextmanager
+def _archive_lock(directory):
+    """Hold an exclusive lock on the archive across processes"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, f'{ARCHIVE_FILENAME}.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class MetricsRegistry:
+    """In-process metric store with Prometheus text rendering"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._gauge_callbacks = {}
+        self._histograms = {}
+        self._app = None
+        self._flusher = None
+        self._flusher_pid = None
+
+    # Declaration
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text, None)
+
+    def gauge(self, name, help_text, callback=None):
+        """Declare a gauge; callback() is sampled at snapshot time if given"""
+        self._meta[name] = ('gauge', help_text, None)
+        if callback is not None:
+            self._gauge_callbacks[name] = callback
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+
+    # Recording
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] += value
+
+    def set(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self._meta[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+                    break
+            hist[1] += value
+            hist[2] += 1
+
+    # Snapshots
+
+    def snapshot(self):
+        """JSON-serializable copy of this process's metrics"""
+        gauges = {}
+        for name, callback in self._gauge_callbacks.items():
+            try:
+                gauges[(name, ())] = float(callback())
+            except Exception:
+                continue
+        with self._lock:
+            gauges.update(self._gauges)
+            return {
+                'pid': os.getpid(),
+                'counters': [[n, list(l), v] for (n, l), v in self._counters.items()],
+                'gauges': [[n, list(l), v] for (n, l), v in gauges.items()],
+                'histograms': [[n, list(l), list(h[0]), h[1], h[2]]
+                               for (n, l), h in self._histograms.items()]
+            }
+
+    def _snapshot_path(self, directory, pid):
+        return os.path.join(directory, f'metrics_{pid}.json')
+
+    def write_snapshot(self):
+        """Persist this process's snapshot for other workers to read"""
+        directory = self._app.config.get('METRICS_MULTIPROC_DIR') if self._app else None
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        _write_snapshot(self._snapshot_path(directory, os.getpid()), self.snapshot())
+
+    def _archive(self, directory, path):
+        """Fold an exited worker's counters and histograms into the archive
+
+        Under the lock the file is read again, so a snapshot that another
+        worker already archived and deleted is not counted twice.
+        """
+        with _archive_lock(directory):
+            snap = _read_snapshot(path)
+            if snap is None:
+                return
+            archive_path = os.path.join(directory, ARCHIVE_FILENAME)
+            archive = _read_snapshot(archive_path) or {'counters': [], 'gauges': [], 'histograms': []}
+            counters, _, histograms = _aggregate([archive, dict(snap, gauges=[])])
+            _write_snapshot(archive_path, {
+                'pid': None,
+                'counters': [[n, list(l), v] for (n, l), v in counters.items()],
+                'gauges': [],
+                'histograms': [[n, list(l), h[0], h[1], h[2]]
+                               for (n, l), h in histograms.items()]
+            })
+            os.remove(path)
+
+    def _collect(self):
+        """Snapshots of every worker, this process's taken live"""
+        own = self.snapshot()
+        snapshots = [own]
+        directory = self._app.config.get('METRICS_MULTIPROC_DIR') if self._app else None
+        if directory and os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if not (filename.startswith('metrics_') and filename.endswith('.json')):
+                    continue
+                path = os.path.join(directory, filename)
+                snap = _read_snapshot(path)
+                if snap is None or snap.get('pid') == own['pid']:
+                    continue
+                if not _pid_alive(snap.get('pid', 0)):
+                    # Left by a worker that exited or was recycled
+                    try:
+                        self._archive(directory, path)
+                    except OSError as e:
+                        self._app.logger.warning('Failed to archive metrics snapshot: %r', e)
+                    continue
+                snapshots.append(snap)
+            archive = _read_snapshot(os.path.join(directory, ARCHIVE_FILENAME))
+            if archive is not None:
+                snapshots.append(archive)
+        return snapshots
+
+    def render(self):
+        """Aggregate all workers and render the text exposition format"""
+        counters, gauges, histograms = _aggregate(self._collect())
+
+        lines = []
+        for name in sorted(self._meta):
+            kind, help_text, buckets = self._meta[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{_format_labels(labels, [("le", repr(bound))])} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {count}')
+            else:
+                values = counters if kind == 'counter' else gauges
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    # Flask integration
+
+    def _ensure_flusher(self):
+        """Start the snapshot writer thread once per process"""
+        if not self._app.config.get('METRICS_MULTIPROC_DIR'):
+            return
+        if self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        interval = self._app.config['METRICS_FLUSH_INTERVAL']
+
+        def flush_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot()
+                except OSError as e:
+                    self._app.logger.warning('Failed to write metrics snapshot: %r', e)
+
+        self._flusher = threading.Thread(target=flush_loop, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def _instrument_pool(self, engine):
+        """Time how long requests wait for a pooled connection"""
+        pool = engine.pool
+        if getattr(pool, '_metrics_instrumented', False):
+            return
+        connect = pool.connect
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                self.observe('db_pool_checkout_wait_seconds', time.perf_counter() - start)
+
+        pool.connect = timed_connect
+        pool._metrics_instrumented = True
+
+    def init_app(self, app):
+        """Register request hooks and the /metrics endpoint"""
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_MULTIPROC_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 5.0)
+        app.config.setdefault('METRICS_TOKEN', None)
+        self._app = app
+        app.extensions['metrics'] = self
+
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        with app.app_context():
+            for engine in db.engines.values():
+                self._instrument_pool(engine)
+
+        @app.before_request
+        def _start_request_timer():
+            g._metrics_start_time = time.perf_counter()
+            self._ensure_flusher()
+
+        @app.after_request
+        def _record_request(response):
+            start = g.get('_metrics_start_time')
+            if start is None:
+                return response
+            endpoint = request.endpoint or 'unknown'
+            self.observe('http_request_duration_seconds', time.perf_counter() - start,
+                         endpoint=endpoint, method=request.method)
+            self.inc('http_requests_total', endpoint=endpoint, method=request.method,
+                     status=response.status_code)
+            sql_stats = g.get('_sql_stats')
+            if sql_stats is not None:
+                self.inc('db_queries_total', sql_stats['count'], endpoint=endpoint)
+                self.inc('db_query_seconds_total', sql_stats['time'], endpoint=endpoint)
+            return response
+
+        def metrics_view():
+            token = app.config['METRICS_TOKEN']
+            if token and request.headers.get('Authorization') != f'Bearer {token}':
+                abort(401)
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+metrics = MetricsRegistry()
+
+metrics.histogram('http_request_duration_seconds', 'Request latency by endpoint')
+metrics.counter('http_requests_total', 'Requests by endpoint, method and status')
+metrics.histogram('db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled DB connection')
+metrics.counter('db_queries_total', 'SQL statements issued by endpoint')
+metrics.counter('db_query_seconds_total', 'Time spent in SQL by endpoint')
+metrics.counter('cache_requests_total', 'Cache lookups by cache and result (hit or miss)')
+metrics.counter('upload_bytes_total', 'Bytes of uploaded images saved')
+metrics.counter('compressed_responses_total', 'Responses compressed by Content-Encoding')
+metrics.counter('compression_bytes_saved_total', 'Bytes saved by compressing buffered responses')
@@ -4,6 +4,17 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from app import db
 
+# List views show at most this many characters of a long text column
+SNIPPET_LENGTH = 100
+
+def snippet(column):
+    """Deferred SQL-side prefix of a text column for list views
+
+    One character more than SNIPPET_LENGTH is fetched so templates can
+    tell whether to append an ellipsis.
+    """
+    return db.column_property(db.func.substr(column, 1, SNIPPET_LENGTH + 1), deferred=True)
+
 class User(UserMixin, db.Model):
     """User model for authentication and role management"""
     __tablename__ = 'users'
@@ -38,6 +49,32 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+class Shelter(db.Model):
+    """Shelter location that pets' shelter_no points to, with its current occupancy"""
+    __tablename__ = 'shelters'
+    
+    shelter_no = db.Column(db.String(50), primary_key=True)  # normalized, see app.shelters
+    name = db.Column(db.String(100))
+    # Pets per status, maintained by app.shelters
+    available_count = db.Column(db.Integer, nullable=False, default=0)
+    foster_count = db.Column(db.Integer, nullable=False, default=0)
+    adopted_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Serialize shelter and its occupancy for JSON responses"""
+        return {
+            'shelter_no': self.shelter_no,
+            'name': self.name,
+            'available': self.available_count,
+            'foster': self.foster_count,
+            'adopted': self.adopted_count,
+            'in_care': self.available_count + self.foster_count
+        }
+    
+    def __repr__(self):
+        return f'<Shelter {self.shelter_no}>'
+
 class Pet(db.Model):
     """Pet model for animal records"""
     __tablename__ = 'pets'
@@ -47,40 +84,165 @@ class Pet(db.Model):
     breed = db.Column(db.String(100), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     gender = db.Column(db.Enum('male', 'female', name='pet_genders'), nullable=False)
-    status = db.Column(db.Enum('available', 'adopted', 'foster', name='pet_status'), 
-                      default='available', nullable=False)
+    # active_history: changing an expired pet's status loads the old one, so
+    # app.status_history records where the pet came from
+    status = db.column_property(
+        db.Column(db.Enum('available', 'adopted', 'foster', name='pet_status'),
+                  default='available', nullable=False),
+        active_history=True)
     description = db.Column(db.Text)
     img_url = db.Column(db.String(500))
-    shelter_no = db.Column(db.String(50))
+    # active_history: moving an expired pet loads the shelter it leaves, so
+    # app.shelters can decrement that shelter's counter
+    shelter_no = db.column_property(
+        db.Column(db.String(50), db.ForeignKey('shelters.shelter_no'), index=True),
+        active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    description_snippet = snippet(description)
+    
+    # Medical summary, maintained from medical_records by app.medical_summary
+    medical_record_count = db.Column(db.Integer, nullable=False, default=0)
+    last_treat_date = db.Column(db.Date, index=True)
+    last_vaccine_date = db.Column(db.Date, index=True)
     
     # Relationships
     adoptions = db.relationship('Adoption', backref='pet', lazy='dynamic')
     medical_records = db.relationship('MedicalRecord', backref='pet', lazy='dynamic')
     
+    # Optimistic concurrency: every UPDATE checks and bumps the version
+    __mapper_args__ = {'version_id_col': version}
+    
+    @staticmethod
+    def list_columns():
+        """Loader options for list views: the description is swapped for its snippet"""
+        return (db.defer(Pet.description), db.undefer(Pet.description_snippet))
+    
+    def to_dict(self):
+        """Serialize pet for JSON responses"""
+        return {
+            'pet_id': self.pet_id,
+            'pet_name': self.pet_name,
+            'breed': self.breed,
+            'age': self.age,
+            'gender': self.gender,
+            'status': self.status,
+            'description': self.description,
+            'img_url': self.img_url,
+            'shelter_no': self.shelter_no,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'version': self.version
+        }
+    
     def __repr__(self):
         return f'<Pet {self.pet_name}>'
 
+class Donor(db.Model):
+    """A person who gives, identified by normalized email and phone (see app.donors)"""
+    __tablename__ = 'donors'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    email_key = db.Column(db.String(120), unique=True, nullable=False)
+    phone_key = db.Column(db.String(20), index=True)
+    # As given on the donor's first donation (the phone on the first one that had one)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    donations = db.relationship('Donation', backref='donor', lazy='dynamic')
+    
+    def to_dict(self):
+        """Serialize donor for JSON responses"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'phone': self.phone,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Donor {self.email_key}>'
+
 class Donation(db.Model):
     """Donation model for financial contributions"""
     __tablename__ = 'donations'
     
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
-    purpose = db.Column(db.String(200))
+    # active_history on amount, purpose, date and user_id: editing an
+    # expired donation loads the old values, so app.donation_rollups can
+    # decrement the bucket it leaves
+    amount = db.column_property(db.Column(db.Numeric(10, 2), nullable=False), active_history=True)
+    purpose = db.column_property(db.Column(db.String(200)), active_history=True)
     donor_name = db.Column(db.String(100), nullable=False)
     donor_email = db.Column(db.String(120), nullable=False)
     donor_phone = db.Column(db.String(20))
     message = db.Column(db.Text)
-    date = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    date = db.column_property(db.Column(db.DateTime, default=datetime.utcnow), active_history=True)
+    user_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True),
+        active_history=True)
+    # Linked on write by app.donors from the donor's email and phone
+    donor_id = db.Column(db.Integer, db.ForeignKey('donors.id'), nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
     
     # Relationships
     medical_records = db.relationship('MedicalRecord', backref='donation', lazy='dynamic')
     
+    __table_args__ = (
+        db.Index('idx_donations_donor_date', 'donor_id', 'date'),
+    )
+    
+    __mapper_args__ = {'version_id_col': version}
+    
+    def to_dict(self):
+        """Serialize donation for JSON responses"""
+        return {
+            'id': self.id,
+            'amount': float(self.amount) if self.amount is not None else None,
+            'purpose': self.purpose,
+            'donor_name': self.donor_name,
+            'donor_email': self.donor_email,
+            'donor_phone': self.donor_phone,
+            'message': self.message,
+            'date': self.date.isoformat() if self.date else None,
+            'user_id': self.user_id,
+            'donor_id': self.donor_id,
+            'version': self.version
+        }
+    
     def __repr__(self):
         return f'<Donation {self.amount} by {self.donor_name}>'
 
+class DonationDailyTotal(db.Model):
+    """Donation count and total for one day, purpose and employee"""
+    __tablename__ = 'donation_daily_totals'
+    
+    # purpose '' and user_id 0 stand for "none", so the bucket key has no NULLs
+    bucket = db.Column(db.Date, primary_key=True)
+    purpose = db.Column(db.String(200), primary_key=True, default='')
+    user_id = db.Column(db.Integer, primary_key=True, default=0)
+    donation_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DonationDailyTotal {self.bucket} {self.purpose!r} user {self.user_id}: {self.total_amount}>'
+
+class DonationMonthlyTotal(db.Model):
+    """Donation count and total for one month (bucket is its first day), purpose and employee"""
+    __tablename__ = 'donation_monthly_totals'
+    
+    bucket = db.Column(db.Date, primary_key=True)
+    purpose = db.Column(db.String(200), primary_key=True, default='')
+    user_id = db.Column(db.Integer, primary_key=True, default=0)
+    donation_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DonationMonthlyTotal {self.bucket} {self.purpose!r} user {self.user_id}: {self.total_amount}>'
+
 class Adoption(db.Model):
     """Adoption model for pet adoptions"""
     __tablename__ = 'adoptions'
@@ -93,6 +255,29 @@ class Adoption(db.Model):
     date = db.Column(db.DateTime, default=datetime.utcnow)
     address = db.Column(db.Text)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    address_snippet = snippet(address)
+    
+    __mapper_args__ = {'version_id_col': version}
+    
+    @staticmethod
+    def list_columns():
+        """Loader options for list views: the address is swapped for its snippet"""
+        return (db.defer(Adoption.address), db.undefer(Adoption.address_snippet))
+    
+    def to_dict(self):
+        """Serialize adoption for JSON responses"""
+        return {
+            'id': self.id,
+            'adopt_name': self.adopt_name,
+            'adopt_email': self.adopt_email,
+            'adopt_phone': self.adopt_phone,
+            'pet_id': self.pet_id,
+            'date': self.date.isoformat() if self.date else None,
+            'address': self.address,
+            'user_id': self.user_id,
+            'version': self.version
+        }
     
     def __repr__(self):
         return f'<Adoption {self.adopt_name} -> Pet {self.pet_id}>'
@@ -102,13 +287,160 @@ class MedicalRecord(db.Model):
     __tablename__ = 'medical_records'
     
     id = db.Column(db.Integer, primary_key=True)
-    pet_id = db.Column(db.Integer, db.ForeignKey('pets.pet_id'), nullable=False)
+    # active_history: moving an expired record loads the pet it leaves, so
+    # app.medical_changes recomputes that pet as well
+    pet_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('pets.pet_id'), nullable=False),
+        active_history=True)
     treatment_type = db.Column(db.String(200), nullable=False)
     treat_date = db.Column(db.Date, nullable=False)
     donor_id = db.Column(db.Integer, db.ForeignKey('donations.id'), nullable=True)
     vaccines = db.Column(db.Text)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    description_snippet = snippet(description)
     
     def __repr__(self):
         return f'<MedicalRecord {self.treatment_type} for Pet {self.pet_id}>'
+    
+    @staticmethod
+    def list_columns():
+        """Loader options for list views: the description is swapped for its snippet"""
+        return (db.defer(MedicalRecord.description), db.undefer(MedicalRecord.description_snippet))
+    
+    @staticmethod
+    def has_vaccines():
+        """SQL condition for records that list vaccines (the text 'None' means none)"""
+        return db.and_(MedicalRecord.vaccines.isnot(None), MedicalRecord.vaccines != '',
+                       db.func.lower(MedicalRecord.vaccines) != 'none')
+    
+    @staticmethod
+    def summary():
+        """Totals for the medical records list, computed in one aggregate query"""
+        row = db.session.query(
+            db.func.count(MedicalRecord.id),
+            db.func.count(db.distinct(MedicalRecord.pet_id)),
+            db.func.count(db.case((MedicalRecord.has_vaccines(), 1))),
+            db.func.count(MedicalRecord.donor_id)
+        ).one()
+        return {'total': row[0], 'pets': row[1], 'with_vaccines': row[2], 'with_donor': row[3]}
+
+class Vaccination(db.Model):
+    """One vaccine given to a pet, parsed from a medical record's vaccines text"""
+    __tablename__ = 'vaccinations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    medical_record_id = db.Column(db.Integer, db.ForeignKey('medical_records.id', ondelete='CASCADE'),
+                                  nullable=False, index=True)
+    pet_id = db.Column(db.Integer, db.ForeignKey('pets.pet_id'), nullable=False)
+    vaccine_code = db.Column(db.String(50), nullable=False)
+    given_date = db.Column(db.Date, nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    
+    __table_args__ = (
+        db.Index('idx_vaccinations_code_pet_due', 'vaccine_code', 'pet_id', 'due_date'),
+        db.Index('idx_vaccinations_pet_code_given', 'pet_id', 'vaccine_code', 'given_date'),
+        db.Index('idx_vaccinations_due_date', 'due_date'),
+    )
+    
+    def __repr__(self):
+        return f'<Vaccination {self.vaccine_code} for Pet {self.pet_id} due {self.due_date}>'
+
+class DueTreatment(db.Model):
+    """Next due date of a recurring treatment or vaccine for a pet"""
+    __tablename__ = 'due_treatments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    pet_id = db.Column(db.Integer, db.ForeignKey('pets.pet_id', ondelete='CASCADE'), nullable=False)
+    treatment = db.Column(db.String(50), nullable=False)
+    kind = db.Column(db.Enum('vaccine', 'treatment', name='due_treatment_kind'), nullable=False)
+    last_record_id = db.Column(db.Integer, db.ForeignKey('medical_records.id', ondelete='SET NULL'))
+    last_date = db.Column(db.Date, nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('pet_id', 'treatment', name='uq_due_treatments_pet_treatment'),
+        db.Index('idx_due_treatments_due_date', 'due_date', 'pet_id'),
+    )
+    
+    def __repr__(self):
+        return f'<DueTreatment {self.treatment} for Pet {self.pet_id} due {self.due_date}>'
+
+class PetStatusChange(db.Model):
+    """One change of a pet's status, with the pet's breed, age and shelter at the time"""
+    __tablename__ = 'pet_status_changes'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    pet_id = db.Column(db.Integer, db.ForeignKey('pets.pet_id', ondelete='SET NULL'))
+    from_status = db.Column(db.String(20))  # None for the intake
+    to_status = db.Column(db.String(20), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    days_in_previous = db.Column(db.Float)
+    days_since_intake = db.Column(db.Float, nullable=False, default=0)
+    breed = db.Column(db.String(100))
+    age = db.Column(db.Integer)
+    shelter_no = db.Column(db.String(50))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    
+    __table_args__ = (
+        db.Index('idx_pet_status_changes_pet_changed', 'pet_id', 'changed_at'),
+        db.Index('idx_pet_status_changes_to_changed', 'to_status', 'changed_at'),
+    )
+    
+    def __repr__(self):
+        return f'<PetStatusChange Pet {self.pet_id} {self.from_status} -> {self.to_status}>'
+
+class PetStayTotal(db.Model):
+    """Running count and sum of days for a length-of-stay metric, per dimension value"""
+    __tablename__ = 'pet_stay_totals'
+    
+    # metric: 'intake' (pets taken in), 'adoption' (intake to adoption) or 'foster' (time in foster)
+    metric = db.Column(db.String(20), primary_key=True)
+    # dimension: 'all', 'breed', 'age_band' or 'shelter'; key '' for all / unknown
+    dimension = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True, default='')
+    stay_count = db.Column(db.Integer, nullable=False, default=0)
+    total_days = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<PetStayTotal {self.metric} {self.dimension}={self.key!r}: {self.stay_count}>'
+
+class Job(db.Model):
+    """Background job persisted for retries and crash recovery"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text)
+    status = db.Column(db.Enum('pending', 'running', 'done', 'failed', name='job_status'),
+                      default='pending', nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=3, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Job {self.name} {self.status}>'
+
+class AuditLog(db.Model):
+    """Append-only record of every write to the domain tables"""
+    __tablename__ = 'audit_log'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.String(50))
+    action = db.Column(db.Enum('create', 'update', 'delete', 'bulk_delete', 'bulk_update',
+                               name='audit_actions'), nullable=False)
+    user_id = db.Column(db.Integer)
+    changes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        db.Index('idx_audit_log_entity', 'entity', 'entity_id', 'created_at'),
+        db.Index('idx_audit_log_created_at', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<AuditLog {self.action} {self.entity} {self.entity_id}>'
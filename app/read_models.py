@@ -0,0 +1,125 @@
+"""
+Read models for read-only views of the Pet Management System
+
+Read-only pages and their JSON responses don't need identity-mapped,
+change-tracked ORM instances. The queries here select just the columns
+a view shows with Core select() and turn each row into a named tuple
+(tuples with __slots__ = (), so no per-row __dict__). The rows are
+immutable and never enter the session.
+
+Use the ORM models for anything that writes.
+"""
+
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+from app import db
+from app.models import Pet, Donation, MedicalRecord
+
+PetListRow = namedtuple('PetListRow', [
+    'pet_id', 'pet_name', 'breed', 'age', 'gender', 'status',
+    'description_snippet', 'img_url', 'created_at', 'version'
+])
+
+PetRow = namedtuple('PetRow', [
+    'pet_id', 'pet_name', 'breed', 'age', 'gender', 'status',
+    'description', 'img_url', 'shelter_no', 'created_at', 'version'
+])
+
+PetRef = namedtuple('PetRef', ['pet_id', 'pet_name', 'breed', 'age'])
+
+DonationRef = namedtuple('DonationRef', ['id', 'donor_name', 'amount'])
+
+MedicalRecordRow = namedtuple('MedicalRecordRow', [
+    'id', 'pet_id', 'treatment_type', 'treat_date', 'vaccines', 'description'
+])
+
+MedicalRecordListRow = namedtuple('MedicalRecordListRow', [
+    'id', 'pet_id', 'treatment_type', 'treat_date', 'vaccines',
+    'description_snippet', 'created_at', 'pet', 'donation'
+])
+
+class ReadQuery:
+    """A Core select whose rows are turned into read-model tuples"""
+
+    def __init__(self, statement, factory):
+        self.statement = statement
+        self._factory = factory
+
+    def order_by(self, *clauses):
+        return ReadQuery(self.statement.order_by(*clauses), self._factory)
+
+    def exists(self):
+        return self.statement.exists()
+
+    def all(self):
+        return [self._factory(row) for row in db.session.execute(self.statement)]
+
+    def first(self):
+        row = db.session.execute(self.statement.limit(1)).first()
+        return self._factory(row) if row is not None else None
+
+    def iterate(self, batch_size):
+        """Rows fetched batch_size at a time"""
+        result = db.session.execute(self.statement.execution_options(yield_per=batch_size))
+        return map(self._factory, result)
+
+def pets(status=None):
+    """Pets for list pages, newest first"""
+    statement = db.select(
+        Pet.pet_id, Pet.pet_name, Pet.breed, Pet.age, Pet.gender, Pet.status,
+        Pet.description_snippet, Pet.img_url, Pet.created_at, Pet.version
+    ).order_by(Pet.created_at.desc())
+    if status is not None:
+        statement = statement.where(Pet.status == status)
+    return ReadQuery(statement, PetListRow._make)
+
+def pet(pet_id):
+    """One pet with every column, or None"""
+    statement = db.select(
+        Pet.pet_id, Pet.pet_name, Pet.breed, Pet.age, Pet.gender, Pet.status,
+        Pet.description, Pet.img_url, Pet.shelter_no, Pet.created_at, Pet.version
+    ).where(Pet.pet_id == pet_id)
+    return ReadQuery(statement, PetRow._make).first()
+
+def pet_medical_records(pet_id):
+    """A pet's medical records, latest treatment first"""
+    statement = db.select(
+        MedicalRecord.id, MedicalRecord.pet_id, MedicalRecord.treatment_type,
+        MedicalRecord.treat_date, MedicalRecord.vaccines, MedicalRecord.description
+    ).where(MedicalRecord.pet_id == pet_id).order_by(MedicalRecord.treat_date.desc())
+    return ReadQuery(statement, MedicalRecordRow._make).all()
+
+def _medical_record_list_row(row):
+    (record_id, pet_id, treatment_type, treat_date, vaccines, snippet, created_at,
+     pet_name, breed, age, donation_id, donor_name, amount) = row
+    donation = DonationRef(donation_id, donor_name, amount) if donation_id is not None else None
+    return MedicalRecordListRow(record_id, pet_id, treatment_type, treat_date, vaccines, snippet,
+                                created_at, PetRef(pet_id, pet_name, breed, age), donation)
+
+def medical_records():
+    """Medical records with their pet and donation, newest first"""
+    statement = db.select(
+        MedicalRecord.id, MedicalRecord.pet_id, MedicalRecord.treatment_type,
+        MedicalRecord.treat_date, MedicalRecord.vaccines, MedicalRecord.description_snippet,
+        MedicalRecord.created_at,
+        Pet.pet_name, Pet.breed, Pet.age,
+        Donation.id, Donation.donor_name, Donation.amount
+    ).join(Pet, MedicalRecord.pet_id == Pet.pet_id).outerjoin(
+        Donation, MedicalRecord.donor_id == Donation.id
+    ).order_by(MedicalRecord.created_at.desc())
+    return ReadQuery(statement, _medical_record_list_row)
+
+def as_dict(row):
+    """JSON-ready dict of a read-model row, including nested rows"""
+    result = {}
+    for key, value in row._asdict().items():
+        if isinstance(value, tuple) and hasattr(value, '_asdict'):
+            value = as_dict(value)
+        elif isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        result[key] = value
+    return result
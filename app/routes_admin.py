@@ -1,10 +1,19 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
-from app.models import User, Pet, Donation, Adoption, MedicalRecord
-from app.utils import save_uploaded_file, delete_uploaded_file
-from datetime import datetime, date
+from app.models import User, Pet, Donor, Donation, Adoption, MedicalRecord, Job, AuditLog
+from app.jobs import enqueue_after_commit, job_runner
+from app.audit import audit_writer, AUDITED_TABLES
+from app.instrumentation import request_profiler, slow_query_log
+from app import vaccinations, due_treatments, donation_rollups, status_history, shelters, donors
+from app.analytics import analytics
+from app.utils import save_uploaded_file, version_conflict, conflict_response, render_list, wants_json
+from sqlalchemy.orm import joinedload, defer, load_only
+from sqlalchemy.orm.exc import StaleDataError
+from collections import defaultdict
+from datetime import datetime, date, timedelta
 from functools import wraps
+import json
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -23,17 +32,19 @@ def admin_required(f):
 @admin_required
 def dashboard():
     """Admin dashboard with statistics"""
-    # Get counts for dashboard
-    pets_count = Pet.query.count()
-    adoptions_count = Adoption.query.count()
-    donations_count = Donation.query.count()
-    medical_records_count = MedicalRecord.query.count()
+    # Get counts for dashboard (plain COUNTs; Query.count() wraps every column in a subquery)
+    pets_count = Pet.query.with_entities(db.func.count(Pet.pet_id)).scalar()
+    adoptions_count = Adoption.query.with_entities(db.func.count(Adoption.id)).scalar()
+    donations_count = Donation.query.with_entities(db.func.count(Donation.id)).scalar()
+    medical_records_count = MedicalRecord.query.with_entities(db.func.count(MedicalRecord.id)).scalar()
     
     # Recent activities
-    recent_pets = Pet.query.order_by(Pet.created_at.desc()).limit(5).all()
-    recent_adoptions = Adoption.query.order_by(Adoption.date.desc()).limit(5).all()
-    recent_donations = Donation.query.order_by(Donation.date.desc()).limit(5).all()
-    recent_medical = MedicalRecord.query.order_by(MedicalRecord.created_at.desc()).limit(5).all()
+    recent_pets = Pet.query.options(defer(Pet.description)).order_by(Pet.created_at.desc()).limit(5).all()
+    recent_adoptions = Adoption.query.options(defer(Adoption.address)).order_by(Adoption.date.desc()).limit(5).all()
+    recent_donations = Donation.query.options(defer(Donation.message)).order_by(Donation.date.desc()).limit(5).all()
+    recent_medical = MedicalRecord.query.options(
+        defer(MedicalRecord.vaccines), defer(MedicalRecord.description)
+    ).order_by(MedicalRecord.created_at.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html',
                          pets_count=pets_count,
@@ -43,15 +54,32 @@ def dashboard():
                          recent_pets=recent_pets,
                          recent_adoptions=recent_adoptions,
                          recent_donations=recent_donations,
-                         recent_medical=recent_medical)
+                         recent_medical=recent_medical,
+                         due_this_week=due_treatments.due_this_week(date.today()),
+                         today=date.today())
 
 @admin_bp.route('/pets')
 @login_required
 @admin_required
 def pets_list():
-    """List all pets"""
-    pets = Pet.query.order_by(Pet.created_at.desc()).all()
-    return render_template('admin/pets_list.html', pets=pets)
+    """List all pets, optionally filtered and sorted by health status"""
+    health = request.args.get('health', '')
+    sort = request.args.get('sort', '')
+    
+    # The medical summary columns on pets make these plain column filters
+    pets = Pet.query.options(*Pet.list_columns())
+    if health == 'untreated':
+        pets = pets.filter(Pet.medical_record_count == 0)
+    elif health == 'vaccine_overdue':
+        cutoff = date.today() - timedelta(days=365)
+        pets = pets.filter(db.or_(Pet.last_vaccine_date.is_(None), Pet.last_vaccine_date < cutoff))
+    
+    if sort == 'last_treated':
+        # Never-treated pets first, then the longest since treatment
+        pets = pets.order_by(Pet.last_treat_date.isnot(None), Pet.last_treat_date)
+    else:
+        pets = pets.order_by(Pet.created_at.desc())
+    return render_list('admin/pets_list.html', 'pets', pets, health=health, sort=sort)
 
 @admin_bp.route('/pets/<int:pet_id>')
 @login_required
@@ -177,15 +205,18 @@ def edit_pet(pet_id):
             flash(error_msg, 'error')
             return render_template('admin/edit_pet.html', pet=pet)
         
+        # Reject edits made against a stale copy of the pet
+        if version_conflict(pet, data):
+            return conflict_response(pet, 'pet', 'admin/edit_pet.html', pet=pet)
+        
         # Handle image upload
         img_url = data.get('img_url')  # URL input
         uploaded_file = request.files.get('pet_image')
         
+        old_img_url = pet.img_url
+        uploaded_url = None
+        
         if uploaded_file and uploaded_file.filename:
-            # Delete old image if exists
-            if pet.img_url:
-                delete_uploaded_file(pet.img_url)
-            
             # Save new uploaded file
             try:
                 uploaded_url = save_uploaded_file(uploaded_file)
@@ -216,6 +247,10 @@ def edit_pet(pet_id):
         pet.img_url = img_url
         pet.shelter_no = data.get('shelter_no')
         
+        # Remove the replaced image once the new one is committed
+        if old_img_url and old_img_url != img_url:
+            enqueue_after_commit('delete_uploaded_file', filename=old_img_url)
+        
         try:
             db.session.commit()
             
@@ -225,6 +260,15 @@ def edit_pet(pet_id):
             flash('Pet updated successfully!', 'success')
             return redirect(url_for('admin.pet_detail', pet_id=pet.pet_id))
             
+        except StaleDataError:
+            # Another request committed between our read and our write
+            db.session.rollback()
+            if uploaded_url:
+                # The image saved for this edit is referenced by nothing
+                enqueue_after_commit('delete_uploaded_file', filename=uploaded_url)
+                db.session.commit()
+            return conflict_response(pet, 'pet', 'admin/edit_pet.html', pet=pet)
+            
         except Exception as e:
             db.session.rollback()
             error_msg = 'Failed to update pet. Please try again.'
@@ -246,6 +290,9 @@ def delete_pet(pet_id):
         MedicalRecord.query.filter_by(pet_id=pet_id).delete()
         Adoption.query.filter_by(pet_id=pet_id).delete()
         
+        if pet.img_url:
+            enqueue_after_commit('delete_uploaded_file', filename=pet.img_url)
+        
         db.session.delete(pet)
         db.session.commit()
         
@@ -268,8 +315,20 @@ def delete_pet(pet_id):
 @admin_required
 def donations_list():
     """List all donations"""
-    donations = Donation.query.order_by(Donation.date.desc()).all()
-    return render_template('admin/donations_list.html', donations=donations)
+    donations = Donation.query.options(joinedload(Donation.donor_user)).order_by(Donation.date.desc()).all()
+    
+    # Related records for every donation in one query instead of one per row
+    records_by_donation = defaultdict(list)
+    records = MedicalRecord.query.options(
+        load_only(MedicalRecord.donor_id, MedicalRecord.treat_date, MedicalRecord.treatment_type),
+        joinedload(MedicalRecord.pet).load_only(Pet.pet_name)
+    ).filter(
+        MedicalRecord.donor_id.isnot(None)).order_by(MedicalRecord.treat_date.desc()).all()
+    for record in records:
+        records_by_donation[record.donor_id].append(record)
+    
+    return render_template('admin/donations_list.html', donations=donations,
+                         records_by_donation=records_by_donation)
 
 @admin_bp.route('/donations/create', methods=['GET', 'POST'])
 @login_required
@@ -328,13 +387,75 @@ def create_donation():
     
     return render_template('admin/create_donation.html')
 
+@admin_bp.route('/donors')
+@login_required
+@admin_required
+def donors_list():
+    """Donors found by email or phone, or the newest donors"""
+    query = (request.args.get('q') or '').strip()
+    if query:
+        found = donors.find(query)
+    else:
+        found = Donor.query.order_by(Donor.id.desc()).limit(50).all()
+    totals = donors.totals([donor.id for donor in found])
+    
+    if wants_json():
+        return jsonify({'donors': [dict(donor.to_dict(), **donors.totals_json(totals.get(donor.id)))
+                                   for donor in found]})
+    return render_template('admin/donors_list.html', donors=found, totals=totals, query=query)
+
+@admin_bp.route('/donors/<int:donor_id>')
+@login_required
+@admin_required
+def donor_detail(donor_id):
+    """A donor's totals and donation history"""
+    donor = Donor.query.get_or_404(donor_id)
+    summary = donors.totals([donor.id]).get(donor.id)
+    donations = donors.history(donor.id)
+    
+    if wants_json():
+        return jsonify(dict(donor.to_dict(), **donors.totals_json(summary),
+                            donations=[donation.to_dict() for donation in donations]))
+    return render_template('admin/donor_detail.html', donor=donor, summary=summary, donations=donations)
+
+@admin_bp.route('/donations/totals')
+@login_required
+@admin_required
+def donation_totals():
+    """Donation counts and totals per day or month, optionally split by purpose or employee"""
+    period = request.args.get('period', 'month')
+    by = request.args.get('by') or None
+    if period not in donation_rollups.ROLLUPS:
+        return jsonify({'error': 'period must be day or month'}), 400
+    if by not in (None, 'purpose', 'user'):
+        return jsonify({'error': 'by must be purpose or user'}), 400
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    user_id = request.args.get('user_id', type=int)
+    
+    if period == 'month' and start is not None:
+        # A month bucket is keyed by its first day
+        start = start.replace(day=1)
+    return jsonify({
+        'period': period,
+        'by': by,
+        'totals': donation_rollups.totals(period, by, start, end, user_id)
+    })
+
 @admin_bp.route('/adoptions')
 @login_required
 @admin_required
 def adoptions_list():
     """List all adoptions"""
-    adoptions = Adoption.query.order_by(Adoption.date.desc()).all()
-    return render_template('admin/adoptions_list.html', adoptions=adoptions)
+    adoptions = Adoption.query.options(
+        *Adoption.list_columns(),
+        joinedload(Adoption.pet).load_only(Pet.pet_name, Pet.breed, Pet.age),
+        joinedload(Adoption.adopter_user).load_only(User.username)
+    ).order_by(Adoption.date.desc())
+    return render_list('admin/adoptions_list.html', 'adoptions', adoptions)
 
 @admin_bp.route('/adoptions/create', methods=['GET', 'POST'])
 @login_required
@@ -404,8 +525,13 @@ def create_adoption():
 @admin_required
 def medical_records_list():
     """List all medical records"""
-    medical_records = MedicalRecord.query.order_by(MedicalRecord.created_at.desc()).all()
-    return render_template('admin/medical_records_list.html', medical_records=medical_records)
+    medical_records = MedicalRecord.query.options(
+        *MedicalRecord.list_columns(),
+        joinedload(MedicalRecord.pet).load_only(Pet.pet_name, Pet.breed, Pet.age),
+        joinedload(MedicalRecord.donation).load_only(Donation.donor_name, Donation.amount)
+    ).order_by(MedicalRecord.created_at.desc())
+    return render_list('admin/medical_records_list.html', 'medical_records', medical_records,
+                       summary=MedicalRecord.summary())
 
 @admin_bp.route('/medical-records/create', methods=['GET', 'POST'])
 @login_required
@@ -479,3 +605,178 @@ def create_medical_record():
     return render_template('admin/create_medical_record.html', 
                          pets=Pet.query.all(), 
                          donations=Donation.query.all())
+
+@admin_bp.route('/jobs')
+@login_required
+@admin_required
+def jobs_status():
+    """Background job queue depth, latency and recent failures"""
+    counts = dict(db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all())
+    recent_failures = Job.query.filter_by(status='failed').order_by(Job.id.desc()).limit(10).all()
+    return jsonify({
+        'runner': job_runner.stats(),
+        'jobs_by_status': counts,
+        'recent_failures': [
+            {'id': job.id, 'name': job.name, 'attempts': job.attempts, 'error': job.last_error}
+            for job in recent_failures
+        ]
+    })
+
+@admin_bp.route('/audit')
+@login_required
+@admin_required
+def audit_log():
+    """Browse the audit log by entity and time range"""
+    entity = request.args.get('entity') or None
+    entity_id = request.args.get('entity_id') or None
+    page = request.args.get('page', 1, type=int)
+    
+    query = AuditLog.query
+    if entity:
+        query = query.filter(AuditLog.entity == entity)
+        if entity_id:
+            query = query.filter(AuditLog.entity_id == entity_id)
+    
+    for arg, op in (('from', '__ge__'), ('to', '__lt__')):
+        value = request.args.get(arg)
+        if value:
+            try:
+                bound = datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                error_msg = 'Invalid date format. Use YYYY-MM-DD'
+                if wants_json():
+                    return jsonify({'error': error_msg}), 400
+                flash(error_msg, 'error')
+                return redirect(url_for('admin.audit_log'))
+            query = query.filter(getattr(AuditLog.created_at, op)(bound))
+    
+    entries = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()) \
+                   .paginate(page=page, per_page=50, error_out=False)
+    
+    if wants_json():
+        return jsonify({
+            'entries': [
+                {
+                    'id': e.id,
+                    'entity': e.entity,
+                    'entity_id': e.entity_id,
+                    'action': e.action,
+                    'user_id': e.user_id,
+                    'changes': json.loads(e.changes) if e.changes else None,
+                    'created_at': e.created_at.isoformat()
+                }
+                for e in entries.items
+            ],
+            'page': entries.page,
+            'pages': entries.pages,
+            'writer': audit_writer.stats()
+        })
+    
+    return render_template('admin/audit_log.html',
+                         entries=entries,
+                         entities=sorted(AUDITED_TABLES),
+                         writer_stats=audit_writer.stats())
+
+@admin_bp.route('/vaccinations/due')
+@login_required
+@admin_required
+def vaccinations_due():
+    """Pets whose next dose of a vaccine is due within the given number of days"""
+    vaccine = request.args.get('vaccine', '').strip()
+    try:
+        within_days = int(request.args.get('within_days', 7))
+    except ValueError:
+        error_msg = 'within_days must be a whole number'
+        if wants_json():
+            return jsonify({'error': error_msg}), 400
+        flash(error_msg, 'error')
+        within_days = 7
+    
+    today = date.today()
+    due = vaccinations.due(vaccine or None, today + timedelta(days=within_days))
+    if wants_json():
+        return jsonify({'due': [dict(row, given_date=row['given_date'].isoformat(),
+                                     due_date=row['due_date'].isoformat()) for row in due]})
+    return render_template('admin/vaccinations_due.html', due=due, vaccine=vaccine,
+                           within_days=within_days, today=today)
+
+@admin_bp.route('/trends')
+@login_required
+@admin_required
+def trends():
+    """Donation, adoption-rate and length-of-stay trends from the in-memory analytics columns"""
+    try:
+        days = int(request.args.get('days', 90))
+        if not 1 <= days <= 3660:
+            raise ValueError
+    except ValueError:
+        error_msg = 'days must be a whole number from 1 to 3660'
+        if wants_json():
+            return jsonify({'error': error_msg}), 400
+        flash(error_msg, 'error')
+        days = 90
+    
+    stats = analytics.trends(days)
+    if wants_json():
+        return jsonify(stats)
+    return render_template('admin/trends.html', stats=stats, days=days)
+
+@admin_bp.route('/reports/length-of-stay')
+@login_required
+@admin_required
+def length_of_stay():
+    """Adoption funnel and average stays by breed, age and shelter from the stay totals"""
+    report = status_history.report()
+    funnel = status_history.funnel(report)
+    if wants_json():
+        return jsonify({'funnel': funnel, 'stays': report})
+    return render_template('admin/length_of_stay.html', funnel=funnel, report=report)
+
+@admin_bp.route('/shelters')
+@login_required
+@admin_required
+def shelter_occupancy():
+    """Pets per status in each shelter, read from the shelters' counters"""
+    occupancy = shelters.occupancy()
+    if wants_json():
+        return jsonify(occupancy)
+    return render_template('admin/shelters.html', **occupancy)
+
+@admin_bp.route('/perf', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def perf():
+    """Rolling per-endpoint query counts and timings"""
+    if request.method == 'POST':
+        request_profiler.reset()
+        if request.is_json:
+            return jsonify({'success': True})
+        flash('Performance samples cleared.', 'success')
+        return redirect(url_for('admin.perf'))
+    
+    rows = request_profiler.summary()
+    if wants_json():
+        return jsonify({'endpoints': rows})
+    return render_template('admin/perf.html', rows=rows)
+
+@admin_bp.route('/slow-queries', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def slow_queries():
+    """Statements that exceeded the slow-query threshold, with their plans"""
+    if request.method == 'POST':
+        slow_query_log.clear()
+        if request.is_json:
+            return jsonify({'success': True})
+        flash('Slow-query log cleared.', 'success')
+        return redirect(url_for('admin.slow_queries'))
+    
+    entries = slow_query_log.entries()
+    if wants_json():
+        return jsonify({
+            'threshold_ms': current_app.config['SLOW_QUERY_THRESHOLD_MS'],
+            'entries': [dict(entry, time=entry['time'].isoformat()) for entry in entries]
+        })
+    return render_template('admin/slow_queries.html',
+                         entries=entries,
+                         threshold_ms=current_app.config['SLOW_QUERY_THRESHOLD_MS'])
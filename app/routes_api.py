@@ -0,0 +1,66 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from app import timeseries
+from datetime import datetime, date, timedelta
+
+api_bp = Blueprint('api', __name__)
+
+def parse_date(value, default):
+    """YYYY-MM-DD query value, or the default when it is missing"""
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+@api_bp.route('/timeseries/<series>')
+@login_required
+def timeseries_series(series):
+    """Donations, adoptions or intakes per bucket, downsampled to a point budget
+
+    Donation amounts are organisation-wide financials, admin-only like
+    /admin/donations/totals; adoptions and intakes are open to employees.
+    """
+    if series not in timeseries.SERIES:
+        return jsonify({'error': f'Unknown series. Use one of: {", ".join(timeseries.SERIES)}'}), 404
+    if series == 'donations' and not current_user.is_admin():
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    try:
+        end = parse_date(request.args.get('to'), date.today())
+        start = parse_date(request.args.get('from'), end - timedelta(days=min(365, end.toordinal() - 1)))
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    
+    try:
+        points = int(request.args.get('points', timeseries.DEFAULT_POINTS))
+        if not 3 <= points <= timeseries.MAX_POINTS:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': f'points must be a whole number from 3 to {timeseries.MAX_POINTS}'}), 400
+    
+    resolution = request.args.get('resolution', 'auto')
+    if resolution == 'auto':
+        resolution = timeseries.auto_resolution(start, end, points)
+    elif resolution not in timeseries.RESOLUTIONS:
+        return jsonify({'error': 'resolution must be auto, day, week or month'}), 400
+    if timeseries.bucket_count(start, end, resolution) > timeseries.MAX_BUCKETS:
+        return jsonify({'error': f'Range too long: more than {timeseries.MAX_BUCKETS} {resolution} buckets. '
+                                 'Use a coarser resolution or a shorter range'}), 400
+    
+    metric = request.args.get('metric', 'amount' if series == 'donations' else 'count')
+    if metric not in timeseries.METRICS or (series != 'donations' and metric != 'count'):
+        return jsonify({'error': 'metric must be amount or count (count only for adoptions and intakes)'}), 400
+    
+    buckets = timeseries.aggregate(series, start, end, resolution, metric)
+    sampled = timeseries.lttb(buckets, points)
+    return jsonify({
+        'series': series,
+        'metric': metric,
+        'resolution': resolution,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'buckets': len(buckets),
+        'downsampled': len(sampled) < len(buckets),
+        'points': [[day.isoformat(), round(value, 2)] for day, value in sampled]
+    })
@@ -1,7 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
 from app import db
 from app.models import User, Pet, Donation, Adoption, MedicalRecord
+from app import read_models, due_treatments
+from app.matching import matcher, SPECIES, GENDERS, ENERGY_LEVELS
+from app.utils import version_conflict, conflict_response, render_list, wants_json
+from sqlalchemy.orm import joinedload, defer, load_only
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime, date
 from functools import wraps
 import re
@@ -34,16 +39,22 @@ def validate_phone(phone):
 def dashboard():
     """Employee dashboard with limited statistics"""
     # Get counts for dashboard (only user's own records)
-    user_donations_count = Donation.query.filter_by(user_id=current_user.id).count()
-    user_adoptions_count = Adoption.query.filter_by(user_id=current_user.id).count()
-    pets_count = Pet.query.count()
-    medical_records_count = MedicalRecord.query.count()
+    user_donations_count = Donation.query.filter_by(user_id=current_user.id).with_entities(
+        db.func.count(Donation.id)).scalar()
+    user_adoptions_count = Adoption.query.filter_by(user_id=current_user.id).with_entities(
+        db.func.count(Adoption.id)).scalar()
+    pets_count = Pet.query.with_entities(db.func.count(Pet.pet_id)).scalar()
+    medical_records_count = MedicalRecord.query.with_entities(db.func.count(MedicalRecord.id)).scalar()
     
     # Recent activities
-    recent_pets = Pet.query.order_by(Pet.created_at.desc()).limit(5).all()
-    user_recent_donations = Donation.query.filter_by(user_id=current_user.id).order_by(Donation.date.desc()).limit(5).all()
-    user_recent_adoptions = Adoption.query.filter_by(user_id=current_user.id).order_by(Adoption.date.desc()).limit(5).all()
-    recent_medical = MedicalRecord.query.order_by(MedicalRecord.created_at.desc()).limit(5).all()
+    recent_pets = Pet.query.options(defer(Pet.description)).order_by(Pet.created_at.desc()).limit(5).all()
+    user_recent_donations = Donation.query.options(defer(Donation.message)).filter_by(
+        user_id=current_user.id).order_by(Donation.date.desc()).limit(5).all()
+    user_recent_adoptions = Adoption.query.options(defer(Adoption.address)).filter_by(
+        user_id=current_user.id).order_by(Adoption.date.desc()).limit(5).all()
+    recent_medical = MedicalRecord.query.options(
+        defer(MedicalRecord.vaccines), defer(MedicalRecord.description)
+    ).order_by(MedicalRecord.created_at.desc()).limit(5).all()
     
     return render_template('employee/dashboard.html',
                          pets_count=pets_count,
@@ -53,23 +64,32 @@ def dashboard():
                          recent_pets=recent_pets,
                          user_recent_donations=user_recent_donations,
                          user_recent_adoptions=user_recent_adoptions,
-                         recent_medical=recent_medical)
+                         recent_medical=recent_medical,
+                         due_this_week=due_treatments.due_this_week(date.today()),
+                         today=date.today())
 
 @employee_bp.route('/pets')
 @login_required
 @employee_required
 def pets_list():
     """List all pets (read-only for employees)"""
-    pets = Pet.query.order_by(Pet.created_at.desc()).all()
-    return render_template('employee/pets_list.html', pets=pets)
+    pets = read_models.pets()
+    if wants_json():
+        return jsonify({'pets': [read_models.as_dict(pet) for pet in pets.all()]})
+    return render_list('employee/pets_list.html', 'pets', pets)
 
 @employee_bp.route('/pets/<int:pet_id>')
 @login_required
 @employee_required
 def pet_detail(pet_id):
     """View pet details (read-only for employees)"""
-    pet = Pet.query.get_or_404(pet_id)
-    medical_records = MedicalRecord.query.filter_by(pet_id=pet_id).order_by(MedicalRecord.treat_date.desc()).all()
+    pet = read_models.pet(pet_id)
+    if pet is None:
+        abort(404)
+    medical_records = read_models.pet_medical_records(pet_id)
+    if wants_json():
+        return jsonify({'pet': read_models.as_dict(pet),
+                        'medical_records': [read_models.as_dict(record) for record in medical_records]})
     return render_template('employee/pet_detail.html', pet=pet, medical_records=medical_records)
 
 @employee_bp.route('/donate', methods=['GET', 'POST'])
@@ -151,8 +171,73 @@ def donate():
 @employee_required
 def adopt_pets_list():
     """List available pets for adoption"""
-    pets = Pet.query.filter_by(status='available').order_by(Pet.created_at.desc()).all()
-    return render_template('employee/adopt_pets_list.html', pets=pets)
+    pets = read_models.pets(status='available')
+    return render_list('employee/adopt_pets_list.html', 'pets', pets)
+
+@employee_bp.route('/adopt/match')
+@login_required
+@employee_required
+def match_pets():
+    """Available pets ranked against an adopter's preferences"""
+    args = request.args
+    preferences = {
+        'species': args.get('species') or None,
+        'breed': (args.get('breed') or '').strip() or None,
+        'gender': args.get('gender') or None,
+        'energy': args.get('energy') or None
+    }
+    
+    # Validation
+    error_msg = None
+    try:
+        min_age = int(args['min_age']) if args.get('min_age') else None
+        max_age = int(args['max_age']) if args.get('max_age') else None
+        limit = int(args.get('limit', 10))
+        if (min_age is not None and min_age < 0) or (max_age is not None and max_age < 0):
+            raise ValueError
+        if min_age is not None and max_age is not None and min_age > max_age:
+            raise ValueError
+    except ValueError:
+        error_msg = 'Ages must be whole numbers from 0, with the minimum not above the maximum'
+    else:
+        if not 1 <= limit <= 50:
+            error_msg = 'limit must be a whole number from 1 to 50'
+        elif preferences['species'] not in (None, *SPECIES):
+            error_msg = f'species must be one of: {", ".join(SPECIES)}'
+        elif preferences['gender'] not in (None, *GENDERS):
+            error_msg = 'gender must be male or female'
+        elif preferences['energy'] not in (None, *ENERGY_LEVELS):
+            error_msg = 'energy must be low, medium or high'
+    
+    if error_msg:
+        if wants_json():
+            return jsonify({'error': error_msg}), 400
+        flash(error_msg, 'error')
+        return render_template('employee/match_pets.html', matches=None, preferences=args, species=SPECIES)
+    
+    # The HTML page starts with just the form
+    if not wants_json() and not args:
+        return render_template('employee/match_pets.html', matches=None, preferences=args, species=SPECIES)
+    
+    # A pet adopted in another process can linger in the matrix until its
+    # reload: mark those changed and rank again, so the matrix drops them
+    # and up to limit available pets come back
+    for _ in range(3):
+        ranked = matcher.match(min_age=min_age, max_age=max_age, limit=limit, **preferences)
+        ranked_ids = [pet_id for pet_id, _, _ in ranked]
+        pets = {pet.pet_id: pet
+                for pet in Pet.query.filter(Pet.pet_id.in_(ranked_ids), Pet.status == 'available')}
+        stale = set(ranked_ids) - set(pets)
+        if not stale:
+            break
+        matcher.changed(stale)
+    matches = [{'pet': pets[pet_id], 'score': score, 'match': share}
+               for pet_id, score, share in ranked if pet_id in pets]
+    
+    if wants_json():
+        return jsonify({'matches': [dict(match['pet'].to_dict(), score=match['score'], match=match['match'])
+                                    for match in matches]})
+    return render_template('employee/match_pets.html', matches=matches, preferences=args, species=SPECIES)
 
 @employee_bp.route('/adopt/<int:pet_id>', methods=['GET', 'POST'])
 @login_required
@@ -229,8 +314,13 @@ def adopt_pet(pet_id):
 @employee_required
 def medical_records_list():
     """List medical records (read-only for employees)"""
-    medical_records = MedicalRecord.query.order_by(MedicalRecord.created_at.desc()).all()
-    return render_template('employee/medical_records_list.html', medical_records=medical_records)
+    medical_records = read_models.medical_records()
+    summary = MedicalRecord.summary()
+    if wants_json():
+        return jsonify({'medical_records': [read_models.as_dict(record) for record in medical_records.all()],
+                        'summary': summary})
+    return render_list('employee/medical_records_list.html', 'medical_records', medical_records,
+                       summary=summary)
 
 @employee_bp.route('/my-donations')
 @login_required
@@ -245,7 +335,10 @@ def my_donations():
 @employee_required
 def my_adoptions():
     """List employee's own adoptions"""
-    adoptions = Adoption.query.filter_by(user_id=current_user.id).order_by(Adoption.date.desc()).all()
+    adoptions = Adoption.query.options(
+        joinedload(Adoption.pet).load_only(Pet.pet_name, Pet.breed, Pet.age, Pet.gender)
+    ).filter_by(
+        user_id=current_user.id).order_by(Adoption.date.desc()).all()
     return render_template('employee/my_adoptions.html', adoptions=adoptions)
 
 @employee_bp.route('/my-donations/<int:donation_id>/edit', methods=['GET', 'POST'])
@@ -295,6 +388,10 @@ def edit_my_donation(donation_id):
             flash(error_msg, 'error')
             return render_template('employee/edit_donation.html', donation=donation)
         
+        # Reject edits made against a stale copy of the donation
+        if version_conflict(donation, data):
+            return conflict_response(donation, 'donation', 'employee/edit_donation.html', donation=donation)
+        
         # Update donation
         donation.amount = amount
         donation.purpose = data.get('purpose')
@@ -312,6 +409,11 @@ def edit_my_donation(donation_id):
             flash('Donation updated successfully!', 'success')
             return redirect(url_for('employee.my_donations'))
             
+        except StaleDataError:
+            # Another request committed between our read and our write
+            db.session.rollback()
+            return conflict_response(donation, 'donation', 'employee/edit_donation.html', donation=donation)
+            
         except Exception as e:
             db.session.rollback()
             error_msg = 'Failed to update donation. Please try again.'
@@ -357,6 +459,10 @@ def edit_my_adoption(adoption_id):
             flash(error_msg, 'error')
             return render_template('employee/edit_adoption.html', adoption=adoption)
         
+        # Reject edits made against a stale copy of the adoption
+        if version_conflict(adoption, data):
+            return conflict_response(adoption, 'adoption', 'employee/edit_adoption.html', adoption=adoption)
+        
         # Update adoption
         adoption.adopt_name = data.get('adopt_name')
         adoption.adopt_email = data.get('adopt_email')
@@ -372,6 +478,11 @@ def edit_my_adoption(adoption_id):
             flash('Adoption updated successfully!', 'success')
             return redirect(url_for('employee.my_adoptions'))
             
+        except StaleDataError:
+            # Another request committed between our read and our write
+            db.session.rollback()
+            return conflict_response(adoption, 'adoption', 'employee/edit_adoption.html', adoption=adoption)
+            
         except Exception as e:
             db.session.rollback()
             error_msg = 'Failed to update adoption. Please try again.'
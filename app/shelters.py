@@ -0,0 +1,157 @@
+"""
+Shelter locations and occupancy
+
+Pet.shelter_no points to the shelters table. Shelter numbers are stored
+normalized (upper case, without spaces, dots, dashes or underscores), so
+'sh 001', 'SH-001' and 'SH001' are one shelter; a shelter row is created
+the first time a pet is saved with a new number.
+
+Each shelter keeps the number of its pets per status. A flush that
+creates, edits (status or shelter_no), adopts or deletes a pet adjusts
+those counters in the same transaction, so the occupancy report reads one
+row per shelter instead of counting pets.
+
+`flask normalize-shelters` normalizes existing shelter_no values in
+batches, creates the missing shelters and recounts every shelter.
+"""
+
+import re
+from collections import defaultdict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Pet, Shelter
+from app.utils import upsert_add
+
+# Shelter counter column per pet status
+COUNTERS = {
+    'available': 'available_count',
+    'foster': 'foster_count',
+    'adopted': 'adopted_count'
+}
+
+def normalize(shelter_no):
+    """Canonical shelter number, None when blank"""
+    if shelter_no is None:
+        return None
+    return re.sub(r'[\s._-]+', '', str(shelter_no)).upper()[:50] or None
+
+def _counter_rows(counts):
+    """shelters rows from {(shelter_no, status): count}, one per shelter"""
+    rows = {}
+    for (shelter_no, status), count in counts.items():
+        if shelter_no is None or status not in COUNTERS:
+            continue
+        row = rows.setdefault(shelter_no, dict({column: 0 for column in COUNTERS.values()},
+                                               shelter_no=shelter_no))
+        row[COUNTERS[status]] += count
+    return list(rows.values())
+
+def ensure(connection, shelter_nos):
+    """Create the shelters that don't exist yet"""
+    table = Shelter.__table__
+    shelter_nos = {shelter_no for shelter_no in shelter_nos if shelter_no}
+    if not shelter_nos:
+        return
+    existing = set(connection.execute(
+        db.select(table.c.shelter_no).where(table.c.shelter_no.in_(shelter_nos))).scalars())
+    upsert_add(connection, table, _counter_rows({(shelter_no, 'available'): 0
+                                                 for shelter_no in shelter_nos - existing}),
+               ('shelter_no',), COUNTERS.values())
+
+def apply(connection, deltas):
+    """Add {(shelter_no, status): change} to the shelters' counters"""
+    rows = [row for row in _counter_rows(deltas) if any(row[column] for column in COUNTERS.values())]
+    upsert_add(connection, Shelter.__table__, rows, ('shelter_no',), COUNTERS.values())
+
+def occupancy():
+    """Every shelter's counters, plus the totals across shelters"""
+    shelters = [shelter.to_dict() for shelter in Shelter.query.order_by(Shelter.shelter_no)]
+    totals = {key: sum(shelter[key] for shelter in shelters)
+              for key in ('available', 'foster', 'adopted', 'in_care')}
+    return {'shelters': shelters, 'totals': totals}
+
+def recount():
+    """Recompute every shelter's counters from the pets table"""
+    connection = db.session.connection()
+    connection.execute(Shelter.__table__.update().values({column: 0 for column in COUNTERS.values()}))
+    counts = connection.execute(
+        db.select(Pet.shelter_no, Pet.status, db.func.count())
+        .where(Pet.shelter_no.isnot(None))
+        .group_by(Pet.shelter_no, Pet.status)
+    ).all()
+    apply(connection, {(shelter_no, status): count for shelter_no, status, count in counts})
+    db.session.commit()
+    return len({shelter_no for shelter_no, _, _ in counts})
+
+def normalize_existing(batch_size=1000):
+    """Normalize pets' shelter_no in pet_id batches, then recount; returns the pets changed"""
+    table = Pet.__table__
+    statement = table.update().where(table.c.pet_id == db.bindparam('b_pet_id')) \
+        .values(shelter_no=db.bindparam('b_shelter_no'))
+    changed = 0
+    last_id = 0
+    while True:
+        pets = db.session.execute(
+            db.select(Pet.pet_id, Pet.shelter_no)
+            .where(Pet.pet_id > last_id)
+            .order_by(Pet.pet_id).limit(batch_size)
+        ).all()
+        if not pets:
+            break
+        connection = db.session.connection()
+        ensure(connection, {normalize(shelter_no) for _, shelter_no in pets})
+        fixes = [{'b_pet_id': pet_id, 'b_shelter_no': normalize(shelter_no)}
+                 for pet_id, shelter_no in pets if normalize(shelter_no) != shelter_no]
+        if fixes:
+            connection.execute(statement, fixes)
+        db.session.commit()
+        changed += len(fixes)
+        last_id = pets[-1].pet_id
+    recount()
+    return changed
+
+@event.listens_for(Session, 'before_flush')
+def _count_pet_changes(session, flush_context, instances):
+    """Normalize pets' shelter numbers, note the counter changes and create new shelters
+
+    Runs before the flush so deleted pets can still be read and new
+    shelters exist before the pets that point to them are written. The
+    stored number of a deleted or moved pet is normalized too, as it can
+    predate `flask normalize-shelters`.
+    """
+    deltas = session.info.setdefault('shelter_deltas', defaultdict(int))
+    for obj in session.new:
+        if isinstance(obj, Pet):
+            obj.shelter_no = normalize(obj.shelter_no)
+            deltas[(obj.shelter_no, obj.status or 'available')] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Pet):
+            deltas[(normalize(obj.shelter_no), obj.status)] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Pet) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        shelter, status = state.attrs.shelter_no.history, state.attrs.status.history
+        if not (shelter.has_changes() or status.has_changes()):
+            continue
+        previous = (normalize(shelter.deleted[0] if shelter.deleted else obj.shelter_no),
+                    status.deleted[0] if status.deleted else obj.status)
+        obj.shelter_no = normalize(obj.shelter_no)
+        deltas[previous] -= 1
+        deltas[(obj.shelter_no, obj.status)] += 1
+    if deltas:
+        ensure(session.connection(), {shelter_no for shelter_no, _ in deltas})
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_after_flush(session, flush_context):
+    """Write the noted counter changes"""
+    deltas = session.info.pop('shelter_deltas', None)
+    if deltas:
+        apply(session.connection(), deltas)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_deltas(session):
+    session.info.pop('shelter_deltas', None)
@@ -0,0 +1,219 @@
+"""
+Pet status history and length-of-stay totals
+
+Every status a pet takes is recorded in pet_status_changes: the intake
+when the pet is created, then each change of Pet.status, whether it
+happens in edit_pet, adopt_pet, create_adoption or anywhere else that
+goes through the session. Each row keeps the days spent in the previous
+status and since intake, and the pet's breed, age and shelter at the
+time, so the history stays meaningful after the pet is edited or
+deleted.
+
+The same session events keep pet_stay_totals up to date: a count and a
+sum of days per metric ('intake': pets taken in, 'adoption': intake to
+adoption, 'foster': time spent in foster) and per breed, age band and
+shelter. The length-of-stay
+report reads those few rows instead of the history.
+
+`flask backfill-status-history` seeds the history of pets created before
+it existed (intake at created_at, adoption at the first Adoption.date)
+and `flask rebuild-stay-totals` recomputes the totals from the history.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Pet, Adoption, PetStatusChange, PetStayTotal
+from app.analytics import age_band
+from app.utils import current_user_id, upsert_add
+
+# 'intake' counts pets taken in (its days are always 0), the top of the funnel
+METRICS = ('intake', 'adoption', 'foster')
+DIMENSIONS = ('all', 'breed', 'age_band', 'shelter')
+
+SECONDS_PER_DAY = 86400
+
+def _days(start, end):
+    if start is None or end is None:
+        return None
+    return max(0.0, (end - start).total_seconds() / SECONDS_PER_DAY)
+
+def stays(change):
+    """(metric, days) pairs a status change row contributes to the totals"""
+    result = []
+    if change['from_status'] is None:
+        result.append(('intake', 0.0))
+    if change['to_status'] == 'adopted':
+        result.append(('adoption', change['days_since_intake']))
+    if change['from_status'] == 'foster' and change['days_in_previous'] is not None:
+        result.append(('foster', change['days_in_previous']))
+    return result
+
+def total_rows(changes):
+    """pet_stay_totals rows (count and sum of days per key) for status change rows"""
+    totals = defaultdict(lambda: [0, 0.0])
+    for change in changes:
+        keys = {'all': '', 'breed': change['breed'] or '', 'age_band': age_band(change['age']),
+                'shelter': change['shelter_no'] or ''}
+        for metric, days in stays(change):
+            for dimension in DIMENSIONS:
+                total = totals[(metric, dimension, keys[dimension])]
+                total[0] += 1
+                total[1] += days
+    return [{'metric': metric, 'dimension': dimension, 'key': key,
+             'stay_count': count, 'total_days': days}
+            for (metric, dimension, key), (count, days) in totals.items()]
+
+def record(connection, transitions, changed_at=None, user_id=None):
+    """Write status change rows for [(pet_id, from_status, to_status)] and add them to the totals"""
+    if not transitions:
+        return 0
+    changed_at = changed_at or datetime.utcnow()
+    pet_ids = {pet_id for pet_id, _, _ in transitions}
+    pets = {row.pet_id: row for row in connection.execute(
+        db.select(Pet.pet_id, Pet.created_at, Pet.breed, Pet.age, Pet.shelter_no)
+        .where(Pet.pet_id.in_(pet_ids)))}
+    history = PetStatusChange.__table__
+    previous = dict(connection.execute(
+        db.select(history.c.pet_id, db.func.max(history.c.changed_at))
+        .where(history.c.pet_id.in_(pet_ids)).group_by(history.c.pet_id)).all())
+
+    changes = []
+    for pet_id, from_status, to_status in transitions:
+        pet = pets.get(pet_id)
+        if pet is None:
+            continue
+        created_at = pet.created_at or changed_at
+        intake = from_status is None
+        changes.append({
+            'pet_id': pet_id,
+            'from_status': from_status,
+            'to_status': to_status,
+            'changed_at': created_at if intake else changed_at,
+            'days_in_previous': None if intake else _days(previous.get(pet_id) or created_at, changed_at),
+            'days_since_intake': 0.0 if intake else _days(created_at, changed_at),
+            'breed': pet.breed,
+            'age': pet.age,
+            'shelter_no': pet.shelter_no,
+            'user_id': user_id
+        })
+    if changes:
+        connection.execute(history.insert(), changes)
+        upsert_add(connection, PetStayTotal.__table__, total_rows(changes),
+                   ('metric', 'dimension', 'key'), ('stay_count', 'total_days'))
+    return len(changes)
+
+def funnel(result):
+    """Pets taken in, fostered and adopted from a report's overall rows"""
+    overall = {metric: (rows['all'][0]['count'] if rows['all'] else 0) for metric, rows in result.items()}
+    return {
+        'intake': overall['intake'],
+        'fostered': overall['foster'],
+        'adopted': overall['adoption'],
+        'adoption_rate': round(overall['adoption'] / overall['intake'], 3) if overall['intake'] else None
+    }
+
+def report():
+    """Average stays per metric and dimension, largest groups first"""
+    result = {metric: {dimension: [] for dimension in DIMENSIONS} for metric in METRICS}
+    for total in PetStayTotal.query.filter(PetStayTotal.stay_count > 0):
+        if total.metric not in result or total.dimension not in DIMENSIONS:
+            continue
+        result[total.metric][total.dimension].append({
+            'key': total.key or None,
+            'count': total.stay_count,
+            'average_days': round(total.total_days / total.stay_count, 1)
+        })
+    for dimensions in result.values():
+        for rows in dimensions.values():
+            rows.sort(key=lambda row: (-row['count'], row['key'] or ''))
+    return result
+
+def rebuild_totals(batch_size=5000):
+    """Recompute pet_stay_totals from the whole status history"""
+    history = PetStatusChange.__table__
+    db.session.execute(PetStayTotal.__table__.delete())
+    statement = db.select(
+        history.c.from_status, history.c.to_status, history.c.days_in_previous,
+        history.c.days_since_intake, history.c.breed, history.c.age, history.c.shelter_no
+    ).where(db.or_(history.c.from_status.is_(None), history.c.to_status == 'adopted',
+                   history.c.from_status == 'foster'))
+    changes = [row._asdict() for row in db.session.execute(statement)]
+    rows = total_rows(changes)
+    for start in range(0, len(rows), batch_size):
+        upsert_add(db.session.connection(), PetStayTotal.__table__, rows[start:start + batch_size],
+                   ('metric', 'dimension', 'key'), ('stay_count', 'total_days'))
+    db.session.commit()
+    return len(changes)
+
+def backfill(batch_size=1000):
+    """Seed the history of pets that have none, in pet_id batches
+
+    Each pet gets an intake at created_at; adopted pets also get a change
+    to 'adopted' at their first adoption's date, and foster pets are
+    taken to have been fostered from intake.
+    """
+    history = PetStatusChange.__table__
+    seeded = 0
+    last_id = 0
+    while True:
+        pets = db.session.execute(
+            db.select(Pet.pet_id, Pet.status, Pet.created_at, Pet.breed, Pet.age, Pet.shelter_no)
+            .where(Pet.pet_id > last_id,
+                   ~db.select(history.c.id).where(history.c.pet_id == Pet.pet_id).exists())
+            .order_by(Pet.pet_id).limit(batch_size)
+        ).all()
+        if not pets:
+            break
+        adopted_on = dict(db.session.execute(
+            db.select(Adoption.pet_id, db.func.min(Adoption.date))
+            .where(Adoption.pet_id.in_([pet.pet_id for pet in pets])).group_by(Adoption.pet_id)).all())
+
+        changes = []
+        for pet in pets:
+            snapshot = {'pet_id': pet.pet_id, 'breed': pet.breed, 'age': pet.age,
+                        'shelter_no': pet.shelter_no, 'user_id': None}
+            created_at = pet.created_at or datetime.utcnow()
+            adopted_at = adopted_on.get(pet.pet_id) if pet.status == 'adopted' else None
+            changes.append(dict(snapshot, from_status=None,
+                                to_status='foster' if pet.status == 'foster' else 'available',
+                                changed_at=created_at, days_in_previous=None, days_since_intake=0.0))
+            if adopted_at is not None:
+                days = _days(created_at, adopted_at)
+                changes.append(dict(snapshot, from_status='available', to_status='adopted',
+                                    changed_at=adopted_at, days_in_previous=days, days_since_intake=days))
+        db.session.execute(history.insert(), changes)
+        db.session.commit()
+        seeded += len(pets)
+        last_id = pets[-1].pet_id
+    rebuild_totals()
+    return seeded
+
+@event.listens_for(Session, 'after_flush')
+def _collect_transitions(session, flush_context):
+    """Note new pets and pets whose status this flush changed"""
+    transitions = session.info.setdefault('pet_status_transitions', [])
+    for obj in session.new:
+        if isinstance(obj, Pet):
+            transitions.append((obj.pet_id, None, obj.status or 'available'))
+    for obj in session.dirty:
+        if not isinstance(obj, Pet):
+            continue
+        history = inspect(obj).attrs.status.history
+        if history.has_changes() and history.deleted and history.deleted[0] != obj.status:
+            transitions.append((obj.pet_id, history.deleted[0], obj.status))
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _record_after_flush(session, flush_context):
+    """Write the noted changes to the history and the totals"""
+    transitions = session.info.pop('pet_status_transitions', None)
+    if transitions:
+        record(session.connection(), transitions, user_id=current_user_id())
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_transitions(session):
+    session.info.pop('pet_status_transitions', None)
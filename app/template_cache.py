@@ -0,0 +1,132 @@
+"""
+Template caching for the Pet Management System
+
+Compiled templates are kept in a filesystem bytecode cache so they
+survive worker restarts, and a {% cache key, ttl %} tag stores rendered
+fragments in a bounded in-process LRU:
+
+    {% cache ('pet-card', pet.pet_id, pet.created_at, pet.version), 600 %}
+        ... markup for one pet ...
+    {% endcache %}
+
+Keys are prefixed with the template name. Including the row's version
+in the key means an edited pet is re-rendered on its next request;
+stale entries simply age out. created_at is in the key too, because a
+pet that reuses a deleted pet's id (SQLite recycles them) starts again
+at version 1.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from app.metrics import metrics
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension providing the {% cache %} tag"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        args.append(nodes.Const(parser.name))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', args), [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key, ttl, template_name, caller):
+        cache = getattr(self.environment, 'fragment_cache', None)
+        if cache is None or not cache.enabled:
+            return caller()
+
+        if isinstance(key, (tuple, list)):
+            key = ':'.join(str(part) for part in key)
+        key = f'{template_name}:{key}'
+
+        value = cache.get(key)
+        if value is not None:
+            metrics.inc('cache_requests_total', cache='fragment', result='hit')
+            return value
+        metrics.inc('cache_requests_total', cache='fragment', result='miss')
+        value = caller()
+        cache.set(key, value, ttl)
+        return value
+
+class FragmentCache:
+    """Bounded LRU of rendered template fragments with per-entry expiry"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_size = 5000
+        self._default_ttl = 300
+        self.enabled = True
+        self._hits = 0
+        self._misses = 0
+
+    def init_app(self, app):
+        """Install the bytecode cache and the {% cache %} tag"""
+        app.config.setdefault('FRAGMENT_CACHE_ENABLED', True)
+        app.config.setdefault('FRAGMENT_CACHE_SIZE', 5000)
+        app.config.setdefault('FRAGMENT_CACHE_TTL', 300)
+        app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', None)
+        self.enabled = app.config['FRAGMENT_CACHE_ENABLED']
+        self._max_size = app.config['FRAGMENT_CACHE_SIZE']
+        self._default_ttl = app.config['FRAGMENT_CACHE_TTL']
+        self.clear()
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+
+        directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+        app.extensions['fragment_cache'] = self
+
+    def get(self, key):
+        """Cached fragment, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a fragment; ttl of 0 keeps it until evicted"""
+        ttl = self._default_ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self):
+        """Size and hit counts for monitoring"""
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self._hits, 'misses': self._misses}
+
+fragment_cache = FragmentCache()
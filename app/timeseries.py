@@ -0,0 +1,150 @@
+"""
+Time series for charts
+
+Counts and amounts are aggregated per day in SQL (donations from the
+daily and monthly rollup tables, adoptions and intakes with a GROUP BY
+over the indexed date columns), folded into the requested resolution,
+zero-filled, and then downsampled with Largest-Triangle-Three-Buckets
+(LTTB) to a fixed point budget. However long the range, a response
+carries at most that many points, and LTTB keeps the peaks and dips a
+chart needs to look right.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from app import db
+from app.models import Pet, Adoption, DonationDailyTotal, DonationMonthlyTotal
+
+SERIES = ('donations', 'adoptions', 'intakes')
+RESOLUTIONS = ('day', 'week', 'month')
+METRICS = ('amount', 'count')
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 2000
+# Buckets zero-filled before downsampling; longer ranges need a coarser resolution
+MAX_BUCKETS = 20000
+
+def bucket_start(day, resolution):
+    """First day of the bucket a day falls in (weeks start on Monday)"""
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    if resolution == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(day, resolution):
+    """First day of the following bucket, None after the last one before date.max"""
+    try:
+        if resolution == 'week':
+            return day + timedelta(days=7)
+        if resolution == 'month':
+            return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return day + timedelta(days=1)
+    except OverflowError:
+        return None
+
+def bucket_count(start, end, resolution):
+    """Number of buckets from the one holding start to the one holding end"""
+    start, end = bucket_start(start, resolution), bucket_start(end, resolution)
+    if resolution == 'week':
+        return (end - start).days // 7 + 1
+    if resolution == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days + 1
+
+def auto_resolution(start, end, points):
+    """Finest resolution whose bucket count fits the point budget"""
+    for resolution in ('day', 'week'):
+        if bucket_count(start, end, resolution) <= points:
+            return resolution
+    return 'month'
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def _donation_values(start, end, resolution, metric):
+    """{bucket day: value} read from the donation rollups"""
+    model = DonationMonthlyTotal if resolution == 'month' else DonationDailyTotal
+    value = db.func.sum(model.total_amount if metric == 'amount' else model.donation_count)
+    rows = db.session.execute(
+        db.select(model.bucket, value)
+        .where(model.bucket.between(start, end))
+        .group_by(model.bucket)
+    ).all()
+    return {_as_date(bucket): float(total or 0) for bucket, total in rows}
+
+def _count_values(column, start, end):
+    """{day: rows} for a datetime column, counted per day in SQL"""
+    day = db.func.date(column)
+    window = [column >= datetime.combine(start, datetime.min.time())]
+    if end < date.max:
+        window.append(column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    rows = db.session.execute(
+        db.select(day, db.func.count()).where(*window).group_by(day)
+    ).all()
+    return {_as_date(bucket): float(count) for bucket, count in rows}
+
+def aggregate(series, start, end, resolution, metric='amount'):
+    """Zero-filled [(bucket day, value)] from start to end at a resolution
+
+    start is moved back to the beginning of its bucket, so the first
+    bucket is complete. Callers keep bucket_count() within MAX_BUCKETS.
+    """
+    start = bucket_start(start, resolution)
+    if series == 'donations':
+        values = _donation_values(start, end, resolution, metric)
+    elif series == 'adoptions':
+        values = _count_values(Adoption.date, start, end)
+    else:
+        values = _count_values(Pet.created_at, start, end)
+
+    buckets = defaultdict(float)
+    for day, value in values.items():
+        buckets[bucket_start(day, resolution)] += value
+
+    points = []
+    day = start
+    while day is not None and day <= end:
+        points.append((day, buckets.get(day, 0.0)))
+        day = next_bucket(day, resolution)
+    return points
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of [(x, y)] to threshold points
+
+    Keeps the first and last point; from each bucket in between keeps the
+    point forming the largest triangle with the point kept before it and
+    the average of the next bucket.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+    xs = [x.toordinal() if isinstance(x, date) else x for x, _ in points]
+    ys = [y for _, y in points]
+
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    kept = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        # Point of this bucket with the largest triangle
+        ax, ay = xs[kept], ys[kept]
+        largest, chosen = -1.0, None
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > largest:
+                largest, chosen = area, j
+        sampled.append(points[chosen])
+        kept = chosen
+    sampled.append(points[-1])
+    return sampled
@@ -5,7 +5,10 @@ Utility functions for the Pet Management System
 import os
 import uuid
 from werkzeug.utils import secure_filename
-from flask import current_app
+from flask import (current_app, request, jsonify, flash, g, get_flashed_messages,
+                   has_request_context, render_template, stream_template)
+from app import db
+from app.metrics import metrics
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -27,6 +30,7 @@ def save_uploaded_file(file):
         # Save file
         file_path = os.path.join(upload_folder, unique_filename)
         file.save(file_path)
+        metrics.inc('upload_bytes_total', os.path.getsize(file_path))
         
         # Return relative URL path
         return f"/static/uploads/{unique_filename}"
@@ -44,3 +48,164 @@ def delete_uploaded_file(filename):
             except OSError:
                 return False
     return False
+
+def current_user_id():
+    """Id of the logged-in user, without triggering a user load mid-flush"""
+    if not has_request_context():
+        return None
+    user = g.get('_login_user')
+    return getattr(user, 'id', None)
+
+def wants_json():
+    """Whether a GET asks for JSON rather than a page
+
+    A GET has no body, so its Content-Type says nothing: go by
+    ?format=json or an Accept header that prefers application/json.
+    """
+    if request.args.get('format') == 'json':
+        return True
+    return request.accept_mimetypes.best_match(('text/html', 'application/json')) == 'application/json'
+
+def version_conflict(instance, data):
+    """Check a submitted version against the stored one (optimistic concurrency)
+
+    Returns True when the client edited a stale copy of the row. Requests
+    that do not send a version skip the pre-check; the version_id_col
+    guard on UPDATE still catches truly concurrent writes.
+    """
+    submitted = data.get('version')
+    if submitted is None or submitted == '':
+        return False
+    try:
+        return int(submitted) != instance.version
+    except (TypeError, ValueError):
+        return True
+
+def conflict_response(instance, noun, template_name, **context):
+    """409 response for an edit of instance made against a stale copy
+
+    Used both when version_conflict() rejects the submitted version and
+    when the commit raises StaleDataError (after the rollback, so the
+    current values are reloaded).
+    """
+    error_msg = f'This {noun} was changed by someone else. Review the current values and try again.'
+    if request.is_json:
+        return jsonify({'error': error_msg, 'current': instance.to_dict()}), 409
+    flash(error_msg, 'error')
+    return render_template(template_name, **context), 409
+
+class StreamedRows:
+    """Query rows fetched in batches while a template iterates them
+
+    Truthiness is answered with an EXISTS query, so templates can keep
+    their `{% if rows %}` checks, but the rows can only be iterated once
+    and have no length.
+    """
+
+    def __init__(self, query, batch_size):
+        self._query = query
+        self._batch_size = batch_size
+        self._any = None
+
+    def __bool__(self):
+        if self._any is None:
+            self._any = db.session.query(self._query.order_by(None).exists()).scalar()
+        return self._any
+
+    def __iter__(self):
+        if hasattr(self._query, 'iterate'):
+            # A read-model query (app.read_models) batches its own rows
+            return iter(self._query.iterate(self._batch_size))
+        # Executed as a 2.0-style select: the legacy Query uniques rows whenever
+        # joinedload is used, which yield_per refuses; many-to-one joins don't need it
+        statement = self._query.statement.execution_options(yield_per=self._batch_size)
+        return iter(db.session.scalars(statement))
+
+def _coalesce(chunks, size):
+    """Join the template's many small chunks into writes of about size characters"""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def render_list(template_name, name, query, **context):
+    """Render a list page, streaming it when STREAM_LIST_PAGES is on
+
+    Streamed pages send the header and first rows while later rows are
+    still being fetched with yield_per, so time-to-first-byte and memory
+    no longer grow with the table. Otherwise the query is loaded with
+    .all() and rendered in one piece.
+    """
+    if not current_app.config['STREAM_LIST_PAGES']:
+        context[name] = query.all()
+        return render_template(template_name, **context)
+
+    context[name] = StreamedRows(query, current_app.config['STREAM_YIELD_PER'])
+    # Pop the flashes now: the session cookie is saved before the first chunk
+    # is sent, so popping them while streaming would leave them for the next
+    # page. The request context keeps them for base.html's own call.
+    get_flashed_messages()
+    chunks = stream_template(template_name, **context)
+    return current_app.response_class(_coalesce(chunks, current_app.config['STREAM_BUFFER_SIZE']),
+                                      mimetype='text/html')
+
+def insert_missing(connection, table, rows, keys):
+    """Insert rows whose key is not in the table yet, leaving existing rows alone
+
+    Uses the dialect's conflict handling (SQLite ON CONFLICT DO NOTHING,
+    MySQL ON DUPLICATE KEY no-op), so two transactions adding the same key
+    don't fail: the second waits for the first and then skips its row.
+    """
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        connection.execute(insert(table).on_conflict_do_nothing(
+            index_elements=[table.c[key] for key in keys]), rows)
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        connection.execute(insert(table).on_duplicate_key_update(
+            **{keys[0]: table.c[keys[0]]}), rows)
+    else:
+        for row in rows:
+            match = db.and_(*(table.c[key] == row[key] for key in keys))
+            if connection.execute(db.select(db.literal(1)).where(match)).first() is None:
+                connection.execute(table.insert(), [row])
+
+def upsert_add(connection, table, rows, keys, counters):
+    """Insert rows, or add their counter columns to the row already holding their key
+
+    Uses the dialect's upsert (SQLite ON CONFLICT, MySQL ON DUPLICATE KEY)
+    so concurrent writers to the same key can't lose an increment.
+    """
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c[key] for key in keys],
+            set_={column: table.c[column] + statement.excluded[column] for column in counters})
+        connection.execute(statement, rows)
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        statement = statement.on_duplicate_key_update(
+            **{column: table.c[column] + statement.inserted[column] for column in counters})
+        connection.execute(statement, rows)
+    else:
+        for row in rows:
+            match = db.and_(*(table.c[key] == row[key] for key in keys))
+            result = connection.execute(table.update().where(match).values(
+                **{column: table.c[column] + row[column] for column in counters}))
+            if result.rowcount == 0:
+                connection.execute(table.insert(), [row])
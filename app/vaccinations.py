@@ -0,0 +1,187 @@
+"""
+Normalized vaccination records
+
+MedicalRecord.vaccines stays the free-text field staff type into, but
+every write also parses it into rows of the indexed vaccinations table
+(pet, vaccine code, date given, date due). Questions such as "which
+pets are due for rabies" then read the index instead of running LIKE
+over every medical record.
+
+Session events keep the table in step with ORM writes to medical
+records, including Query.delete(). Rows written with Core bypass them;
+`flask backfill-vaccinations` rebuilds the table in batches.
+"""
+
+import re
+from datetime import timedelta
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Pet, MedicalRecord, Vaccination
+
+# Spellings seen in the vaccines field, mapped to a vaccine code
+VACCINE_ALIASES = {
+    'rabies': 'RABIES',
+    'dhpp': 'DHPP',
+    'da2pp': 'DHPP',
+    'distemper': 'DHPP',
+    'fvrcp': 'FVRCP',
+    'bordetella': 'BORDETELLA',
+    'kennel cough': 'BORDETELLA',
+    'leptospirosis': 'LEPTO',
+    'lepto': 'LEPTO',
+    'felv': 'FELV',
+    'first round of puppy vaccines': 'PUPPY_SERIES',
+    'puppy vaccines': 'PUPPY_SERIES'
+}
+
+# Days until the next dose is due
+DUE_INTERVALS = {
+    'BORDETELLA': 180,
+    'PUPPY_SERIES': 21
+}
+DEFAULT_DUE_INTERVAL = 365
+
+# Values that mean "no vaccines given"
+NO_VACCINES = {'', 'none', 'n/a', 'na', '-'}
+
+_SEPARATORS = re.compile(r'\s*(?:[,;/+]|\band\b)\s*', re.IGNORECASE)
+
+def vaccine_code(name):
+    """Code for one vaccine name; unknown names become an upper-case slug"""
+    name = ' '.join(name.lower().split())
+    if name in VACCINE_ALIASES:
+        return VACCINE_ALIASES[name]
+    return re.sub(r'[^A-Z0-9]+', '_', name.upper()).strip('_')[:50] or None
+
+def parse_vaccines(text):
+    """Distinct vaccine codes listed in a vaccines field, in order"""
+    if text is None or text.strip().lower() in NO_VACCINES:
+        return []
+    codes = []
+    for part in _SEPARATORS.split(text):
+        if part.strip().lower() in NO_VACCINES:
+            continue
+        code = vaccine_code(part)
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+def vaccination_rows(record_id, pet_id, treat_date, vaccines):
+    """vaccinations rows for one medical record"""
+    return [{
+        'medical_record_id': record_id,
+        'pet_id': pet_id,
+        'vaccine_code': code,
+        'given_date': treat_date,
+        'due_date': treat_date + timedelta(days=DUE_INTERVALS.get(code, DEFAULT_DUE_INTERVAL))
+    } for code in parse_vaccines(vaccines)]
+
+def sync(connection, records):
+    """Replace the vaccinations of the given (id, pet_id, treat_date, vaccines) records"""
+    records = list(records)
+    if not records:
+        return 0
+    table = Vaccination.__table__
+    connection.execute(table.delete().where(table.c.medical_record_id.in_([r[0] for r in records])))
+    rows = [row for record in records for row in vaccination_rows(*record)]
+    if rows:
+        connection.execute(table.insert(), rows)
+    return len(rows)
+
+def backfill(batch_size=1000):
+    """Rebuild the vaccinations of every medical record in id batches"""
+    inserted = 0
+    last_id = 0
+    while True:
+        records = db.session.execute(
+            db.select(MedicalRecord.id, MedicalRecord.pet_id, MedicalRecord.treat_date,
+                      MedicalRecord.vaccines)
+            .where(MedicalRecord.id > last_id).order_by(MedicalRecord.id).limit(batch_size)
+        ).all()
+        if not records:
+            return inserted
+        inserted += sync(db.session.connection(), records)
+        db.session.commit()
+        last_id = records[-1][0]
+
+def due(vaccine=None, before=None, limit=500):
+    """Latest dose per pet and vaccine whose next dose is due on or before a date
+
+    Reads only the (vaccine_code, pet_id, due_date) index: the latest dose
+    of a vaccine is the one with the latest due date.
+    """
+    latest_due = db.func.max(Vaccination.due_date).label('due_date')
+    statement = db.select(
+        Vaccination.pet_id, Vaccination.vaccine_code,
+        db.func.max(Vaccination.given_date).label('given_date'), latest_due
+    ).group_by(Vaccination.vaccine_code, Vaccination.pet_id)
+    if vaccine:
+        statement = statement.where(Vaccination.vaccine_code == vaccine_code(vaccine))
+    if before is not None:
+        statement = statement.having(latest_due <= before)
+    due_rows = db.session.execute(statement.order_by(latest_due).limit(limit)).all()
+
+    names = dict(db.session.execute(
+        db.select(Pet.pet_id, Pet.pet_name).where(Pet.pet_id.in_({row.pet_id for row in due_rows}))
+    ).all()) if due_rows else {}
+    return [{
+        'pet_id': row.pet_id,
+        'pet_name': names.get(row.pet_id),
+        'vaccine_code': row.vaccine_code,
+        'given_date': row.given_date,
+        'due_date': row.due_date
+    } for row in due_rows]
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_records(session, flush_context):
+    """Note medical records whose vaccinations this flush changed"""
+    changed = session.info.setdefault('vaccination_records', {})
+    for obj in session.new:
+        if isinstance(obj, MedicalRecord):
+            changed[obj.id] = obj
+    for obj in session.dirty:
+        if not isinstance(obj, MedicalRecord):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[key].history.has_changes() for key in ('pet_id', 'treat_date', 'vaccines')):
+            changed[obj.id] = obj
+    for obj in session.deleted:
+        if isinstance(obj, MedicalRecord):
+            changed[obj.id] = None
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _sync_after_flush(session, flush_context):
+    """Rewrite the vaccinations of the records noted during the flush"""
+    changed = session.info.pop('vaccination_records', None)
+    if not changed:
+        return
+    connection = session.connection()
+    deleted = [record_id for record_id, obj in changed.items() if obj is None]
+    if deleted:
+        table = Vaccination.__table__
+        connection.execute(table.delete().where(table.c.medical_record_id.in_(deleted)))
+    sync(connection, [(obj.id, obj.pet_id, obj.treat_date, obj.vaccines)
+                      for obj in changed.values() if obj is not None])
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_delete_records(orm_execute_state):
+    """Query.delete() on medical records also removes their vaccinations"""
+    if not orm_execute_state.is_delete:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not MedicalRecord:
+        return
+    record_ids = db.select(MedicalRecord.id)
+    if orm_execute_state.statement.whereclause is not None:
+        record_ids = record_ids.where(orm_execute_state.statement.whereclause)
+    # Straight on the connection, so this doesn't re-enter do_orm_execute
+    table = Vaccination.__table__
+    orm_execute_state.session.connection().execute(
+        table.delete().where(table.c.medical_record_id.in_(record_ids)))
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed(session):
+    session.info.pop('vaccination_records', None)
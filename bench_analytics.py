@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Pet Management System - Trends Analytics Benchmark
+Times the trends page statistics in app/analytics.py
+
+Seeds ROWS donations (plus a pet and adoption per 20 donations), then
+reports the cold load (one streamed query per table into the columns),
+a warm call with nothing new, and a call after new donations were
+appended. Runs with NumPy when it is installed and plain Python otherwise.
+
+Usage:
+    python bench_analytics.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# Benchmarks run against their own database file unless told otherwise
+DEFAULT_DATABASE_URL = 'sqlite:///bench_analytics.db'
+
+def seed(rows, batch_size=20000):
+    """Recreate the schema with rows donations and rows // 20 adopted-or-not pets"""
+    from app import db
+    from app.models import Pet, Donation, Adoption
+
+    db.drop_all()
+    db.create_all()
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    for start in range(0, rows, batch_size):
+        stop = min(start + batch_size, rows)
+        db.session.execute(db.insert(Donation), [
+            {'amount': round(rng.lognormvariate(3.5, 0.8), 2), 'donor_name': 'Donor',
+             'donor_email': 'donor@example.com', 'date': now - timedelta(minutes=rng.randrange(3 * 525600))}
+            for _ in range(start, stop)
+        ])
+    pets = rows // 20
+    db.session.execute(db.insert(Pet), [
+        {'pet_id': i + 1, 'pet_name': f'Pet {i}', 'breed': rng.choice(['Beagle', 'Labrador', 'Tabby', 'Mixed']),
+         'age': rng.randrange(15), 'gender': 'male', 'status': 'available',
+         'created_at': now - timedelta(days=rng.randrange(1000))}
+        for i in range(pets)
+    ])
+    db.session.execute(db.insert(Adoption), [
+        {'adopt_name': 'Adopter', 'adopt_email': 'adopter@example.com', 'pet_id': i + 1,
+         'date': now - timedelta(days=rng.randrange(30))}
+        for i in range(0, pets, 2)
+    ])
+    db.session.commit()
+
+def timed(label, function):
+    started = time.perf_counter()
+    result = function()
+    print(f"{label:<28} {(time.perf_counter() - started) * 1000:>9.1f} ms")
+    return result
+
+def main():
+    """Parse arguments, seed and time the analytics"""
+    parser = argparse.ArgumentParser(description='Time the trends page analytics')
+    parser.add_argument('--rows', type=int, default=1000000, help='donations to seed')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='reuse the existing database instead of regenerating it')
+    parser.add_argument('--database-url', default=os.getenv('BENCHMARK_DATABASE_URL', DEFAULT_DATABASE_URL),
+                        help=f'database to benchmark against (default {DEFAULT_DATABASE_URL})')
+    args = parser.parse_args()
+
+    # Must be set before the app (and its engine) is created
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from app import create_app, db
+    from app import analytics as analytics_module
+    from app.models import Donation
+
+    print("⏱️  Pet Management System - Trends Analytics Benchmark")
+    print("=" * 50)
+
+    app = create_app()
+    app.config['SQL_INSTRUMENTATION'] = False
+
+    with app.app_context():
+        if not args.no_seed:
+            print(f"Seeding {args.rows:,} donations...")
+            seed(args.rows)
+
+        analytics = analytics_module.analytics
+        print(f"NumPy: {'yes' if analytics_module.np is not None else 'no (plain Python)'}")
+        timed('cold load + statistics', analytics.trends)
+        timed('warm statistics', analytics.trends)
+        db.session.execute(db.insert(Donation), [
+            {'amount': 25, 'donor_name': 'Donor', 'donor_email': 'donor@example.com', 'date': datetime.utcnow()}
+            for _ in range(1000)
+        ])
+        db.session.commit()
+        timed('append 1,000 + statistics', analytics.trends)
+
+if __name__ == '__main__':
+    main()
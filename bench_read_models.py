@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Pet Management System - Read Model Benchmark
+Compares loading list views through the ORM with the Core select() read
+models in app/read_models.py
+
+Seeds ROWS pets and ROWS medical records, then loads the employee pets
+and medical records lists both ways. It reports the best-of-N wall time
+and the memory held by the loaded rows, plus the peak while loading
+(from tracemalloc, in a separate pass so tracing does not inflate the
+timings).
+
+Usage:
+    python bench_read_models.py --rows 50000
+"""
+
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+# Benchmarks run against their own database file unless told otherwise
+DEFAULT_DATABASE_URL = 'sqlite:///bench_read_models.db'
+
+def seed(rows, batch_size=5000):
+    """Recreate the schema with rows pets, each with one medical record"""
+    from app import db
+    from app.models import Pet, Donation, MedicalRecord
+
+    db.drop_all()
+    db.create_all()
+    today = date.today()
+    db.session.execute(db.insert(Donation), [
+        {'amount': 25, 'donor_name': f'Donor {i}', 'donor_email': f'donor{i}@example.com'}
+        for i in range(rows // 10)
+    ])
+    for start in range(0, rows, batch_size):
+        stop = min(start + batch_size, rows)
+        db.session.execute(db.insert(Pet), [
+            {'pet_id': i + 1, 'pet_name': f'Pet {i}', 'breed': 'Beagle', 'age': i % 180,
+             'gender': 'male' if i % 2 else 'female', 'status': 'available',
+             'description': 'Friendly and house-trained. ' * 20}
+            for i in range(start, stop)
+        ])
+        db.session.execute(db.insert(MedicalRecord), [
+            {'pet_id': i + 1, 'treatment_type': 'Checkup', 'treat_date': today - timedelta(days=i % 365),
+             'vaccines': 'Rabies, DHPP' if i % 3 else None, 'description': 'Routine checkup. ' * 20,
+             'donor_id': (i % (rows // 10)) + 1 if i % 4 == 0 else None}
+            for i in range(start, stop)
+        ])
+    db.session.commit()
+
+def orm_pets():
+    from app.models import Pet
+    return Pet.query.options(*Pet.list_columns()).order_by(Pet.created_at.desc()).all()
+
+def read_pets():
+    from app import read_models
+    return read_models.pets().all()
+
+def orm_medical_records():
+    from sqlalchemy.orm import joinedload
+    from app.models import Pet, Donation, MedicalRecord
+    return MedicalRecord.query.options(
+        *MedicalRecord.list_columns(),
+        joinedload(MedicalRecord.pet).load_only(Pet.pet_name, Pet.breed, Pet.age),
+        joinedload(MedicalRecord.donation).load_only(Donation.donor_name, Donation.amount)
+    ).order_by(MedicalRecord.created_at.desc()).all()
+
+def read_medical_records():
+    from app import read_models
+    return read_models.medical_records().all()
+
+CASES = [
+    ('pets_list', orm_pets, read_pets),
+    ('medical_records_list', orm_medical_records, read_medical_records),
+]
+
+def measure(loader, repeat):
+    """Best wall time, then retained and peak memory of one traced load"""
+    from app import db
+
+    timings = []
+    for _ in range(repeat):
+        db.session.remove()
+        gc.collect()
+        started = time.perf_counter()
+        rows = loader()
+        timings.append(time.perf_counter() - started)
+        del rows
+
+    db.session.remove()
+    gc.collect()
+    tracemalloc.start()
+    rows = loader()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(rows)
+    del rows
+    db.session.remove()
+    return {'rows': count, 'seconds': min(timings), 'retained_bytes': retained, 'peak_bytes': peak}
+
+def run(app, repeat=3):
+    """Measure every case both ways"""
+    results = {}
+    with app.app_context():
+        for name, orm_loader, read_loader in CASES:
+            results[name] = {'orm': measure(orm_loader, repeat), 'read_model': measure(read_loader, repeat)}
+    return results
+
+def print_report(results):
+    """Print a side-by-side table"""
+    mb = 1024 * 1024
+    print(f"{'view':<22} {'path':<11} {'rows':>7} {'time ms':>9} {'held MB':>8} {'peak MB':>8}")
+    for name, paths in results.items():
+        for path, r in paths.items():
+            print(f"{name:<22} {path:<11} {r['rows']:>7,} {r['seconds'] * 1000:>9.1f} "
+                  f"{r['retained_bytes'] / mb:>8.1f} {r['peak_bytes'] / mb:>8.1f}")
+        orm, read = paths['orm'], paths['read_model']
+        print(f"{'':<22} {'saving':<11} {'':>7} {1 - read['seconds'] / orm['seconds']:>9.0%} "
+              f"{1 - read['retained_bytes'] / orm['retained_bytes']:>8.0%} "
+              f"{1 - read['peak_bytes'] / orm['peak_bytes']:>8.0%}")
+
+def main():
+    """Parse arguments, seed and run the comparison"""
+    parser = argparse.ArgumentParser(description='Compare ORM and read-model list loading')
+    parser.add_argument('--rows', type=int, default=50000, help='pets and medical records to seed')
+    parser.add_argument('--repeat', type=int, default=3, help='timed loads per path (best is kept)')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='reuse the existing database instead of regenerating it')
+    parser.add_argument('--database-url', default=os.getenv('BENCHMARK_DATABASE_URL', DEFAULT_DATABASE_URL),
+                        help=f'database to benchmark against (default {DEFAULT_DATABASE_URL})')
+    args = parser.parse_args()
+
+    # Must be set before the app (and its engine) is created
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from app import create_app
+
+    print("⏱️  Pet Management System - Read Model Benchmark")
+    print("=" * 50)
+
+    app = create_app()
+    app.config['SQL_INSTRUMENTATION'] = False
+
+    if not args.no_seed:
+        print(f"Seeding {args.rows:,} pets and medical records...")
+        with app.app_context():
+            seed(args.rows)
+
+    print_report(run(app, args.repeat))
+
+if __name__ == '__main__':
+    main()
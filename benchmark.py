@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Pet Management System - Route Latency Benchmark
+Seeds a dataset, logs in as an admin and an employee through the Flask
+test client and requests every auth, admin and employee route repeatedly
+
+For each route it reports p50/p95/p99 latency, SQL queries per request
+and memory allocated while handling the request (from tracemalloc, in a
+separate pass so tracing does not inflate the latency figures). Results
+are written as JSON and can be compared against a saved baseline.
+
+Usage:
+    python benchmark.py --scale 10 --output bench.json
+    python benchmark.py --scale 10 --baseline bench.json --fail-on-regression
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime
+
+# Benchmarks run against their own database file unless told otherwise
+DEFAULT_DATABASE_URL = 'sqlite:///benchmark.db'
+
+BENCH_PASSWORD = 'benchmark123'
+
+# (name, role, method, path, body)
+# Paths are formatted with the ids of the fixture rows; {fresh_pet_id} is a
+# new available pet created (untimed) before each request, for routes that
+# consume the pet. Bodies are JSON, or a callable taking the iteration number.
+ROUTES = [
+    ('auth.login GET', None, 'GET', '/login', None),
+    ('auth.login POST', None, 'POST', '/login',
+     {'username': 'bench_employee', 'password': BENCH_PASSWORD}),
+    ('auth.register GET', None, 'GET', '/register', None),
+    ('auth.register POST', None, 'POST', '/register',
+     lambda i: {'username': f'bench_new_{os.getpid()}_{i}',
+                'email': f'bench_new_{os.getpid()}_{i}@example.com',
+                'password': BENCH_PASSWORD, 'confirm_password': BENCH_PASSWORD,
+                'role': 'employee'}),
+    ('auth.logout', 'fresh_employee', 'GET', '/logout', None),
+    ('auth.index', 'employee', 'GET', '/', None),
+
+    ('admin.dashboard', 'admin', 'GET', '/admin/dashboard', None),
+    ('admin.pets_list', 'admin', 'GET', '/admin/pets', None),
+    ('admin.pet_detail', 'admin', 'GET', '/admin/pets/{pet_id}', None),
+    ('admin.create_pet GET', 'admin', 'GET', '/admin/pets/create', None),
+    ('admin.create_pet POST', 'admin', 'POST', '/admin/pets/create',
+     {'pet_name': 'Bench', 'breed': 'Beagle', 'age': 3, 'gender': 'male'}),
+    ('admin.edit_pet GET', 'admin', 'GET', '/admin/pets/{pet_id}/edit', None),
+    ('admin.edit_pet POST', 'admin', 'POST', '/admin/pets/{pet_id}/edit',
+     lambda i: {'pet_name': 'Bench', 'breed': 'Beagle', 'age': i % 15, 'gender': 'male',
+                'status': 'available'}),
+    ('admin.delete_pet', 'admin', 'POST', '/admin/pets/{fresh_pet_id}/delete', {}),
+    ('admin.donations_list', 'admin', 'GET', '/admin/donations', None),
+    ('admin.create_donation GET', 'admin', 'GET', '/admin/donations/create', None),
+    ('admin.create_donation POST', 'admin', 'POST', '/admin/donations/create',
+     {'amount': 25, 'donor_name': 'Bench Donor', 'donor_email': 'donor@example.com'}),
+    ('admin.adoptions_list', 'admin', 'GET', '/admin/adoptions', None),
+    ('admin.create_adoption GET', 'admin', 'GET', '/admin/adoptions/create', None),
+    ('admin.create_adoption POST', 'admin', 'POST', '/admin/adoptions/create',
+     {'adopt_name': 'Bench Adopter', 'adopt_email': 'adopter@example.com',
+      'pet_id': '{fresh_pet_id}'}),
+    ('admin.medical_records_list', 'admin', 'GET', '/admin/medical-records', None),
+    ('admin.create_medical_record GET', 'admin', 'GET', '/admin/medical-records/create', None),
+    ('admin.create_medical_record POST', 'admin', 'POST', '/admin/medical-records/create',
+     {'pet_id': '{pet_id}', 'treatment_type': 'Health checkup',
+      'treat_date': date.today().isoformat()}),
+    ('admin.donation_totals', 'admin', 'GET', '/admin/donations/totals?by=purpose', None),
+    ('admin.donors_list', 'admin', 'GET', '/admin/donors', None),
+    ('admin.donor_detail', 'admin', 'GET', '/admin/donors/{donor_id}', None),
+    ('admin.vaccinations_due', 'admin', 'GET', '/admin/vaccinations/due?within_days=30', None),
+    ('admin.jobs_status', 'admin', 'GET', '/admin/jobs', None),
+    ('admin.audit_log', 'admin', 'GET', '/admin/audit', None),
+    ('admin.trends', 'admin', 'GET', '/admin/trends', None),
+    ('admin.length_of_stay', 'admin', 'GET', '/admin/reports/length-of-stay', None),
+    ('admin.shelter_occupancy', 'admin', 'GET', '/admin/shelters', None),
+    ('admin.perf', 'admin', 'GET', '/admin/perf', None),
+    ('admin.slow_queries', 'admin', 'GET', '/admin/slow-queries', None),
+
+    ('employee.dashboard', 'employee', 'GET', '/employee/dashboard', None),
+    ('employee.pets_list', 'employee', 'GET', '/employee/pets', None),
+    ('employee.pet_detail', 'employee', 'GET', '/employee/pets/{pet_id}', None),
+    ('employee.donate GET', 'employee', 'GET', '/employee/donate', None),
+    ('employee.donate POST', 'employee', 'POST', '/employee/donate',
+     {'amount': 25, 'donor_name': 'Bench Donor', 'donor_email': 'donor@example.com'}),
+    ('employee.adopt_pets_list', 'employee', 'GET', '/employee/adopt', None),
+    ('employee.match_pets', 'employee', 'GET', '/employee/adopt/match?species=dog&min_age=1&max_age=4&energy=high', None),
+    ('employee.adopt_pet GET', 'employee', 'GET', '/employee/adopt/{fresh_pet_id}', None),
+    ('employee.adopt_pet POST', 'employee', 'POST', '/employee/adopt/{fresh_pet_id}',
+     {'adopt_name': 'Bench Adopter', 'adopt_email': 'adopter@example.com'}),
+    ('employee.medical_records_list', 'employee', 'GET', '/employee/medical-records', None),
+    ('employee.my_donations', 'employee', 'GET', '/employee/my-donations', None),
+    ('employee.my_adoptions', 'employee', 'GET', '/employee/my-adoptions', None),
+    ('employee.edit_my_donation GET', 'employee', 'GET',
+     '/employee/my-donations/{donation_id}/edit', None),
+    ('employee.edit_my_donation POST', 'employee', 'POST',
+     '/employee/my-donations/{donation_id}/edit',
+     lambda i: {'amount': 10 + i % 50, 'donor_name': 'Bench Donor',
+                'donor_email': 'donor@example.com'}),
+    ('employee.edit_my_adoption GET', 'employee', 'GET',
+     '/employee/my-adoptions/{adoption_id}/edit', None),
+    ('employee.edit_my_adoption POST', 'employee', 'POST',
+     '/employee/my-adoptions/{adoption_id}/edit',
+     {'adopt_name': 'Bench Adopter', 'adopt_email': 'adopter@example.com'}),
+
+    ('api.timeseries_series donations', 'admin', 'GET',
+     '/api/v1/timeseries/donations?from=2015-01-01', None),
+    ('api.timeseries_series adoptions', 'employee', 'GET', '/api/v1/timeseries/adoptions', None),
+]
+
+BENCHMARKED_BLUEPRINTS = ('auth', 'admin', 'employee', 'api')
+
+def percentile(sorted_values, pct):
+    """Linearly interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+def summarize(timings, queries, allocations, statuses):
+    """Aggregate the samples collected for one route"""
+    ordered = sorted(timings)
+    result = {
+        'iterations': len(timings),
+        'statuses': sorted(set(statuses)),
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'queries_per_request': sum(queries) / len(queries),
+        'max_queries': max(queries)
+    }
+    if allocations:
+        result['alloc_peak_kb'] = sum(a[0] for a in allocations) / len(allocations) / 1024
+        result['alloc_retained_kb'] = sum(a[1] for a in allocations) / len(allocations) / 1024
+    return result
+
+class QueryCounter:
+    """Counts statements issued by the benchmarking thread only
+
+    The audit writer and job runner use their own threads; their writes
+    are not part of the request being measured.
+    """
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._thread_id = threading.get_ident()
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread_id:
+            self.count += 1
+
+def seed(counts, seed_value):
+    """Recreate the schema and generate the benchmark dataset"""
+    from app import db
+    from generate_data import generate
+
+    db.drop_all()
+    db.create_all()
+    generate(counts, seed=seed_value, verbose=False)
+
+def create_fixtures():
+    """Benchmark users plus rows they own; returns ids for path formatting
+
+    Must run inside an app context.
+    """
+    from app import db
+    from app.models import User, Pet, Donation, Adoption
+
+    users = {}
+    for role in ('admin', 'employee'):
+        username = f'bench_{role}'
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            user = User(username=username, email=f'{username}@petmanagement.com', role=role)
+            user.set_password(BENCH_PASSWORD)
+            db.session.add(user)
+        users[role] = user
+    db.session.flush()
+
+    pet = Pet(pet_name='Bench', breed='Beagle', age=3, gender='male', status='available')
+    adopted = Pet(pet_name='Bench Adopted', breed='Beagle', age=3, gender='female',
+                  status='adopted')
+    db.session.add_all([pet, adopted])
+    db.session.flush()
+
+    donation = Donation(amount=25, donor_name='Bench Donor', donor_email='donor@example.com',
+                        user_id=users['employee'].id)
+    adoption = Adoption(adopt_name='Bench Adopter', adopt_email='adopter@example.com',
+                        pet_id=adopted.pet_id, user_id=users['employee'].id)
+    db.session.add_all([donation, adoption])
+    db.session.commit()
+    return {'pet_id': pet.pet_id, 'donation_id': donation.id, 'adoption_id': adoption.id,
+            'donor_id': donation.donor_id}
+
+def fresh_pet_id(app):
+    """Insert an available pet for routes that adopt or delete one"""
+    from app import db
+    from app.models import Pet
+
+    with app.app_context():
+        pet = Pet(pet_name='Bench', breed='Beagle', age=2, gender='female', status='available')
+        db.session.add(pet)
+        db.session.commit()
+        return pet.pet_id
+
+def login(app, role):
+    """Test client with a logged-in session for the given role"""
+    client = app.test_client()
+    response = client.post('/login', json={'username': f'bench_{role}', 'password': BENCH_PASSWORD})
+    if response.status_code != 200:
+        raise RuntimeError(f'Could not log in as bench_{role}: {response.status_code}')
+    return client
+
+def _format(value, ids):
+    """Fill {placeholders} in a path or JSON body"""
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {k: _format(v, ids) for k, v in value.items()}
+    return value
+
+def run_route(app, clients, counter, route, ids, iterations, warmup, alloc_iterations):
+    """Request one route repeatedly and summarize the samples"""
+    name, role, method, path, body = route
+    timings, queries, allocations, statuses = [], [], [], []
+
+    for i in range(warmup + iterations + alloc_iterations):
+        request_ids = dict(ids)
+        if '{fresh_pet_id}' in path or '{fresh_pet_id}' in json.dumps(body if isinstance(body, dict) else {}):
+            request_ids['fresh_pet_id'] = fresh_pet_id(app)
+        if role == 'fresh_employee':
+            client = login(app, 'employee')
+        else:
+            client = clients[role]
+        url = _format(path, request_ids)
+        payload = _format(body(i) if callable(body) else body, request_ids)
+        kwargs = {'json': payload} if payload is not None else {}
+
+        tracing = i >= warmup + iterations
+        if tracing:
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            allocations.append((peak - before, current - before))
+        response.close()
+
+        if i < warmup:
+            continue
+        if not tracing:
+            timings.append(elapsed)
+            queries.append(counter.count)
+        statuses.append(response.status_code)
+
+    return name, summarize(timings, queries, allocations, statuses)
+
+def uncovered_endpoints(app):
+    """Benchmarked-blueprint endpoints missing from ROUTES"""
+    covered = {name.split(' ')[0] for name, *_ in ROUTES}
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()
+                 if rule.endpoint.split('.')[0] in BENCHMARKED_BLUEPRINTS}
+    return sorted(endpoints - covered)
+
+def run_benchmark(app, iterations=50, warmup=5, alloc_iterations=5, only=None):
+    """Benchmark every route
+
+    Must be called outside an app context: a request pushed while one is
+    active reuses it, so g (and the cached login user) would leak from
+    one request into the next.
+    """
+    from app import db
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+        ids = create_fixtures()
+    clients = {None: app.test_client(), 'admin': login(app, 'admin'),
+               'employee': login(app, 'employee')}
+
+    results = {}
+    for route in ROUTES:
+        if only and not any(pattern in route[0] for pattern in only):
+            continue
+        name, summary = run_route(app, clients, counter, route, ids,
+                                  iterations, warmup, alloc_iterations)
+        results[name] = summary
+    return results
+
+def compare(results, baseline, tolerance=0.2, min_delta_ms=1.0):
+    """Routes whose p95 latency or query count regressed against a baseline
+
+    A latency regression needs to exceed both the relative tolerance and
+    an absolute floor, so sub-millisecond jitter is not reported.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        p95, old_p95 = current['p95_ms'], previous['p95_ms']
+        if p95 > old_p95 * (1 + tolerance) and p95 - old_p95 > min_delta_ms:
+            regressions.append((name, 'p95_ms', old_p95, p95))
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append((name, 'queries_per_request',
+                                previous['queries_per_request'], current['queries_per_request']))
+    return regressions
+
+def print_report(results, baseline=None):
+    """Print a table of the results, with baseline p95 when available"""
+    header = f"{'route':<38} {'status':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'alloc KB':>9}"
+    if baseline:
+        header += f" {'base p95':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        line = (f"{name:<38} {','.join(map(str, r['statuses'])):>8} {r['p50_ms']:>8.2f} "
+                f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['queries_per_request']:>8.1f} "
+                f"{r.get('alloc_peak_kb', 0):>9.1f}")
+        if baseline:
+            previous = baseline.get('routes', {}).get(name)
+            line += f" {previous['p95_ms']:>9.2f}" if previous else f" {'-':>9}"
+        print(line)
+
+def main():
+    """Parse arguments, run the benchmark and write the results"""
+    parser = argparse.ArgumentParser(description='Benchmark route latency')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='dataset size as a multiple of the generator defaults')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the dataset')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='reuse the existing database instead of regenerating it')
+    parser.add_argument('--database-url', default=os.getenv('BENCHMARK_DATABASE_URL', DEFAULT_DATABASE_URL),
+                        help=f'database to benchmark against (default {DEFAULT_DATABASE_URL})')
+    parser.add_argument('--iterations', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route first')
+    parser.add_argument('--alloc-iterations', type=int, default=5,
+                        help='extra requests per route traced with tracemalloc (0 to skip)')
+    parser.add_argument('--route', action='append', dest='routes',
+                        help='only run routes whose name contains this text (repeatable)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against a previous JSON results file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative p95 increase before flagging (default 0.2)')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='exit with status 1 if any route regressed')
+    args = parser.parse_args()
+
+    # Must be set before the app (and its engine) is created
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from app import create_app
+    from generate_data import BASE_COUNTS
+
+    counts = {table: int(count * args.scale) for table, count in BASE_COUNTS.items()}
+
+    print("⏱️  Pet Management System - Route Benchmark")
+    print("=" * 50)
+
+    app = create_app()
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+    # Server errors are summarized at the end instead of one traceback per request
+    app.logger.setLevel(logging.CRITICAL)
+
+    if not args.no_seed:
+        print(f"Seeding {sum(counts.values()):,} rows (scale {args.scale})...")
+        with app.app_context():
+            seed(counts, args.seed)
+
+    missing = uncovered_endpoints(app)
+    if missing:
+        print(f"⚠️  Routes without a benchmark: {', '.join(missing)}")
+
+    started = time.perf_counter()
+    results = run_benchmark(app, args.iterations, args.warmup, args.alloc_iterations,
+                            args.routes)
+    print(f"Benchmarked {len(results)} routes in {time.perf_counter() - started:.1f}s\n")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1],
+            'scale': args.scale,
+            'seed': args.seed,
+            'counts': None if args.no_seed else counts,
+            'iterations': args.iterations,
+            'warmup': args.warmup
+        },
+        'routes': results
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+    errors = [name for name, r in results.items() if any(s >= 500 for s in r['statuses'])]
+    if errors:
+        print(f"\n❌ Server errors from: {', '.join(errors)}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for name, metric, old, new in regressions:
+                print(f"   {name}: {metric} {old:.2f} -> {new:.2f}")
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print("\n✅ No regressions against baseline")
+
+if __name__ == '__main__':
+    main()
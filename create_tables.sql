@@ -15,6 +15,17 @@ CREATE TABLE users (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Shelter locations that pets.shelter_no points to; shelter numbers are
+-- stored normalized and the per-status pet counts are maintained by the application
+CREATE TABLE shelters (
+    shelter_no VARCHAR(50) PRIMARY KEY,
+    name VARCHAR(100),
+    available_count INT NOT NULL DEFAULT 0,
+    foster_count INT NOT NULL DEFAULT 0,
+    adopted_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Pets table for animal records
 CREATE TABLE pets (
     pet_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -26,7 +37,25 @@ CREATE TABLE pets (
     description TEXT,
     img_url VARCHAR(500),
     shelter_no VARCHAR(50),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version INT NOT NULL DEFAULT 1,
+    -- Medical summary, kept in sync with medical_records by the application
+    medical_record_count INT NOT NULL DEFAULT 0,
+    last_treat_date DATE,
+    last_vaccine_date DATE,
+    FOREIGN KEY (shelter_no) REFERENCES shelters(shelter_no)
+);
+
+-- Donors keyed on normalized email (lower case) with the normalized phone
+-- (digits only) as a second key; donations are linked by the application
+CREATE TABLE donors (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    email_key VARCHAR(120) UNIQUE NOT NULL,
+    phone_key VARCHAR(20),
+    name VARCHAR(100) NOT NULL,
+    email VARCHAR(120) NOT NULL,
+    phone VARCHAR(20),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Donations table for financial contributions
@@ -40,7 +69,10 @@ CREATE TABLE donations (
     message TEXT,
     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     user_id INT,
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+    donor_id INT,
+    version INT NOT NULL DEFAULT 1,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+    FOREIGN KEY (donor_id) REFERENCES donors(id)
 );
 
 -- Adoptions table for pet adoptions
@@ -53,6 +85,7 @@ CREATE TABLE adoptions (
     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     address TEXT,
     user_id INT,
+    version INT NOT NULL DEFAULT 1,
     FOREIGN KEY (pet_id) REFERENCES pets(pet_id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
 );
@@ -71,17 +104,129 @@ CREATE TABLE medical_records (
     FOREIGN KEY (donor_id) REFERENCES donations(id) ON DELETE SET NULL
 );
 
+-- Background jobs, persisted so they can be retried after failures or restarts
+CREATE TABLE jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    payload TEXT,
+    status ENUM('pending', 'running', 'done', 'failed') DEFAULT 'pending' NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME
+);
+
+-- Append-only audit log of writes, filled in batches by a background thread
+CREATE TABLE audit_log (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    entity VARCHAR(50) NOT NULL,
+    entity_id VARCHAR(50),
+    action ENUM('create', 'update', 'delete', 'bulk_delete', 'bulk_update') NOT NULL,
+    user_id INT,
+    changes TEXT,
+    created_at DATETIME NOT NULL
+);
+
+-- Donation rollups per day / month (first day), purpose and employee,
+-- maintained by the application; '' and 0 stand for no purpose / no employee
+CREATE TABLE donation_daily_totals (
+    bucket DATE NOT NULL,
+    purpose VARCHAR(200) NOT NULL DEFAULT '',
+    user_id INT NOT NULL DEFAULT 0,
+    donation_count INT NOT NULL DEFAULT 0,
+    total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, purpose, user_id)
+);
+
+CREATE TABLE donation_monthly_totals (
+    bucket DATE NOT NULL,
+    purpose VARCHAR(200) NOT NULL DEFAULT '',
+    user_id INT NOT NULL DEFAULT 0,
+    donation_count INT NOT NULL DEFAULT 0,
+    total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, purpose, user_id)
+);
+
+-- Vaccines parsed from medical_records.vaccines, maintained by the application
+CREATE TABLE vaccinations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    medical_record_id INT NOT NULL,
+    pet_id INT NOT NULL,
+    vaccine_code VARCHAR(50) NOT NULL,
+    given_date DATE NOT NULL,
+    due_date DATE NOT NULL,
+    FOREIGN KEY (medical_record_id) REFERENCES medical_records(id) ON DELETE CASCADE,
+    FOREIGN KEY (pet_id) REFERENCES pets(pet_id)
+);
+
+-- Next due date per pet and recurring treatment, maintained by the application
+CREATE TABLE due_treatments (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    pet_id INT NOT NULL,
+    treatment VARCHAR(50) NOT NULL,
+    kind ENUM('vaccine', 'treatment') NOT NULL,
+    last_record_id INT,
+    last_date DATE NOT NULL,
+    due_date DATE NOT NULL,
+    UNIQUE KEY uq_due_treatments_pet_treatment (pet_id, treatment),
+    FOREIGN KEY (pet_id) REFERENCES pets(pet_id) ON DELETE CASCADE,
+    FOREIGN KEY (last_record_id) REFERENCES medical_records(id) ON DELETE SET NULL
+);
+
+-- Pet status history and length-of-stay totals, maintained by the application
+CREATE TABLE pet_status_changes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    pet_id INT,
+    from_status VARCHAR(20),
+    to_status VARCHAR(20) NOT NULL,
+    changed_at DATETIME NOT NULL,
+    days_in_previous DOUBLE,
+    days_since_intake DOUBLE NOT NULL DEFAULT 0,
+    breed VARCHAR(100),
+    age INT,
+    shelter_no VARCHAR(50),
+    user_id INT,
+    FOREIGN KEY (pet_id) REFERENCES pets(pet_id) ON DELETE SET NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE pet_stay_totals (
+    metric VARCHAR(20) NOT NULL,
+    dimension VARCHAR(20) NOT NULL,
+    `key` VARCHAR(100) NOT NULL DEFAULT '',
+    stay_count INT NOT NULL DEFAULT 0,
+    total_days DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, dimension, `key`)
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_pets_status ON pets(status);
 CREATE INDEX idx_pets_created_at ON pets(created_at);
+CREATE INDEX ix_pets_shelter_no ON pets(shelter_no);
+CREATE INDEX ix_pets_last_treat_date ON pets(last_treat_date);
+CREATE INDEX ix_pets_last_vaccine_date ON pets(last_vaccine_date);
 CREATE INDEX idx_donations_date ON donations(date);
 CREATE INDEX idx_donations_user_id ON donations(user_id);
+CREATE INDEX idx_donations_donor_date ON donations(donor_id, date);
+CREATE INDEX ix_donors_phone_key ON donors(phone_key);
 CREATE INDEX idx_adoptions_date ON adoptions(date);
 CREATE INDEX idx_adoptions_user_id ON adoptions(user_id);
 CREATE INDEX idx_adoptions_pet_id ON adoptions(pet_id);
 CREATE INDEX idx_medical_records_pet_id ON medical_records(pet_id);
 CREATE INDEX idx_medical_records_treat_date ON medical_records(treat_date);
 CREATE INDEX idx_medical_records_donor_id ON medical_records(donor_id);
+CREATE INDEX ix_vaccinations_medical_record_id ON vaccinations(medical_record_id);
+CREATE INDEX idx_vaccinations_code_pet_due ON vaccinations(vaccine_code, pet_id, due_date);
+CREATE INDEX idx_vaccinations_pet_code_given ON vaccinations(pet_id, vaccine_code, given_date);
+CREATE INDEX idx_vaccinations_due_date ON vaccinations(due_date);
+CREATE INDEX idx_due_treatments_due_date ON due_treatments(due_date, pet_id);
+CREATE INDEX idx_pet_status_changes_pet_changed ON pet_status_changes(pet_id, changed_at);
+CREATE INDEX idx_pet_status_changes_to_changed ON pet_status_changes(to_status, changed_at);
+CREATE INDEX ix_jobs_status ON jobs(status);
+CREATE INDEX idx_audit_log_entity ON audit_log(entity, entity_id, created_at);
+CREATE INDEX idx_audit_log_created_at ON audit_log(created_at);
 
 -- Sample data insertion
 -- Insert sample users
@@ -90,6 +235,9 @@ INSERT INTO users (username, email, password_hash, role) VALUES
 ('employee1', 'employee1@petmanagement.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj4J/9Kz8K2a', 'employee'),
 ('employee2', 'employee2@petmanagement.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj4J/9Kz8K2a', 'employee');
 
+-- Insert sample shelters
+INSERT INTO shelters (shelter_no) VALUES ('SH001'), ('SH002'), ('SH003');
+
 -- Insert sample pets
 INSERT INTO pets (pet_name, breed, age, gender, status, description, img_url, shelter_no) VALUES
 ('Buddy', 'Golden Retriever', 3, 'male', 'available', 'Friendly and energetic dog, great with kids', 'https://example.com/buddy.jpg', 'SH001'),
@@ -112,3 +260,41 @@ INSERT INTO medical_records (pet_id, treatment_type, treat_date, donor_id, vacci
 
 -- Note: Default password for all users is 'password123'
 -- In production, use proper password hashing
+
+-- Fill the pets' medical summary for the sample records above
+-- (existing databases: add the three columns, then run `flask --app run backfill-medical-summary`)
+UPDATE pets SET
+    medical_record_count = (SELECT COUNT(*) FROM medical_records m WHERE m.pet_id = pets.pet_id),
+    last_treat_date = (SELECT MAX(treat_date) FROM medical_records m WHERE m.pet_id = pets.pet_id),
+    last_vaccine_date = (SELECT MAX(treat_date) FROM medical_records m WHERE m.pet_id = pets.pet_id
+                         AND m.vaccines IS NOT NULL AND m.vaccines <> '' AND LOWER(m.vaccines) <> 'none');
+
+-- The sample records' vaccines are parsed into vaccinations, and their
+-- due treatments scheduled, by `flask --app run backfill-vaccinations`
+-- and `flask --app run backfill-due-treatments`
+
+-- Donation rollups for the sample donations
+INSERT INTO donation_daily_totals (bucket, purpose, user_id, donation_count, total_amount)
+SELECT DATE(date), COALESCE(purpose, ''), COALESCE(user_id, 0), COUNT(*), SUM(amount)
+FROM donations
+GROUP BY DATE(date), COALESCE(purpose, ''), COALESCE(user_id, 0);
+
+INSERT INTO donation_monthly_totals (bucket, purpose, user_id, donation_count, total_amount)
+SELECT DATE_FORMAT(bucket, '%Y-%m-01'), purpose, user_id, SUM(donation_count), SUM(total_amount)
+FROM donation_daily_totals
+GROUP BY DATE_FORMAT(bucket, '%Y-%m-01'), purpose, user_id;
+
+-- The sample pets' status history and stay totals are seeded by
+-- `flask --app run backfill-status-history`
+
+-- Shelter occupancy for the sample pets
+-- (existing databases: create shelters, run `flask --app run normalize-shelters`,
+-- then add the index and the foreign key on pets.shelter_no)
+UPDATE shelters SET
+    available_count = (SELECT COUNT(*) FROM pets p WHERE p.shelter_no = shelters.shelter_no AND p.status = 'available'),
+    foster_count = (SELECT COUNT(*) FROM pets p WHERE p.shelter_no = shelters.shelter_no AND p.status = 'foster'),
+    adopted_count = (SELECT COUNT(*) FROM pets p WHERE p.shelter_no = shelters.shelter_no AND p.status = 'adopted');
+
+-- The sample donations are linked to their donors by
+-- `flask --app run dedupe-donors` (existing databases: create donors and
+-- add donations.donor_id with its index first)
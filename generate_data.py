@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Pet Management System - Synthetic Data Generator
+Generates large, realistic datasets for load testing and benchmarking
+
+Rows are built in Python with a seeded random generator and dated back
+from a fixed end date (the same seed and end date always produce the same
+data) and written with Core bulk inserts in
+large batches, bypassing the ORM unit of work.
+
+Usage:
+    python generate_data.py --scale 100 --seed 42 --reset
+    python generate_data.py --pets 200000 --donations 1000000
+    python generate_data.py --end 2026-01-01
+"""
+
+import argparse
+import bisect
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User, Pet, Donation, Adoption, MedicalRecord
+from app.medical_summary import backfill as backfill_medical_summary
+from app.vaccinations import backfill as backfill_vaccinations
+from app.due_treatments import backfill as backfill_due_treatments
+from app.donation_rollups import rebuild as rebuild_donation_rollups
+from app.status_history import backfill as backfill_status_history
+from app.shelters import ensure as ensure_shelters, recount as recount_shelters
+from app.donors import dedupe as dedupe_donors
+
+# Row building dominates run time at millions of rows, so the helpers
+# below use rng.random() directly instead of choice()/randint()/choices()
+
+def pick(rng, seq):
+    """Uniform choice from a sequence"""
+    return seq[int(rng.random() * len(seq))]
+
+def weighted_table(choices):
+    """Precompute (values, cumulative weights) for weighted()"""
+    values, weights = zip(*choices)
+    return values, list(itertools.accumulate(weights))
+
+def weighted(rng, table):
+    """Pick from a table built by weighted_table()"""
+    values, cumulative = table
+    return values[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+
+# Generated dates end here unless --end is given; not utcnow(), so that
+# reruns with the same seed produce identical rows
+DEFAULT_END = datetime(2025, 1, 1)
+
+# Row counts at --scale 1
+BASE_COUNTS = {
+    'users': 50,
+    'pets': 1000,
+    'donations': 5000,
+    'adoptions': 400,
+    'medical_records': 3000
+}
+
+DOG_BREEDS = ['Labrador Retriever', 'German Shepherd', 'Golden Retriever', 'Beagle',
+              'Bulldog', 'Poodle', 'Boxer', 'Dachshund', 'Husky', 'Labrador Mix',
+              'Pit Bull Mix', 'Chihuahua', 'Border Collie', 'Shih Tzu']
+CAT_BREEDS = ['Domestic Shorthair', 'Domestic Longhair', 'Siamese', 'Maine Coon',
+              'Persian Cat', 'Black Cat', 'Bengal', 'Ragdoll', 'Tabby']
+OTHER_BREEDS = ['Rabbit', 'Guinea Pig', 'Parakeet', 'Hamster']
+
+PET_NAMES = ['Buddy', 'Luna', 'Max', 'Bella', 'Charlie', 'Lucy', 'Cooper', 'Daisy',
+             'Rocky', 'Molly', 'Milo', 'Sadie', 'Bear', 'Maggie', 'Tucker', 'Chloe',
+             'Oliver', 'Lola', 'Jack', 'Zoe', 'Leo', 'Nala', 'Duke', 'Coco', 'Simba']
+
+TEMPERAMENTS = ['friendly', 'energetic', 'calm', 'shy', 'playful', 'gentle', 'loyal',
+                'curious', 'affectionate', 'independent', 'quiet', 'active']
+TRAITS = ['great with kids', 'good with other pets', 'loves long walks',
+          'house trained', 'enjoys cuddles', 'needs an experienced owner',
+          'perfect for apartment living', 'loves to play fetch', 'a bit nervous at first']
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael',
+               'Linda', 'David', 'Elizabeth', 'William', 'Susan', 'Priya', 'Wei',
+               'Fatima', 'Carlos', 'Aisha', 'Hiro', 'Sofia', 'Omar']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
+              'Davis', 'Rodriguez', 'Martinez', 'Patel', 'Chen', 'Khan', 'Kim',
+              'Nguyen', 'Lopez', 'Wilson', 'Anderson']
+EMAIL_DOMAINS = ['example.com', 'mail.com', 'inbox.org', 'petlovers.net']
+
+DONATION_PURPOSES = weighted_table([
+    ('General care', 40), ('Food and supplies', 20), ('Medical care for injured pets', 15),
+    ('Vaccination program', 10), ('Emergency medical fund', 8), ('Shelter maintenance', 5),
+    (None, 2)])
+
+TREATMENTS = weighted_table([
+    ('Annual vaccination', 30), ('Health checkup', 25), ('Initial examination', 12),
+    ('Deworming', 10), ('Spay surgery', 6), ('Neuter surgery', 6), ('Dental cleaning', 5),
+    ('Injury treatment', 4), ('Microchipping', 2)])
+VACCINE_SETS = ['Rabies, DHPP', 'Rabies, DHPP, Bordetella', 'FVRCP, Rabies', 'DHPP',
+                'Rabies', 'FVRCP', 'Leptospirosis, DHPP', 'First round of puppy vaccines']
+
+def random_datetime(rng, start, end):
+    """Uniformly random datetime between start and end"""
+    span = (end - start).total_seconds()
+    return start + timedelta(seconds=rng.random() * span)
+
+def person(rng):
+    """Random name, email and phone"""
+    first = pick(rng, FIRST_NAMES)
+    last = pick(rng, LAST_NAMES)
+    email = f'{first}.{last}{int(rng.random() * 9999) + 1}@{pick(rng, EMAIL_DOMAINS)}'.lower()
+    phone = f'+1{2000000000 + int(rng.random() * 8000000000)}' if rng.random() < 0.8 else None
+    return f'{first} {last}', email, phone
+
+def next_id(column):
+    """First free primary key value, so related rows can be built up front"""
+    return (db.session.query(db.func.max(column)).scalar() or 0) + 1
+
+def bulk_insert(table, rows, batch_size):
+    """Insert rows with executemany in batches inside one transaction"""
+    with db.engine.begin() as conn:
+        for i in range(0, len(rows), batch_size):
+            conn.execute(table.insert(), rows[i:i + batch_size])
+
+def build_users(rng, count, start_id, created_at):
+    """Mostly employees, roughly one admin per 25 users"""
+    # Hashing is deliberately slow; every generated user shares one hash
+    password_hash = generate_password_hash('password123')
+    rows = []
+    for i in range(count):
+        user_id = start_id + i
+        role = 'admin' if i % 25 == 0 else 'employee'
+        rows.append({
+            'id': user_id,
+            'username': f'{role}_{user_id}',
+            'email': f'{role}_{user_id}@petmanagement.com',
+            'password_hash': password_hash,
+            'role': role,
+            'created_at': created_at
+        })
+    return rows
+
+def build_pets(rng, count, start_id, adopted_count, start, end):
+    """Pets with a dog-heavy species mix and a right-skewed age distribution"""
+    rows = []
+    for i in range(count):
+        species = rng.random()
+        if species < 0.6:
+            breed = pick(rng, DOG_BREEDS)
+        elif species < 0.95:
+            breed = pick(rng, CAT_BREEDS)
+        else:
+            breed = pick(rng, OTHER_BREEDS)
+
+        if i < adopted_count:
+            status = 'adopted'
+        else:
+            status = 'foster' if rng.random() < 0.15 else 'available'
+
+        description = (f'{pick(rng, TEMPERAMENTS).capitalize()} and {pick(rng, TEMPERAMENTS)} '
+                       f'{breed.lower()}, {pick(rng, TRAITS)}.')
+        if rng.random() < 0.5:
+            description += f' {pick(rng, TRAITS).capitalize()}.'
+
+        rows.append({
+            'pet_id': start_id + i,
+            'pet_name': pick(rng, PET_NAMES),
+            'breed': breed,
+            'age': min(20, int(rng.expovariate(1 / 3.5))),
+            'gender': 'male' if rng.random() < 0.5 else 'female',
+            'status': status,
+            'description': description,
+            'img_url': None,
+            'shelter_no': f'SH{int(rng.triangular(1, 30, 3)):03d}',
+            'created_at': random_datetime(rng, start, end),
+            'version': 1
+        })
+    # Adopted pets are spread over the whole list rather than the oldest ids
+    statuses = [row['status'] for row in rows]
+    rng.shuffle(statuses)
+    for row, status in zip(rows, statuses):
+        row['status'] = status
+    return rows
+
+def build_donations(rng, count, start_id, employee_ids, start, end):
+    """Log-normal amounts (median around $50) with more donations in recent months"""
+    rows = []
+    for i in range(count):
+        name, email, phone = person(rng)
+        # sqrt skews dates towards the end of the window
+        fraction = rng.random() ** 0.5
+        rows.append({
+            'id': start_id + i,
+            'amount': round(min(50000.0, max(1.0, rng.lognormvariate(3.9, 1.0))), 2),
+            'purpose': weighted(rng, DONATION_PURPOSES),
+            'donor_name': name,
+            'donor_email': email,
+            'donor_phone': phone,
+            'message': 'Happy to help the animals' if rng.random() < 0.3 else None,
+            'date': start + (end - start) * fraction,
+            'user_id': pick(rng, employee_ids) if employee_ids and rng.random() < 0.6 else None,
+            'version': 1
+        })
+    return rows
+
+def build_adoptions(rng, pets, start_id, employee_ids, end):
+    """One adoption per adopted pet, days to months after intake"""
+    rows = []
+    adopted = [pet for pet in pets if pet['status'] == 'adopted']
+    for i, pet in enumerate(adopted):
+        name, email, phone = person(rng)
+        stay = timedelta(days=rng.gammavariate(2.0, 20.0))
+        rows.append({
+            'id': start_id + i,
+            'adopt_name': name,
+            'adopt_email': email,
+            'adopt_phone': phone,
+            'pet_id': pet['pet_id'],
+            'date': min(end, pet['created_at'] + stay),
+            'address': f'{int(rng.random() * 9999) + 1} {pick(rng, LAST_NAMES)} St',
+            'user_id': pick(rng, employee_ids) if employee_ids else None,
+            'version': 1
+        })
+    return rows
+
+def build_medical_records(rng, count, start_id, pets, donation_ids, end):
+    """Treatments after each pet's intake; vaccinations list their vaccines"""
+    rows = []
+    for i in range(count):
+        pet = pick(rng, pets)
+        treatment = weighted(rng, TREATMENTS)
+        treated_at = random_datetime(rng, pet['created_at'], end)
+        rows.append({
+            'id': start_id + i,
+            'pet_id': pet['pet_id'],
+            'treatment_type': treatment,
+            'treat_date': treated_at.date(),
+            'donor_id': pick(rng, donation_ids) if donation_ids and rng.random() < 0.3 else None,
+            'vaccines': pick(rng, VACCINE_SETS) if 'vaccin' in treatment.lower() else 'None',
+            'description': f'{treatment} completed.',
+            'created_at': treated_at
+        })
+    return rows
+
+def generate(counts, seed=42, batch_size=10000, years=3, end=DEFAULT_END, verbose=True):
+    """Generate and insert a dataset; must run inside an app context
+
+    Dates are spread over the `years` before `end`. Returns a dict of
+    inserted row counts per table.
+    """
+    rng = random.Random(seed)
+    start = end - timedelta(days=365 * years)
+    inserted = {}
+
+    def timed(label, table, rows):
+        started = time.perf_counter()
+        bulk_insert(table, rows, batch_size)
+        elapsed = time.perf_counter() - started
+        inserted[label] = len(rows)
+        if verbose:
+            rate = len(rows) / elapsed if elapsed else 0
+            print(f"✅ {label}: {len(rows):,} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+    users = build_users(rng, counts['users'], next_id(User.id), start)
+    timed('users', User.__table__, users)
+    employee_ids = [u['id'] for u in users if u['role'] == 'employee']
+
+    adopted_count = min(counts['adoptions'], counts['pets'])
+    pets = build_pets(rng, counts['pets'], next_id(Pet.pet_id), adopted_count, start, end)
+    # Pets point to their shelter, so the shelters go in first
+    with db.engine.begin() as conn:
+        ensure_shelters(conn, {pet['shelter_no'] for pet in pets})
+    timed('pets', Pet.__table__, pets)
+
+    donations = build_donations(rng, counts['donations'], next_id(Donation.id),
+                                employee_ids, start, end)
+    timed('donations', Donation.__table__, donations)
+    donation_ids = [d['id'] for d in donations]
+    del donations
+
+    adoptions = build_adoptions(rng, pets, next_id(Adoption.id), employee_ids, end)
+    timed('adoptions', Adoption.__table__, adoptions)
+    del adoptions
+
+    if pets:
+        records = build_medical_records(rng, counts['medical_records'], next_id(MedicalRecord.id),
+                                        pets, donation_ids, end)
+        timed('medical_records', MedicalRecord.__table__, records)
+
+        # Bulk inserts bypass the session events that keep these up to date
+        started = time.perf_counter()
+        backfill_medical_summary(batch_size)
+        if verbose:
+            print(f"✅ pet medical summary backfilled in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        inserted['vaccinations'] = backfill_vaccinations(batch_size)
+        if verbose:
+            print(f"✅ vaccinations: {inserted['vaccinations']:,} rows in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        inserted['due_treatments'] = backfill_due_treatments(batch_size)
+        if verbose:
+            print(f"✅ due_treatments: {inserted['due_treatments']:,} rows in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        seeded = backfill_status_history(batch_size)
+        if verbose:
+            print(f"✅ pet status history: {seeded:,} pets seeded in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        counted = recount_shelters()
+        if verbose:
+            print(f"✅ shelter occupancy: {counted:,} shelters counted in {time.perf_counter() - started:.2f}s")
+
+    # Donations don't depend on pets, so these run even with --pets 0
+    started = time.perf_counter()
+    inserted['donation_daily_totals'] = rebuild_donation_rollups(batch_size=batch_size)
+    if verbose:
+        print(f"✅ donation rollups: {inserted['donation_daily_totals']:,} daily buckets "
+              f"in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    linked = dedupe_donors(batch_size)
+    if verbose:
+        print(f"✅ donors: {linked:,} donations linked in {time.perf_counter() - started:.2f}s")
+
+    return inserted
+
+def main():
+    """Parse arguments and generate the dataset"""
+    parser = argparse.ArgumentParser(description='Generate synthetic data for load testing')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplier applied to the default row counts')
+    for table, count in BASE_COUNTS.items():
+        parser.add_argument(f'--{table.replace("_", "-")}', type=int, dest=table,
+                            help=f'number of {table.replace("_", " ")} (default {count} x scale)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed (default 42)')
+    parser.add_argument('--batch-size', type=int, default=10000,
+                        help='rows per INSERT batch (default 10000)')
+    parser.add_argument('--years', type=int, default=3,
+                        help='how many years of history to spread dates over (default 3)')
+    parser.add_argument('--end', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        default=DEFAULT_END,
+                        help=f'date the generated history ends on, YYYY-MM-DD '
+                             f'(default {DEFAULT_END:%Y-%m-%d})')
+    parser.add_argument('--reset', action='store_true',
+                        help='drop and recreate all tables first')
+    args = parser.parse_args()
+
+    counts = {table: getattr(args, table) if getattr(args, table) is not None
+              else int(count * args.scale)
+              for table, count in BASE_COUNTS.items()}
+
+    print("🐕 Pet Management System - Synthetic Data Generator")
+    print("=" * 50)
+
+    app = create_app()
+    with app.app_context():
+        if args.reset:
+            print("Recreating database tables...")
+            db.drop_all()
+            db.create_all()
+
+        started = time.perf_counter()
+        inserted = generate(counts, seed=args.seed, batch_size=args.batch_size, years=args.years,
+                            end=args.end)
+        total = sum(inserted.values())
+        print(f"\n🎉 Inserted {total:,} rows in {time.perf_counter() - started:.2f}s")
+        print("All generated users have the password: password123")
+
+if __name__ == '__main__':
+    main()
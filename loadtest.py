@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Pet Management System - Postman Collection Load Driver
+Replays the requests in the Postman collection against a running server
+so capacity tests use the same call mix as the API documentation
+
+Each virtual user runs in its own thread with its own cookie jar, logs
+in once (as an admin or an employee, depending on which folders it
+draws from) and then sends requests picked at random according to the
+configured mix. Redirects are not followed, so every sample is a single
+request. Throughput and latency are reported per request name.
+
+Usage:
+    python run.py &
+    python loadtest.py --concurrency 20 --duration 60
+    python loadtest.py --mix "Admin - Pets=3" --exclude "Delete Pet" --output load.json
+"""
+
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+
+from benchmark import percentile
+
+DEFAULT_COLLECTION = 'postman/Pet_Management_System.postman_collection.json'
+
+VARIABLE_PATTERN = re.compile(r'\{\{\s*([^}]+?)\s*\}\}')
+
+# Postman dynamic variables used to keep repeated requests unique
+DYNAMIC_VARIABLES = {
+    '$guid': lambda rng: str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+    '$timestamp': lambda rng: str(int(time.time())),
+    '$randomInt': lambda rng: str(rng.randint(0, 1000))
+}
+
+def resolve(text, variables, rng):
+    """Substitute {{variables}} and Postman {{$dynamic}} variables"""
+    def substitute(match):
+        key = match.group(1)
+        if key in DYNAMIC_VARIABLES:
+            return DYNAMIC_VARIABLES[key](rng)
+        return str(variables.get(key, match.group(0)))
+    return VARIABLE_PATTERN.sub(substitute, text)
+
+def _request_role(url):
+    """Which kind of logged-in user a request needs, from its path"""
+    path = urllib.parse.urlsplit(VARIABLE_PATTERN.sub('', url)).path
+    if path.startswith('/admin'):
+        return 'admin'
+    if path.startswith('/employee'):
+        return 'employee'
+    return None
+
+def _body(request):
+    """Body of a Postman request as (fields or raw text, content type)"""
+    body = request.get('body') or {}
+    mode = body.get('mode')
+    if mode in ('urlencoded', 'formdata'):
+        fields = [(f['key'], f.get('value', '')) for f in body.get(mode, [])
+                  if not f.get('disabled') and f.get('type', 'text') == 'text']
+        return fields, 'application/x-www-form-urlencoded'
+    if mode == 'raw':
+        return body.get('raw', ''), None
+    return None, None
+
+def load_collection(path):
+    """Flatten a Postman v2.1 collection into request specs
+
+    Returns (requests, variables), where each request is a dict with
+    name, folder, method, url, headers, body, content_type and role.
+    """
+    with open(path) as f:
+        collection = json.load(f)
+
+    variables = {v['key']: v.get('value', '') for v in collection.get('variable', [])}
+    requests = []
+
+    def walk(items, folder):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'], item['name'])
+                continue
+            request = item['request']
+            url = request['url']['raw'] if isinstance(request['url'], dict) else request['url']
+            body, content_type = _body(request)
+            headers = {h['key']: h['value'] for h in request.get('header', [])
+                       if not h.get('disabled')}
+            requests.append({
+                'name': f"{folder} / {item['name']}" if folder else item['name'],
+                'folder': folder,
+                'method': request.get('method', 'GET').upper(),
+                'url': url,
+                'headers': headers,
+                'body': body,
+                'content_type': content_type,
+                'role': _request_role(url)
+            })
+
+    walk(collection.get('item', []), None)
+    return requests, variables
+
+def apply_mix(requests, mix=None, exclude=None):
+    """Attach a weight to every request
+
+    mix maps a folder, a request name or a full "Folder / Request" name
+    to a weight; the most specific match wins and everything else
+    weighs 1. Excluded requests get weight 0.
+    """
+    mix = mix or {}
+    exclude = set(exclude or [])
+    weighted = []
+    for request in requests:
+        short_name = request['name'].split(' / ')[-1]
+        keys = (request['name'], short_name, request['folder'])
+        if any(key in exclude for key in keys):
+            continue
+        weight = next((mix[key] for key in keys if key in mix), 1.0)
+        if weight > 0:
+            weighted.append(dict(request, weight=weight))
+    return weighted
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as responses instead of following them"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+class VirtualUser:
+    """One simulated client with its own session cookie"""
+
+    def __init__(self, base_url, variables, role, credentials, rng, timeout):
+        self.base_url = base_url
+        self.variables = dict(variables, base_url=base_url)
+        self.role = role
+        self.credentials = credentials
+        self.rng = rng
+        self.timeout = timeout
+        self.logged_in = False
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def _open(self, method, url, data=None, headers=None):
+        """Send one request; returns the status code (None on connection errors)"""
+        request = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+        except (urllib.error.URLError, OSError):
+            return None
+
+    def login(self):
+        """Log in with this user's credentials, outside the measurements"""
+        if self.role is None:
+            return
+        username, password = self.credentials[self.role]
+        data = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+        status = self._open('POST', f'{self.base_url}/login', data,
+                            {'Content-Type': 'application/x-www-form-urlencoded'})
+        self.logged_in = status in (200, 302)
+
+    def send(self, spec):
+        """Replay one collection request; returns (status, seconds)"""
+        if not self.logged_in:
+            self.login()
+
+        url = resolve(spec['url'], self.variables, self.rng)
+        headers = {k: resolve(v, self.variables, self.rng) for k, v in spec['headers'].items()}
+        data = None
+        body = spec['body']
+        if isinstance(body, list):
+            fields = [(k, resolve(v, self.variables, self.rng)) for k, v in body]
+            if urllib.parse.urlsplit(url).path == '/login' and self.role:
+                # Log in as this virtual user, not the account in the collection
+                username, password = self.credentials[self.role]
+                fields = [(k, username if k == 'username' else password if k == 'password' else v)
+                          for k, v in fields]
+            data = urllib.parse.urlencode(fields).encode()
+            headers.setdefault('Content-Type', spec['content_type'])
+        elif body is not None:
+            data = resolve(body, self.variables, self.rng).encode()
+
+        started = time.perf_counter()
+        status = self._open(spec['method'], url, data, headers)
+        elapsed = time.perf_counter() - started
+
+        if urllib.parse.urlsplit(url).path == '/logout':
+            self.logged_in = False
+        return status, elapsed
+
+class LoadStats:
+    """Thread-safe samples per request name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(list)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, status, elapsed):
+        with self._lock:
+            self._samples[name].append(elapsed)
+            self._statuses[name][status] += 1
+
+    def summary(self, wall_time):
+        """Per-request throughput, latency percentiles and status counts"""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            statuses = {name: dict(counts) for name, counts in self._statuses.items()}
+
+        results = {}
+        for name, ordered in samples.items():
+            counts = statuses[name]
+            errors = sum(n for status, n in counts.items() if status is None or status >= 500)
+            results[name] = {
+                'requests': len(ordered),
+                'throughput_rps': len(ordered) / wall_time if wall_time else 0.0,
+                'errors': errors,
+                'statuses': {str(status): n for status, n in counts.items()},
+                'p50_ms': percentile(ordered, 50) * 1000,
+                'p95_ms': percentile(ordered, 95) * 1000,
+                'p99_ms': percentile(ordered, 99) * 1000,
+                'mean_ms': sum(ordered) / len(ordered) * 1000,
+                'max_ms': ordered[-1] * 1000
+            }
+        return results
+
+def assign_roles(requests, concurrency, admin_share=None):
+    """Role of each virtual user, split by the weight of admin vs employee requests"""
+    admin_weight = sum(r['weight'] for r in requests if r['role'] == 'admin')
+    employee_weight = sum(r['weight'] for r in requests if r['role'] == 'employee')
+    if not admin_weight and not employee_weight:
+        return [None] * concurrency
+    if admin_share is None:
+        admin_share = admin_weight / (admin_weight + employee_weight)
+    admins = round(concurrency * admin_share)
+    if admin_weight and employee_weight and concurrency > 1:
+        # Keep at least one user of each kind when both are in the mix
+        admins = min(max(admins, 1), concurrency - 1)
+    return ['admin'] * admins + ['employee'] * (concurrency - admins)
+
+def run_load(requests, base_url, variables, credentials, concurrency=10, duration=None,
+             total_requests=None, think_time=0.0, seed=42, timeout=30.0, admin_share=None):
+    """Replay the weighted requests with concurrent virtual users
+
+    Stops after duration seconds or total_requests requests, whichever
+    comes first. Returns (per-request results, wall time in seconds).
+    """
+    if duration is None and total_requests is None:
+        raise ValueError('Either duration or total_requests is required')
+
+    stats = LoadStats()
+    remaining = [total_requests]
+    remaining_lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def take_ticket():
+        if deadline and time.perf_counter() >= deadline:
+            return False
+        if total_requests is None:
+            return True
+        with remaining_lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(index, role):
+        rng = random.Random(seed + index)
+        choices = [r for r in requests if r['role'] in (None, role)]
+        if not choices:
+            return
+        weights = [r['weight'] for r in choices]
+        user = VirtualUser(base_url, variables, role, credentials, rng, timeout)
+        user.login()
+        while take_ticket():
+            spec = rng.choices(choices, weights=weights, k=1)[0]
+            status, elapsed = user.send(spec)
+            stats.record(spec['name'], status, elapsed)
+            if think_time:
+                time.sleep(rng.expovariate(1 / think_time))
+
+    roles = assign_roles(requests, concurrency, admin_share)
+    threads = [threading.Thread(target=worker, args=(i, role), name=f'vu-{i}', daemon=True)
+               for i, role in enumerate(roles)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+    return stats.summary(wall_time), wall_time
+
+def print_report(results, wall_time):
+    """Print per-request throughput and latency, then totals"""
+    header = (f"{'request':<44} {'count':>7} {'req/s':>8} {'p50':>8} {'p95':>8} "
+              f"{'p99':>8} {'errors':>7}  statuses")
+    print(header)
+    print('-' * len(header))
+    for name in sorted(results):
+        r = results[name]
+        statuses = ' '.join(f'{s}:{n}' for s, n in sorted(r['statuses'].items()))
+        print(f"{name:<44} {r['requests']:>7} {r['throughput_rps']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}  {statuses}")
+    total = sum(r['requests'] for r in results.values())
+    errors = sum(r['errors'] for r in results.values())
+    print(f"\nTotal: {total} requests in {wall_time:.1f}s "
+          f"({total / wall_time if wall_time else 0:.1f} req/s), {errors} errors")
+
+def _weights(values):
+    """Parse repeated NAME=WEIGHT options"""
+    mix = {}
+    for value in values or []:
+        name, _, weight = value.rpartition('=')
+        if not name:
+            raise argparse.ArgumentTypeError(f'Expected NAME=WEIGHT, got {value!r}')
+        mix[name] = float(weight)
+    return mix
+
+def main():
+    """Parse arguments, replay the collection and print the results"""
+    parser = argparse.ArgumentParser(description='Replay the Postman collection as a load test')
+    parser.add_argument('--collection', default=DEFAULT_COLLECTION, help='Postman collection file')
+    parser.add_argument('--base-url', help='server to test (default: the collection base_url)')
+    parser.add_argument('--concurrency', type=int, default=10, help='virtual users (default 10)')
+    parser.add_argument('--duration', type=float, help='seconds to run (default 30)')
+    parser.add_argument('--requests', type=int, help='stop after this many requests in total')
+    parser.add_argument('--mix', action='append',
+                        help='NAME=WEIGHT for a folder or request name (repeatable, default 1)')
+    parser.add_argument('--exclude', action='append',
+                        help='folder or request name to leave out (repeatable)')
+    parser.add_argument('--admin-share', type=float,
+                        help='fraction of virtual users logged in as admin '
+                             '(default: the admin share of the request mix)')
+    parser.add_argument('--admin-user', default='admin:password123',
+                        help='USERNAME:PASSWORD for admin virtual users')
+    parser.add_argument('--employee-user', default='employee1:password123',
+                        help='USERNAME:PASSWORD for employee virtual users')
+    parser.add_argument('--var', action='append', help='override a collection variable, KEY=VALUE')
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help='mean pause between a user\'s requests, in seconds')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the request mix')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    if args.duration is None and args.requests is None:
+        args.duration = 30.0
+
+    requests, variables = load_collection(args.collection)
+    for override in args.var or []:
+        key, _, value = override.partition('=')
+        variables[key] = value
+    base_url = (args.base_url or variables.get('base_url', 'http://localhost:5000')).rstrip('/')
+
+    requests = apply_mix(requests, _weights(args.mix), args.exclude)
+    if not requests:
+        print("❌ No requests left after applying --mix and --exclude")
+        sys.exit(1)
+
+    credentials = {'admin': tuple(args.admin_user.split(':', 1)),
+                   'employee': tuple(args.employee_user.split(':', 1))}
+
+    print("🚀 Pet Management System - Load Test")
+    print("=" * 50)
+    print(f"Target: {base_url}")
+    print(f"Virtual users: {args.concurrency}, "
+          f"{'duration: %ss' % args.duration if args.duration else ''}"
+          f"{' max requests: %d' % args.requests if args.requests else ''}")
+    print(f"Request mix: {len(requests)} requests from {args.collection}\n")
+
+    results, wall_time = run_load(requests, base_url, variables, credentials,
+                                  concurrency=args.concurrency, duration=args.duration,
+                                  total_requests=args.requests, think_time=args.think_time,
+                                  seed=args.seed, timeout=args.timeout,
+                                  admin_share=args.admin_share)
+    print_report(results, wall_time)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'base_url': base_url,
+                    'collection': args.collection,
+                    'concurrency': args.concurrency,
+                    'duration': args.duration,
+                    'requests': args.requests,
+                    'wall_time': wall_time,
+                    'mix': {r['name']: r['weight'] for r in requests}
+                },
+                'requests': results
+            }, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
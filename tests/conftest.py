@@ -0,0 +1,72 @@
+"""
+Shared fixtures
+"""
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from app import create_app, db
+from app.models import User
+from tests.query_budget import QueryCounter
+
+class BufferedClient(FlaskClient):
+    """Test client that consumes response bodies the way a WSGI server does
+
+    Streamed list pages keep their request context (and a database
+    cursor) open until the body has been read and closed; buffering by
+    default runs that work, and the request teardown, inside the request.
+    Pass buffered=False to inspect a stream chunk by chunk.
+    """
+
+    def open(self, *args, buffered=True, **kwargs):
+        return super().open(*args, buffered=buffered, **kwargs)
+
+@pytest.fixture(autouse=True)
+def buffered_test_client(monkeypatch):
+    """Make app.test_client() return a BufferedClient"""
+    monkeypatch.setattr(Flask, 'test_client_class', BufferedClient)
+
+@pytest.fixture
+def query_counter():
+    """Count SQL statements issued during the test, per request and in total"""
+    with QueryCounter() as counter:
+        yield counter
+
+@pytest.fixture
+def app():
+    """Create test application"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Create test client"""
+    return app.test_client()
+
+@pytest.fixture
+def admin_user(app):
+    """Create admin user"""
+    user = User(username='admin', email='admin@test.com', role='admin')
+    user.set_password('password123')
+
+    with app.app_context():
+        db.session.add(user)
+        db.session.commit()
+        yield user
+
+@pytest.fixture
+def employee_user(app):
+    """Create employee user"""
+    user = User(username='employee', email='employee@test.com', role='employee')
+    user.set_password('password123')
+
+    with app.app_context():
+        db.session.add(user)
+        db.session.commit()
+        yield user
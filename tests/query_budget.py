@@ -0,0 +1,73 @@
+"""
+SQL statement counting for tests
+
+QueryCounter counts statements while active, both in total and per
+request (requests are delimited with Flask's request_started and
+request_tearing_down signals, so statements issued while a streamed
+body is consumed count towards its request). The query_budget decorator fails a test if
+any request it makes issues more statements than allowed.
+"""
+
+import functools
+import threading
+
+from flask import request_started, request_tearing_down
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class QueryCounter:
+    """Counts SQL statements issued by the current thread"""
+
+    def __init__(self):
+        self.total = 0
+        self.statements = []
+        self.per_request = []
+        self._current = None
+        self._thread_id = threading.get_ident()
+
+    def __enter__(self):
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        request_started.connect(self._request_started)
+        request_tearing_down.connect(self._request_finished)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        request_started.disconnect(self._request_started)
+        request_tearing_down.disconnect(self._request_finished)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Background writers (audit log, jobs) run in their own threads
+        if threading.get_ident() != self._thread_id:
+            return
+        self.total += 1
+        self.statements.append(statement)
+        if self._current is not None:
+            self._current += 1
+
+    def _request_started(self, sender, **extra):
+        self._current = 0
+
+    def _request_finished(self, sender, **extra):
+        self.per_request.append(self._current)
+        self._current = None
+
+    def count(self, func, *args, **kwargs):
+        """Call func and return the number of statements it issued"""
+        before = self.total
+        func(*args, **kwargs)
+        return self.total - before
+
+def query_budget(max_queries):
+    """Fail the decorated test if any request issues more than max_queries statements"""
+    def decorator(test):
+        @functools.wraps(test)
+        def wrapper(*args, **kwargs):
+            with QueryCounter() as counter:
+                result = test(*args, **kwargs)
+            over = [n for n in counter.per_request if n > max_queries]
+            assert not over, (f'{len(over)} request(s) exceeded the budget of '
+                              f'{max_queries} queries: {over}')
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,129 @@
+"""
+Test cases for the in-memory trends analytics
+"""
+
+from datetime import datetime, date, timedelta
+
+import pytest
+from app import db
+from app import analytics as analytics_module
+from app.models import Pet, Donation, Adoption
+from app.analytics import analytics
+
+TODAY = date(2024, 6, 30)
+
+@pytest.fixture
+def history(app):
+    """Donations over the last days and three pets, two of them adopted"""
+    for days_ago, amount in [(0, 10), (0, 30), (1, 20), (6, 40), (29, 100), (200, 1000)]:
+        db.session.add(Donation(amount=amount, donor_name='Jane', donor_email='jane@example.com',
+                                date=datetime.combine(TODAY - timedelta(days=days_ago), datetime.min.time())))
+    pets = [Pet(pet_name='Rex', breed='Beagle', age=0, gender='male', created_at=datetime(2024, 1, 1)),
+            Pet(pet_name='Mia', breed='Beagle', age=4, gender='female', created_at=datetime(2024, 1, 1)),
+            Pet(pet_name='Max', breed='Tabby', age=12, gender='male', created_at=datetime(2024, 3, 1))]
+    db.session.add_all(pets)
+    db.session.flush()
+    db.session.add_all([
+        Adoption(adopt_name='Ann', adopt_email='ann@example.com', pet_id=pets[0].pet_id, date=datetime(2024, 1, 6)),
+        Adoption(adopt_name='Bob', adopt_email='bob@example.com', pet_id=pets[2].pet_id, date=datetime(2024, 6, 28))
+    ])
+    db.session.commit()
+
+def test_donation_stats(history):
+    """Test totals, percentiles and rolling averages"""
+    donations = analytics.trends(days=7, today=TODAY)['donations']
+    assert donations['count'] == 6
+    assert donations['total'] == 1200
+    assert donations['percentiles']['p50'] == 35.0
+    assert [point['date'] for point in donations['daily']][-1] == TODAY.isoformat()
+    assert len(donations['daily']) == 7
+
+    today = donations['daily'][-1]
+    assert today['total'] == 40
+    assert today['avg_7d'] == round((40 + 20 + 40) / 7, 2)
+    assert today['avg_30d'] == round((40 + 20 + 40 + 100) / 30, 2)
+
+def test_adoption_rates_and_length_of_stay(history):
+    """Test grouping by breed and age band, and days from intake to adoption"""
+    stats = analytics.trends(today=TODAY)
+    assert stats['adoption_rates']['by_breed'] == [
+        {'breed': 'Beagle', 'pets': 2, 'adopted': 1, 'rate': 0.5},
+        {'breed': 'Tabby', 'pets': 1, 'adopted': 1, 'rate': 1.0}
+    ]
+    bands = {row['age_band']: (row['pets'], row['adopted']) for row in stats['adoption_rates']['by_age_band']}
+    assert bands == {'Under 1': (1, 1), '1-2': (0, 0), '3-6': (1, 0), '7-10': (0, 0), '11+': (1, 1)}
+
+    stay = stats['length_of_stay']
+    assert stay['count'] == 2
+    assert stay['mean_days'] == (5 + 119) / 2
+    assert {row['bucket']: row['adoptions'] for row in stay['histogram']}['0-7 days'] == 1
+    assert {row['bucket']: row['adoptions'] for row in stay['histogram']}['91-180 days'] == 1
+
+def test_new_rows_are_appended_and_edits_reload(history):
+    """Test that refreshes fetch only new rows until a loaded row changes"""
+    analytics.trends(today=TODAY)
+    assert len(analytics.donations) == 6
+    loaded = analytics.donations.columns['id']
+
+    db.session.add(Donation(amount=5, donor_name='Jo', donor_email='jo@example.com',
+                            date=datetime.combine(TODAY, datetime.min.time())))
+    db.session.commit()
+    assert analytics.trends(today=TODAY)['donations']['total'] == 1205
+    assert analytics.donations.columns['id'] is loaded
+
+    donation = Donation.query.filter_by(amount=1000).one()
+    donation.amount = 500
+    db.session.commit()
+    assert analytics.donations.stale
+    assert analytics.trends(today=TODAY)['donations']['total'] == 705
+    assert analytics.donations.columns['id'] is not loaded
+
+    Adoption.query.delete()
+    db.session.commit()
+    assert analytics.trends(today=TODAY)['length_of_stay']['count'] == 0
+
+def test_reload_after_max_age(app, history):
+    """Test that Core writes, which no session event sees, show up once the columns are too old"""
+    analytics.trends(today=TODAY)
+    table = Donation.__table__
+    db.session.connection().execute(table.update().where(table.c.amount == 1000).values(amount=500))
+    db.session.commit()
+    assert analytics.trends(today=TODAY)['donations']['total'] == 1200
+
+    analytics.max_age = 0
+    try:
+        assert analytics.trends(today=TODAY)['donations']['total'] == 700
+    finally:
+        analytics.max_age = app.config['ANALYTICS_MAX_AGE']
+
+def test_invalidated_during_reload_stays_stale(history, monkeypatch):
+    """Test that an edit committed while a reload is querying makes that reload stale"""
+    execute = db.session.execute
+
+    def execute_and_invalidate(statement, *args, **kwargs):
+        analytics.invalidate('donations')
+        return execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(db.session, 'execute', execute_and_invalidate)
+    analytics.refresh()
+    assert analytics.donations.stale and len(analytics.donations) == 6
+
+def test_numpy_matches_python(history, monkeypatch):
+    """Test the vectorized statistics give the plain Python results"""
+    pytest.importorskip('numpy')
+    vectorized = analytics.trends(days=30, today=TODAY)
+    monkeypatch.setattr(analytics_module, 'np', None)
+    assert analytics.trends(days=30, today=TODAY) == vectorized
+
+def test_trends_page(client, admin_user, history):
+    """Test the HTML and JSON trends page"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get('/admin/trends', headers={'Accept': 'application/json'})
+    assert response.status_code == 200
+    assert response.get_json()['donations']['count'] == 6
+
+    body = client.get('/admin/trends?days=30').get_data(as_text=True)
+    assert 'Adoption Rate by Breed' in body and 'Beagle' in body
+
+    assert client.get('/admin/trends?days=0', headers={'Accept': 'application/json'}).status_code == 400
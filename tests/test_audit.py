@@ -0,0 +1,65 @@
+"""
+Test cases for the audit log
+"""
+
+import json
+from app import db
+from app.models import User, Pet, AuditLog
+
+def test_create_update_delete_are_logged(app):
+    """Test that ORM writes produce audit entries"""
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male')
+    db.session.add(pet)
+    db.session.commit()
+    pet_id = pet.pet_id
+
+    pet.age = 3
+    db.session.commit()
+
+    db.session.delete(pet)
+    db.session.commit()
+
+    entries = AuditLog.query.filter_by(entity='pets', entity_id=str(pet_id)) \
+                            .order_by(AuditLog.id).all()
+    assert [e.action for e in entries] == ['create', 'update', 'delete']
+    assert json.loads(entries[1].changes)['age'] == [2, 3]
+
+def test_rollback_is_not_logged(app):
+    """Test that rolled back writes leave no audit entry"""
+    db.session.add(Pet(pet_name='Ghost', breed='Unknown', age=1, gender='female'))
+    db.session.flush()
+    db.session.rollback()
+
+    assert AuditLog.query.filter_by(entity='pets').count() == 0
+
+def test_password_hash_is_redacted(app):
+    """Test that password hashes never reach the audit log"""
+    user = User(username='someone', email='someone@test.com', role='employee')
+    user.set_password('secret123')
+    db.session.add(user)
+    db.session.commit()
+
+    entry = AuditLog.query.filter_by(entity='users').first()
+    assert 'password_hash' not in json.loads(entry.changes)
+
+def test_admin_delete_pet_records_user(client, admin_user):
+    """Test that route writes are attributed to the logged-in user"""
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male')
+    db.session.add(pet)
+    db.session.commit()
+    pet_id = pet.pet_id
+
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    client.post(f'/admin/pets/{pet_id}/delete')
+
+    entries = AuditLog.query.filter(AuditLog.user_id == admin_user.id).all()
+    actions = {(e.entity, e.action) for e in entries}
+    assert ('pets', 'delete') in actions
+    assert ('medical_records', 'bulk_delete') in actions
+
+    response = client.get('/admin/audit?entity=pets', headers={'Accept': 'application/json'})
+    assert response.status_code == 200
+    assert 'delete' in {entry['action'] for entry in response.get_json()['entries']}
+    assert client.get('/admin/audit?entity=pets&format=json').get_json()['entries']
+    assert client.get('/admin/audit?from=2024-13-01', headers={'Accept': 'application/json'}).status_code == 400
+    assert client.get('/admin/audit').mimetype == 'text/html'
@@ -3,26 +3,9 @@ Test cases for authentication functionality
 """
 
 import pytest
-from app import create_app, db
+from app import db
 from app.models import User
 
-@pytest.fixture
-def app():
-    """Create test application"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-
-@pytest.fixture
-def client(app):
-    """Create test client"""
-    return app.test_client()
-
 @pytest.fixture
 def sample_user(app):
     """Create sample user for testing"""
@@ -0,0 +1,64 @@
+"""
+Test cases for the route latency benchmark
+"""
+
+import pytest
+from app import create_app, db
+import benchmark
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Create an application on its own database file"""
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "bench.db"}')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+def test_percentile_interpolates():
+    """Test percentiles on a small sorted sample"""
+    values = [1, 2, 3, 4, 5]
+    assert benchmark.percentile(values, 50) == 3
+    assert benchmark.percentile(values, 0) == 1
+    assert benchmark.percentile(values, 100) == 5
+    assert benchmark.percentile(values, 95) == pytest.approx(4.8)
+    assert benchmark.percentile([], 50) is None
+
+def test_every_route_is_benchmarked(app):
+    """Test that ROUTES covers every auth, admin and employee endpoint"""
+    assert benchmark.uncovered_endpoints(app) == []
+
+def test_run_benchmark_reports_latency_and_queries(app):
+    """Test a short run against a few routes"""
+    results = benchmark.run_benchmark(app, iterations=3, warmup=1, alloc_iterations=1,
+                                      only=['admin.pet_detail', 'employee.donate POST'])
+
+    assert set(results) == {'admin.pet_detail', 'employee.donate POST'}
+    detail = results['admin.pet_detail']
+    assert detail['statuses'] == [200]
+    assert detail['iterations'] == 3
+    assert detail['p50_ms'] <= detail['p95_ms'] <= detail['p99_ms'] <= detail['max_ms']
+    assert detail['queries_per_request'] >= 1
+    assert detail['alloc_peak_kb'] > 0
+
+def test_compare_flags_regressions():
+    """Test baseline comparison on latency and query count"""
+    baseline = {'routes': {
+        'fast': {'p95_ms': 10.0, 'queries_per_request': 2},
+        'jitter': {'p95_ms': 0.5, 'queries_per_request': 1},
+        'n_plus_one': {'p95_ms': 10.0, 'queries_per_request': 2}
+    }}
+    results = {
+        'fast': {'p95_ms': 15.0, 'queries_per_request': 2},
+        'jitter': {'p95_ms': 0.9, 'queries_per_request': 1},
+        'n_plus_one': {'p95_ms': 10.0, 'queries_per_request': 12},
+        'new_route': {'p95_ms': 100.0, 'queries_per_request': 50}
+    }
+
+    regressions = benchmark.compare(results, baseline, tolerance=0.2)
+    assert [(name, metric) for name, metric, _, _ in regressions] == [
+        ('fast', 'p95_ms'), ('n_plus_one', 'queries_per_request')]
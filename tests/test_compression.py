@@ -0,0 +1,105 @@
+"""
+Test cases for response compression
+"""
+
+import gzip
+import zlib
+
+import pytest
+from flask import Response, jsonify
+from app import create_app, db
+from app.models import Pet
+
+@pytest.fixture
+def app(app):
+    """Test application with routes returning fixed payloads"""
+
+    @app.route('/_test/json/<int:size>')
+    def json_payload(size):
+        return jsonify({'data': 'x' * size})
+
+    @app.route('/_test/image')
+    def image_payload():
+        return Response(b'\x89PNG' + b'\0' * 4096, mimetype='image/png')
+
+    @app.route('/_test/encoded')
+    def encoded_payload():
+        response = Response(gzip.compress(b'a' * 4096), mimetype='text/plain')
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    return app
+
+def test_gzip_json(client):
+    """Test that a large JSON payload is gzipped"""
+    response = client.get('/_test/json/5000', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert gzip.decompress(response.data).startswith(b'{"data":"xxx')
+
+def test_deflate_when_preferred(client):
+    """Test that the client's q-values pick the encoding"""
+    response = client.get('/_test/json/5000', headers={'Accept-Encoding': 'gzip;q=0.5, deflate'})
+
+    assert response.headers['Content-Encoding'] == 'deflate'
+    assert b'xxx' in zlib.decompress(response.data)
+
+def test_no_accept_encoding(client):
+    """Test that clients that don't ask get the plain body"""
+    response = client.get('/_test/json/5000')
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['data'] == 'x' * 5000
+
+def test_small_body_not_compressed(client):
+    """Test that bodies under the minimum size are sent as they are"""
+    response = client.get('/_test/json/10', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+
+def test_image_not_compressed(client):
+    """Test that content types outside the allowlist are skipped"""
+    response = client.get('/_test/image', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.data.startswith(b'\x89PNG')
+
+def test_already_encoded_not_compressed(client):
+    """Test that a body with a Content-Encoding is not compressed twice"""
+    response = client.get('/_test/encoded', headers={'Accept-Encoding': 'gzip'})
+
+    assert gzip.decompress(response.data) == b'a' * 4096
+
+def test_streamed_page_compressed(app, client, admin_user):
+    """Test that a streamed list page is compressed chunk by chunk"""
+    app.config['STREAM_YIELD_PER'] = 10
+    app.config['STREAM_BUFFER_SIZE'] = 1024
+    for i in range(50):
+        db.session.add(Pet(pet_name=f'Pet {i}', breed='Beagle', age=2, gender='male'))
+    db.session.commit()
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get('/admin/pets', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    chunks = list(response.response)
+    response.close()
+
+    assert len(chunks) > 1
+    # Every chunk is flushed, so the first one already decodes to the page header
+    head = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0])
+    assert b'<html' in head.lower()
+    body = gzip.decompress(b''.join(chunks)).decode()
+    assert 'Pet 49' in body
+
+def test_compression_disabled(monkeypatch):
+    """Test that COMPRESSION_ENABLED=False leaves responses alone"""
+    monkeypatch.setenv('COMPRESSION_ENABLED', 'False')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    response = app.test_client().get('/login', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
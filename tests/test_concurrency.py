@@ -0,0 +1,136 @@
+"""
+Test cases for optimistic concurrency on edits
+"""
+
+import io
+import json
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Pet, Donation, Job
+
+@pytest.fixture
+def sample_pet(app):
+    """Create sample pet"""
+    pet = Pet(
+        pet_name='Test Pet',
+        breed='Test Breed',
+        age=3,
+        gender='male',
+        status='available'
+    )
+
+    with app.app_context():
+        db.session.add(pet)
+        db.session.commit()
+        yield pet
+
+def pet_payload(version, **overrides):
+    """Build a JSON body for the edit pet endpoint"""
+    payload = {
+        'pet_name': 'Renamed Pet',
+        'breed': 'Test Breed',
+        'age': 4,
+        'gender': 'male',
+        'status': 'available',
+        'version': version
+    }
+    payload.update(overrides)
+    return payload
+
+def test_version_increments_on_update(app, sample_pet):
+    """Test that every update bumps the version column"""
+    pet = db.session.get(Pet, sample_pet.pet_id)
+    assert pet.version == 1
+    pet.age = 5
+    db.session.commit()
+    assert pet.version == 2
+
+def test_edit_pet_with_current_version(client, admin_user, sample_pet):
+    """Test that an edit carrying the current version succeeds"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.post(f'/admin/pets/{sample_pet.pet_id}/edit',
+                           json=pet_payload(sample_pet.version))
+    assert response.status_code == 200
+    assert response.get_json()['success']
+
+def test_edit_pet_with_stale_version(client, admin_user, sample_pet):
+    """Test that an edit carrying an old version is rejected with 409"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    pet_id = sample_pet.pet_id
+
+    first = client.post(f'/admin/pets/{pet_id}/edit', json=pet_payload(1))
+    assert first.status_code == 200
+
+    # Second writer still holds version 1
+    second = client.post(f'/admin/pets/{pet_id}/edit',
+                         json=pet_payload(1, pet_name='Lost Update'))
+    assert second.status_code == 409
+    body = second.get_json()
+    assert body['current']['pet_name'] == 'Renamed Pet'
+    assert body['current']['version'] == 2
+    assert db.session.get(Pet, pet_id).pet_name == 'Renamed Pet'
+
+def test_edit_pet_form_stale_version(client, admin_user, sample_pet):
+    """Test that a stale HTML form submission re-renders with 409"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    pet_id = sample_pet.pet_id
+    client.post(f'/admin/pets/{pet_id}/edit', json=pet_payload(1))
+
+    response = client.post(f'/admin/pets/{pet_id}/edit', data=pet_payload(1))
+    assert response.status_code == 409
+    assert b'changed by someone else' in response.data
+
+def test_concurrent_edit_removes_new_image(client, admin_user, sample_pet, monkeypatch):
+    """Test that an image uploaded by an edit that loses the race is queued for deletion"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    pet_id = sample_pet.pet_id
+    monkeypatch.setattr('app.routes_admin.save_uploaded_file', lambda file: '/static/uploads/new_1234.png')
+
+    raced = []
+
+    def concurrent_write(session, flush_context, instances):
+        # Another request commits its edit between our read and our write
+        if not raced and any(isinstance(obj, Pet) for obj in session.dirty):
+            raced.append(True)
+            session.connection().execute(Pet.__table__.update().values(version=Pet.__table__.c.version + 1))
+
+    event.listen(Session, 'before_flush', concurrent_write)
+    try:
+        data = dict(pet_payload(''), pet_image=(io.BytesIO(b'png'), 'new.png'))
+        response = client.post(f'/admin/pets/{pet_id}/edit', data=data, content_type='multipart/form-data')
+    finally:
+        event.remove(Session, 'before_flush', concurrent_write)
+    assert response.status_code == 409
+    jobs = [json.loads(job.payload) for job in Job.query.filter_by(name='delete_uploaded_file')]
+    assert jobs == [{'filename': '/static/uploads/new_1234.png'}]
+    assert db.session.get(Pet, pet_id).img_url is None
+
+def test_edit_donation_with_stale_version(client, employee_user):
+    """Test that employees get 409 when editing a stale donation"""
+    donation = Donation(
+        amount=100.00,
+        donor_name='Test Donor',
+        donor_email='donor@test.com',
+        user_id=employee_user.id
+    )
+    db.session.add(donation)
+    db.session.commit()
+    donation_id = donation.id
+
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    payload = {
+        'amount': '75.00',
+        'donor_name': 'Test Donor',
+        'donor_email': 'donor@test.com',
+        'version': 1
+    }
+
+    first = client.post(f'/employee/my-donations/{donation_id}/edit', json=payload)
+    assert first.status_code == 200
+
+    second = client.post(f'/employee/my-donations/{donation_id}/edit', json=payload)
+    assert second.status_code == 409
+    assert second.get_json()['current']['version'] == 2
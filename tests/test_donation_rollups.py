@@ -0,0 +1,114 @@
+"""
+Test cases for the donation rollup tables
+"""
+
+from datetime import datetime, date
+
+from app import db
+from app.models import Donation, DonationDailyTotal, DonationMonthlyTotal
+from app.donation_rollups import rebuild
+
+def add_donation(amount, donated_at, purpose=None, user=None):
+    donation = Donation(amount=amount, purpose=purpose, donor_name='Jane', donor_email='jane@example.com',
+                        date=donated_at, user_id=user.id if user else None)
+    db.session.add(donation)
+    db.session.commit()
+    return donation
+
+def rollup(model):
+    return sorted((row.bucket, row.purpose, row.user_id, row.donation_count, float(row.total_amount))
+                  for row in model.query if row.donation_count)
+
+def test_rollups_follow_inserts_and_edits(app, employee_user):
+    """Test that creating and editing donations moves their totals between buckets"""
+    first = add_donation(50, datetime(2024, 1, 10, 9), 'Food', employee_user)
+    add_donation(25.5, datetime(2024, 1, 10, 17), 'Food', employee_user)
+    add_donation(10, datetime(2024, 1, 20))
+
+    assert rollup(DonationDailyTotal) == [
+        (date(2024, 1, 10), 'Food', employee_user.id, 2, 75.5),
+        (date(2024, 1, 20), '', 0, 1, 10.0)
+    ]
+    assert rollup(DonationMonthlyTotal) == [
+        (date(2024, 1, 1), '', 0, 1, 10.0),
+        (date(2024, 1, 1), 'Food', employee_user.id, 2, 75.5)
+    ]
+
+    first.amount = 60
+    first.purpose = 'Medical'
+    db.session.commit()
+    db.session.expire_all()
+    first.date = datetime(2024, 2, 1)
+    db.session.commit()
+    assert rollup(DonationMonthlyTotal) == [
+        (date(2024, 1, 1), '', 0, 1, 10.0),
+        (date(2024, 1, 1), 'Food', employee_user.id, 1, 25.5),
+        (date(2024, 2, 1), 'Medical', employee_user.id, 1, 60.0)
+    ]
+
+    db.session.delete(first)
+    db.session.commit()
+    assert (date(2024, 2, 1), 'Medical', employee_user.id, 1, 60.0) not in rollup(DonationMonthlyTotal)
+
+def test_rebuild_matches_incremental(app, employee_user):
+    """Test that rebuilding from donations gives the incrementally maintained totals"""
+    add_donation(50, datetime(2023, 12, 31), 'Food', employee_user)
+    add_donation(20, datetime(2024, 1, 2), 'Food', employee_user)
+    add_donation(30, datetime(2024, 1, 3), '')
+    add_donation(40, datetime(2024, 1, 3))
+    daily, monthly = rollup(DonationDailyTotal), rollup(DonationMonthlyTotal)
+
+    # A late correction made behind the ORM
+    db.session.execute(db.update(Donation).where(Donation.amount == 20).values(amount=25))
+    db.session.commit()
+
+    assert rebuild(since=date(2024, 1, 15)) == 2
+    assert (date(2024, 1, 2), 'Food', employee_user.id, 1, 25.0) in rollup(DonationDailyTotal)
+    assert rollup(DonationMonthlyTotal)[0] == monthly[0]
+
+    result = app.test_cli_runner().invoke(args=['rebuild-donation-rollups'])
+    assert 'Rebuilt 3 daily donation buckets' in result.output
+    assert rollup(DonationDailyTotal) == [
+        row if row[3:] != (1, 20.0) else row[:4] + (25.0,) for row in daily
+    ]
+
+def test_totals_endpoint(client, admin_user, employee_user):
+    """Test the chart endpoint reads the rollups"""
+    add_donation(50, datetime(2024, 1, 10), 'Food', employee_user)
+    add_donation(25, datetime(2024, 1, 11), 'Medical')
+    add_donation(10, datetime(2024, 2, 1), 'Food', employee_user)
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    totals = client.get('/admin/donations/totals').get_json()['totals']
+    assert totals == [
+        {'bucket': '2024-01-01', 'donation_count': 2, 'total_amount': 75.0},
+        {'bucket': '2024-02-01', 'donation_count': 1, 'total_amount': 10.0}
+    ]
+
+    totals = client.get('/admin/donations/totals?by=user&from=2024-01-15').get_json()['totals']
+    assert totals == [{'bucket': '2024-01-01', 'user_id': None, 'username': None,
+                       'donation_count': 1, 'total_amount': 25.0},
+                      {'bucket': '2024-01-01', 'user_id': employee_user.id, 'username': 'employee',
+                       'donation_count': 1, 'total_amount': 50.0},
+                      {'bucket': '2024-02-01', 'user_id': employee_user.id, 'username': 'employee',
+                       'donation_count': 1, 'total_amount': 10.0}]
+
+    totals = client.get('/admin/donations/totals?period=day&by=purpose&to=2024-01-31').get_json()['totals']
+    assert [(row['bucket'], row['purpose']) for row in totals] == [('2024-01-10', 'Food'), ('2024-01-11', 'Medical')]
+
+    assert client.get('/admin/donations/totals?period=week').status_code == 400
+    assert client.get('/admin/donations/totals?from=soon').status_code == 400
+
+def test_donate_and_edit_update_rollups(client, employee_user):
+    """Test the employee donate and edit routes keep the rollups current"""
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    response = client.post('/employee/donate', json={
+        'amount': '40', 'purpose': 'Food', 'donor_name': 'Jane', 'donor_email': 'jane@example.com'
+    })
+    donation_id = response.get_json()['donation_id']
+    assert [row[3:] for row in rollup(DonationDailyTotal)] == [(1, 40.0)]
+
+    client.post(f'/employee/my-donations/{donation_id}/edit', json={
+        'amount': '45', 'purpose': 'Food', 'donor_name': 'Jane', 'donor_email': 'jane@example.com'
+    })
+    assert [row[3:] for row in rollup(DonationDailyTotal)] == [(1, 45.0)]
@@ -0,0 +1,116 @@
+"""
+Test cases for donor identity and donation linking
+"""
+
+from datetime import datetime
+from app import db
+from app.models import Donor, Donation
+from app.donors import normalize_email, normalize_phone, dedupe
+
+def add_donation(amount, email, phone=None, name='Jane', donated_at=None):
+    donation = Donation(amount=amount, donor_name=name, donor_email=email, donor_phone=phone,
+                        date=donated_at or datetime(2024, 1, 10))
+    db.session.add(donation)
+    db.session.commit()
+    return donation
+
+def test_normalize():
+    """Test that email and phone variants collapse to one key"""
+    assert normalize_email(' Jane@Example.COM ') == normalize_email('jane@example.com') == 'jane@example.com'
+    assert normalize_email('  ') is None and normalize_email(None) is None
+    assert normalize_phone('+1 (234) 567-890') == normalize_phone('1234567890') == '1234567890'
+    assert normalize_phone('12-34') is None and normalize_phone(None) is None
+
+def test_donations_link_on_write(app):
+    """Test linking by email, falling back to phone, and relinking on an email edit"""
+    first = add_donation(50, 'jane@example.com', '+1234567890')
+    second = add_donation(25, ' JANE@example.com')
+    by_phone = add_donation(10, 'jane.doe@work.com', '1234567890')
+    other = add_donation(5, 'bob@example.com', name='Bob')
+
+    assert first.donor_id == second.donor_id == by_phone.donor_id
+    assert other.donor_id != first.donor_id
+    assert Donor.query.count() == 2
+    jane = db.session.get(Donor, first.donor_id)
+    assert (jane.name, jane.email, jane.phone_key) == ('Jane', 'jane@example.com', '1234567890')
+
+    other.donor_email = 'Jane@Example.com'
+    db.session.commit()
+    assert other.donor_id == jane.id
+    assert jane.donations.count() == 4
+
+def test_donor_created_concurrently_is_shared(app, monkeypatch):
+    """Test that a donor another request inserts first is reused instead of failing on email_key"""
+    from app import donors as donors_module
+    insert_missing = donors_module.insert_missing
+
+    def other_request_first(connection, table, rows, keys):
+        # The other request's donor lands between our lookup and our insert
+        connection.execute(table.insert(), [dict(rows[0], name='Other')])
+        insert_missing(connection, table, rows, keys)
+
+    monkeypatch.setattr(donors_module, 'insert_missing', other_request_first)
+    donation = add_donation(50, 'new@example.com')
+
+    donor = Donor.query.one()
+    assert donation.donor_id == donor.id and donor.name == 'Other'
+    assert Donation.query.count() == 1
+
+def test_routes_link_and_report(client, admin_user, employee_user):
+    """Test that admin and employee donations share a donor, and the donor pages"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    response = client.post('/admin/donations/create', json={
+        'amount': 100, 'donor_name': 'Jane Doe', 'donor_email': 'Jane@Example.com', 'donor_phone': '+1234567890'
+    })
+    assert response.status_code in (200, 201)
+
+    client.get('/logout')
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    response = client.post('/employee/donate', json={
+        'amount': 50, 'donor_name': 'J. Doe', 'donor_email': 'jane@example.com'
+    })
+    assert response.status_code in (200, 201)
+    assert client.get('/admin/donors').status_code in (302, 403)
+
+    client.get('/logout')
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    donor = Donor.query.one()
+    assert [donation.donor_id for donation in Donation.query] == [donor.id, donor.id]
+
+    data = client.get('/admin/donors?q=+1 234 567 890', headers={'Accept': 'application/json'}).get_json()
+    assert [(found['id'], found['donation_count'], found['total_amount']) for found in data['donors']] == \
+        [(donor.id, 2, 150.0)]
+    data = client.get('/admin/donors?q=nobody@example.com', headers={'Accept': 'application/json'}).get_json()
+    assert data['donors'] == []
+
+    data = client.get(f'/admin/donors/{donor.id}', headers={'Accept': 'application/json'}).get_json()
+    assert (data['name'], data['donation_count'], data['total_amount']) == ('Jane Doe', 2, 150.0)
+    assert [donation['amount'] for donation in data['donations']] == [50.0, 100.0]
+
+    assert 'Jane Doe' in client.get('/admin/donors').get_data(as_text=True)
+    response = client.get(f'/admin/donors/{donor.id}')
+    assert response.status_code == 200
+    assert 'J. Doe' in response.get_data(as_text=True)
+    assert client.get('/admin/donors/999').status_code == 404
+
+def test_dedupe_in_batches(app):
+    """Test that the migration links Core-written donations, reusing and creating donors"""
+    existing = add_donation(20, 'ann@example.com', '5550001111', name='Ann')
+    db.session.execute(db.insert(Donation), [
+        {'id': 10, 'amount': 1, 'donor_name': 'Ann', 'donor_email': 'ANN@example.com', 'date': datetime(2024, 2, 1)},
+        {'id': 11, 'amount': 2, 'donor_name': 'Bo', 'donor_email': 'bo@example.com', 'donor_phone': '7770001111',
+         'date': datetime(2024, 2, 2)},
+        {'id': 12, 'amount': 3, 'donor_name': 'Bo', 'donor_email': 'bo@home.com', 'donor_phone': '777-000-1111',
+         'date': datetime(2024, 2, 3)},
+        {'id': 13, 'amount': 4, 'donor_name': 'Cy', 'donor_email': 'cy@example.com', 'date': datetime(2024, 2, 4)}
+    ])
+    db.session.commit()
+
+    assert dedupe(batch_size=1) == 4
+    linked = {donation.id: donation.donor_id for donation in Donation.query}
+    assert linked[10] == existing.donor_id
+    assert linked[11] == linked[12] != linked[13]
+    assert Donor.query.count() == 3
+
+    result = app.test_cli_runner().invoke(args=['dedupe-donors'])
+    assert 'Linked 0 donations to their donors' in result.output
@@ -0,0 +1,148 @@
+"""
+Test cases for the precomputed due-treatment schedule
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Pet, MedicalRecord, DueTreatment
+from app.due_treatments import backfill, due_this_week
+
+@pytest.fixture
+def pet(app):
+    """Create a pet without medical records"""
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male')
+    db.session.add(pet)
+    db.session.commit()
+    return pet
+
+def add_record(pet, treat_date, treatment_type='Annual vaccination', vaccines=None):
+    record = MedicalRecord(pet_id=pet.pet_id, treatment_type=treatment_type, treat_date=treat_date,
+                           vaccines=vaccines)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+def schedule():
+    return {(row.treatment, row.kind): (row.last_date, row.due_date)
+            for row in DueTreatment.query.order_by(DueTreatment.treatment)}
+
+def test_schedule_keeps_latest_record(pet):
+    """Test that each treatment is due after its latest record only"""
+    add_record(pet, date(2024, 1, 10), vaccines='Rabies, DHPP')
+    add_record(pet, date(2023, 6, 1), vaccines='Rabies')
+    add_record(pet, date(2024, 2, 1), treatment_type='Deworming', vaccines='None')
+    add_record(pet, date(2024, 2, 2), treatment_type='Spay surgery')
+
+    assert schedule() == {
+        ('DEWORMING', 'treatment'): (date(2024, 2, 1), date(2024, 5, 1)),
+        ('DHPP', 'vaccine'): (date(2024, 1, 10), date(2025, 1, 9)),
+        ('RABIES', 'vaccine'): (date(2024, 1, 10), date(2025, 1, 9))
+    }
+
+def test_schedule_follows_edits_and_deletes(pet):
+    """Test that editing or deleting the latest record falls back to the one before"""
+    add_record(pet, date(2023, 6, 1), vaccines='Rabies')
+    latest = add_record(pet, date(2024, 1, 10), vaccines='Rabies')
+
+    latest.treat_date = date(2024, 3, 1)
+    db.session.commit()
+    assert schedule()[('RABIES', 'vaccine')][0] == date(2024, 3, 1)
+
+    db.session.delete(latest)
+    db.session.commit()
+    assert schedule()[('RABIES', 'vaccine')][0] == date(2023, 6, 1)
+
+    MedicalRecord.query.filter_by(pet_id=pet.pet_id).delete()
+    db.session.commit()
+    assert schedule() == {}
+
+def test_backfill_schedules_core_writes(app, pet):
+    """Test that rows inserted behind the ORM are scheduled by the backfill and CLI"""
+    db.session.execute(db.insert(MedicalRecord), [
+        {'pet_id': pet.pet_id, 'treatment_type': 'Health checkup', 'treat_date': date(2024, 5, 1)}
+    ])
+    db.session.commit()
+    assert schedule() == {}
+
+    assert backfill(batch_size=1) == 1
+    assert schedule() == {('HEALTH_CHECKUP', 'treatment'): (date(2024, 5, 1), date(2025, 5, 1))}
+
+    result = app.test_cli_runner().invoke(args=['backfill-due-treatments'])
+    assert 'Scheduled 1 due treatments' in result.output
+
+def test_due_this_week_range(pet):
+    """Test that overdue treatments and those due in the next seven days are listed, soonest first"""
+    today = date.today()
+    add_record(pet, today - timedelta(days=360), vaccines='Rabies')
+    add_record(pet, today - timedelta(days=178), vaccines='Bordetella')
+    add_record(pet, today - timedelta(days=400), treatment_type='Health checkup')
+    add_record(pet, today - timedelta(days=300), vaccines='DHPP')
+
+    due = due_this_week(today)
+    assert [(row.treatment, row.due_date) for row in due] == [
+        ('HEALTH_CHECKUP', today - timedelta(days=35)),
+        ('BORDETELLA', today + timedelta(days=2)),
+        ('RABIES', today + timedelta(days=5))
+    ]
+    assert due[0].pet_name == 'Rex'
+
+def test_due_this_week_skips_adopted_pets(pet):
+    """Test that the schedules of adopted pets don't fill the panel"""
+    adopted = Pet(pet_name='Max', breed='Poodle', age=5, gender='male', status='adopted')
+    db.session.add(adopted)
+    db.session.commit()
+    today = date.today()
+    add_record(adopted, today - timedelta(days=900), vaccines='Rabies')
+    add_record(pet, today - timedelta(days=363), vaccines='Rabies')
+
+    due = due_this_week(today)
+    assert [row.pet_name for row in due] == ['Rex']
+
+def test_create_medical_record_updates_dashboards(client, admin_user, employee_user, pet):
+    """Test that a record created through the admin form shows up on both dashboards"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    treat_date = date.today() - timedelta(days=362)
+    response = client.post('/admin/medical-records/create', json={
+        'pet_id': pet.pet_id, 'treatment_type': 'Vaccination',
+        'treat_date': treat_date.isoformat(), 'vaccines': 'Rabies'
+    })
+    assert response.get_json()['success'] is True
+
+    body = client.get('/admin/dashboard').get_data(as_text=True)
+    assert 'Due This Week' in body and 'Rabies' in body and 'Rex' in body
+
+    client.get('/logout')
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    body = client.get('/employee/dashboard').get_data(as_text=True)
+    assert 'Due This Week' in body and 'Rabies' in body
+
+def test_overdue_flagged_on_dashboard(client, admin_user, pet):
+    """Test that a treatment past its due date is listed and flagged"""
+    add_record(pet, date.today() - timedelta(days=400), vaccines='Rabies')
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    body = client.get('/admin/dashboard').get_data(as_text=True)
+    assert 'Rabies' in body and 'Overdue' in body
+
+def test_bulk_delete_finds_pets_once(app, pet):
+    """Test that one Query.delete() looks up the affected pets once for every derived table"""
+    add_record(pet, date(2024, 1, 10), vaccines='Rabies')
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        MedicalRecord.query.filter_by(pet_id=pet.pet_id).delete()
+        db.session.commit()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert len([s for s in statements if s.startswith('SELECT DISTINCT medical_records.pet_id')]) == 1
+    assert schedule() == {}
+    assert db.session.get(Pet, pet.pet_id).medical_record_count == 0
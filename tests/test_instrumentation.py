@@ -0,0 +1,52 @@
+"""
+Test cases for per-request SQL instrumentation
+"""
+
+from app import db
+from app.models import Pet
+
+def test_server_timing_header(client, admin_user):
+    """Test that responses report SQL time and query count"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get('/admin/dashboard')
+    header = response.headers.get('Server-Timing')
+    assert header is not None
+    assert 'db;dur=' in header
+    assert 'queries' in header
+
+def test_perf_table_groups_by_endpoint(client, admin_user):
+    """Test that /admin/perf aggregates samples per endpoint"""
+    db.session.add(Pet(pet_name='Rex', breed='Beagle', age=2, gender='male'))
+    db.session.commit()
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    client.get('/admin/pets')
+    client.get('/admin/pets')
+
+    response = client.get('/admin/perf', headers={'Accept': 'application/json'})
+    rows = {row['endpoint']: row for row in response.get_json()['endpoints']}
+    assert rows['admin.pets_list']['requests'] == 2
+    assert rows['admin.pets_list']['avg_queries'] >= 1
+    assert rows['admin.pets_list']['slowest_statement'] is not None
+
+    page = client.get('/admin/perf')
+    assert page.status_code == 200
+    assert b'admin.pets_list' in page.data
+
+def test_slow_query_log_captures_plan(client, admin_user, app):
+    """Test that slow statements are logged with route, caller and plan"""
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = 0.0001
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    client.get('/admin/donations')
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+
+    entries = client.get('/admin/slow-queries', headers={'Accept': 'application/json'}).get_json()['entries']
+    donation_entries = [e for e in entries
+                        if e['endpoint'] == 'admin.donations_list' and 'FROM donations' in e['statement']]
+    assert donation_entries
+    entry = donation_entries[0]
+    assert entry['plan'] and 'detail' in entry['plan'][0]
+    assert any('routes_admin.py' in frame for frame in entry['frames'])
+
+    page = client.get('/admin/slow-queries')
+    assert page.status_code == 200
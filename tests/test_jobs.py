@@ -0,0 +1,97 @@
+"""
+Test cases for the background job runner
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.jobs import task, enqueue_after_commit, job_runner
+from app.models import Job
+
+calls = []
+
+@task('test_record_call')
+def record_call(value):
+    """Job that records its argument"""
+    calls.append(value)
+
+@task('test_always_fails')
+def always_fails():
+    """Job that raises on every attempt"""
+    raise RuntimeError('boom')
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    """Forget the calls recorded by earlier tests"""
+    calls.clear()
+
+def test_job_runs_after_commit(app):
+    """Test that a job runs only once its transaction commits"""
+    job = enqueue_after_commit('test_record_call', value=42)
+    assert calls == []
+
+    db.session.commit()
+    assert calls == [42]
+    assert db.session.get(Job, job.id).status == 'done'
+
+def test_job_discarded_on_rollback(app):
+    """Test that rolling back drops the queued job"""
+    enqueue_after_commit('test_record_call', value=1)
+    db.session.rollback()
+    db.session.commit()
+
+    assert calls == []
+    assert Job.query.count() == 0
+
+def test_failing_job_is_retried(app):
+    """Test that a failing job is retried up to the attempt limit"""
+    app.config['JOB_MAX_ATTEMPTS'] = 3
+    job = enqueue_after_commit('test_always_fails')
+    db.session.commit()
+
+    job = db.session.get(Job, job.id)
+    assert job.status == 'failed'
+    assert job.attempts == 3
+    assert 'boom' in job.last_error
+
+def test_unknown_job_rejected(app):
+    """Test that enqueueing an unregistered job fails fast"""
+    with pytest.raises(KeyError):
+        enqueue_after_commit('no_such_job')
+
+def test_recover_pending_jobs(app):
+    """Test that pending jobs from a previous process are re-run"""
+    db.session.add(Job(name='test_record_call', payload='{"value": 7}'))
+    db.session.commit()
+
+    assert job_runner.recover(app) == 1
+    assert calls == [7]
+
+def test_claimed_job_runs_once(app):
+    """Test that a job another worker already claimed is not run again"""
+    job = Job(name='test_record_call', payload='{"value": 3}')
+    db.session.add(job)
+    db.session.commit()
+
+    job_runner.submit(app, job.id)
+    job_runner.submit(app, job.id)
+    assert calls == [3]
+    db.session.expire_all()
+    assert db.session.get(Job, job.id).attempts == 1
+
+def test_recover_respects_lease(app):
+    """Test that only running jobs past their lease are recovered"""
+    now = datetime.utcnow()
+    db.session.add_all([
+        Job(name='test_record_call', payload='{"value": 1}', status='running', attempts=1, started_at=now),
+        Job(name='test_record_call', payload='{"value": 2}', status='running', attempts=1,
+            started_at=now - timedelta(hours=1)),
+        Job(name='test_record_call', payload='{"value": 3}', status='running', attempts=3,
+            started_at=now - timedelta(hours=1))
+    ])
+    db.session.commit()
+
+    assert job_runner.recover(app) == 1
+    assert calls == [2]
+    db.session.expire_all()
+    assert [job.status for job in Job.query.order_by(Job.id)] == ['running', 'done', 'failed']
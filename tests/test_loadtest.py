@@ -0,0 +1,97 @@
+"""
+Test cases for the Postman collection load driver
+"""
+
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from app import create_app, db
+from app.models import User, Pet
+import loadtest
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Create an application on its own database file"""
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "load.db"}')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        for username, role in (('admin', 'admin'), ('employee1', 'employee')):
+            user = User(username=username, email=f'{username}@test.com', role=role)
+            user.set_password('password123')
+            db.session.add(user)
+        db.session.add(Pet(pet_name='Rex', breed='Beagle', age=2, gender='male'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+@pytest.fixture
+def base_url(app):
+    """Serve the application on a free local port"""
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+def test_load_collection():
+    """Test that the collection is flattened with roles and bodies"""
+    requests, variables = loadtest.load_collection(loadtest.DEFAULT_COLLECTION)
+    by_name = {r['name']: r for r in requests}
+
+    assert variables['base_url'] == 'http://localhost:5000'
+    assert by_name['Admin - Pets / List All Pets']['role'] == 'admin'
+    assert by_name['Employee - Donations / View My Donations']['role'] == 'employee'
+    assert by_name['Authentication / Login']['role'] is None
+    assert ('username', 'admin') in by_name['Authentication / Login']['body']
+
+def test_apply_mix_and_exclude():
+    """Test weights by folder and request name"""
+    requests, _ = loadtest.load_collection(loadtest.DEFAULT_COLLECTION)
+    weighted = loadtest.apply_mix(requests, {'Admin - Pets': 3, 'Create Pet': 5},
+                                  exclude=['Delete Pet', 'Authentication'])
+    by_name = {r['name']: r['weight'] for r in weighted}
+
+    assert by_name['Admin - Pets / List All Pets'] == 3
+    assert by_name['Admin - Pets / Create Pet'] == 5
+    assert by_name['Employee - Adoptions / Adopt Pet'] == 1
+    assert 'Admin - Pets / Delete Pet' not in by_name
+    assert not any(name.startswith('Authentication') for name in by_name)
+
+def test_resolve_variables():
+    """Test collection and dynamic variable substitution"""
+    rng = loadtest.random.Random(1)
+    assert loadtest.resolve('{{base_url}}/login', {'base_url': 'http://x'}, rng) == 'http://x/login'
+    assert loadtest.resolve('{{missing}}', {}, rng) == '{{missing}}'
+    assert loadtest.resolve('user_{{$guid}}', {}, rng) != loadtest.resolve('user_{{$guid}}', {}, rng)
+
+def test_assign_roles_follows_mix():
+    """Test that virtual users are split by admin and employee weight"""
+    requests = [{'role': 'admin', 'weight': 3}, {'role': 'employee', 'weight': 1},
+                {'role': None, 'weight': 1}]
+    assert loadtest.assign_roles(requests, 4) == ['admin', 'admin', 'admin', 'employee']
+    assert loadtest.assign_roles(requests, 2, admin_share=1.0) == ['admin', 'employee']
+
+def test_run_load_against_server(base_url):
+    """Test replaying the read-only part of the collection with per-user sessions"""
+    requests, variables = loadtest.load_collection(loadtest.DEFAULT_COLLECTION)
+    requests = loadtest.apply_mix(requests, {'View My Donations': 2},
+                                  exclude=['Authentication', 'Delete Pet', 'Create Pet',
+                                           'Update Pet', 'Create Donation', 'Adopt Pet'])
+    credentials = {'admin': ('admin', 'password123'), 'employee': ('employee1', 'password123')}
+
+    results, wall_time = loadtest.run_load(requests, base_url, variables, credentials,
+                                           concurrency=4, total_requests=40)
+
+    assert sum(r['requests'] for r in results.values()) == 40
+    assert wall_time > 0
+    for name, result in results.items():
+        # Logged-in users get pages, not redirects to the login form
+        assert result['statuses'] == {'200': result['requests']}, name
+        assert result['errors'] == 0
+        assert result['p50_ms'] <= result['p99_ms']
@@ -0,0 +1,136 @@
+"""
+Test cases for adopter-to-pet matching
+"""
+
+import pytest
+from app import db
+from app.models import Pet
+from app import matching
+from app.matching import matcher, species_of, energy_of, breed_matches
+
+@pytest.fixture
+def pets(app):
+    """Available dogs and a cat with different ages and energy"""
+    pets = [
+        Pet(pet_name='Sunny', breed='Golden Retriever', age=2, gender='male',
+            description='Energetic and playful, loves long walks'),
+        Pet(pet_name='Bella', breed='Labrador Mix', age=3, gender='female', description='Calm and gentle'),
+        Pet(pet_name='Scout', breed='Beagle', age=9, gender='male', description='Active and curious'),
+        Pet(pet_name='Luna', breed='Persian Cat', age=2, gender='female', description='Quiet lap cat')
+    ]
+    db.session.add_all(pets)
+    db.session.commit()
+    return {pet.pet_name: pet.pet_id for pet in pets}
+
+# Asks the match page for JSON
+JSON = {'Accept': 'application/json'}
+
+def names(ranked, pets):
+    by_id = {pet_id: name for name, pet_id in pets.items()}
+    return [by_id[pet_id] for pet_id, _, _ in ranked]
+
+def test_features():
+    """Test the species, energy and breed family read from a pet's fields"""
+    assert species_of('Persian Cat') == 'cat'
+    assert species_of('Pit Bull Mix') == 'dog'
+    assert species_of('Guinea Pig') == 'small_animal'
+    assert species_of('Axolotl') == 'other'
+    assert energy_of('Energetic and playful') == 1.0
+    assert energy_of('Calm and gentle, but active') == pytest.approx(-1 / 3)
+    assert energy_of(None) == 0.0
+    assert breed_matches('retriever', 'Labrador Mix')
+    assert breed_matches('Beagle', 'Beagle')
+    assert not breed_matches('retriever', 'Beagle')
+
+def test_match_ranks_preferences(pets):
+    """Test that species filters and the other preferences rank the pets"""
+    ranked = matcher.match(species='dog', breed='retriever', min_age=1, max_age=3, energy='high')
+    assert names(ranked, pets) == ['Sunny', 'Bella', 'Scout']
+    assert ranked[0][2] == 1.0
+
+    assert names(matcher.match(species='cat'), pets) == ['Luna']
+    assert names(matcher.match(gender='female', limit=2), pets) == ['Bella', 'Luna']
+    # Without preferences the longest waiting pets come first
+    assert names(matcher.match(limit=3), pets) == ['Sunny', 'Bella', 'Scout']
+
+def test_matrix_follows_pet_changes(pets):
+    """Test that adopted, edited, deleted and new pets are picked up incrementally"""
+    assert len(matcher.match(species='dog')) == 3
+    loaded = matcher.matrix.columns['id']
+
+    sunny = db.session.get(Pet, pets['Sunny'])
+    sunny.status = 'adopted'
+    scout = db.session.get(Pet, pets['Scout'])
+    scout.age = 1
+    db.session.commit()
+    ranked = matcher.match(species='dog', max_age=1)
+    assert names(ranked, pets) == ['Scout', 'Bella']
+    assert matcher.matrix.columns['id'] is loaded
+
+    db.session.delete(db.session.get(Pet, pets['Bella']))
+    rex = Pet(pet_name='Rex', breed='Labrador Retriever', age=1, gender='male')
+    db.session.add(rex)
+    db.session.commit()
+    pets['Rex'] = rex.pet_id
+    assert names(matcher.match(species='dog', breed='labrador'), pets) == ['Rex', 'Scout']
+
+    # Changes made behind the session are seen once the matrix is reloaded
+    db.session.execute(db.update(Pet).where(Pet.pet_id == rex.pet_id).values(status='foster'))
+    db.session.commit()
+    matcher.max_age = -1
+    assert names(matcher.match(species='dog'), pets) == ['Scout']
+
+def test_numpy_matches_python(pets, monkeypatch):
+    """Test the vectorized scores give the plain Python results"""
+    pytest.importorskip('numpy')
+    preferences = dict(breed='retriever', min_age=2, max_age=4, gender='female', energy='low')
+    vectorized = matcher.match(**preferences)
+    monkeypatch.setattr(matching, 'np', None)
+    matcher.matrix._snapshot = None
+    assert matcher.match(**preferences) == vectorized
+
+def test_match_page(client, employee_user, pets):
+    """Test the HTML and JSON match page and its validation"""
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+
+    response = client.get('/employee/adopt/match?species=dog&energy=low&limit=1', headers=JSON)
+    data = response.get_json()
+    assert [match['pet_name'] for match in data['matches']] == ['Bella']
+    assert data['matches'][0]['match'] == 1.0
+
+    body = client.get('/employee/adopt/match').get_data(as_text=True)
+    assert 'Match an Adopter' in body and 'Bella' not in body
+    body = client.get('/employee/adopt/match?species=cat').get_data(as_text=True)
+    assert 'Luna' in body and 'Sunny' not in body
+
+    for query in ('min_age=5&max_age=2', 'species=dragon', 'energy=extreme', 'limit=0', 'min_age=x'):
+        assert client.get(f'/employee/adopt/match?{query}', headers=JSON).status_code == 400
+
+def test_match_page_skips_pets_adopted_elsewhere(client, employee_user, pets):
+    """Test that a pet adopted behind the matrix's back is not offered"""
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    assert len(client.get('/employee/adopt/match?species=dog', headers=JSON).get_json()['matches']) == 3
+
+    # As another worker would: no session event reaches this process's matrix
+    table = Pet.__table__
+    db.session.connection().execute(
+        table.update().where(table.c.pet_id == pets['Bella']).values(status='adopted'))
+    db.session.commit()
+
+    matches = client.get('/employee/adopt/match?species=dog', headers=JSON).get_json()['matches']
+    assert [match['pet_name'] for match in matches] == ['Sunny', 'Scout']
+    assert len(matcher.match(species='dog')) == 2
+
+def test_match_page_fills_limit_after_pets_adopted_elsewhere(client, employee_user, pets):
+    """Test that limit matches come back when enough available pets remain"""
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    assert len(client.get('/employee/adopt/match?limit=2', headers=JSON).get_json()['matches']) == 2
+
+    table = Pet.__table__
+    db.session.connection().execute(
+        table.update().where(table.c.pet_id.in_([pets['Sunny'], pets['Bella']])).values(status='adopted'))
+    db.session.commit()
+
+    matches = client.get('/employee/adopt/match?limit=2', headers=JSON).get_json()['matches']
+    assert [match['pet_name'] for match in matches] == ['Scout', 'Luna']
+
@@ -0,0 +1,131 @@
+"""
+Test cases for the denormalized medical summary on pets
+"""
+
+from datetime import date
+
+import pytest
+from app import db
+from app.models import Pet, MedicalRecord
+from app.medical_summary import backfill
+
+@pytest.fixture
+def pet(app):
+    """Create a pet without medical records"""
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male')
+    db.session.add(pet)
+    db.session.commit()
+    return pet
+
+def add_record(pet, treat_date, vaccines=None):
+    record = MedicalRecord(pet_id=pet.pet_id, treatment_type='Checkup', treat_date=treat_date,
+                           vaccines=vaccines)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+def test_summary_follows_inserts(pet):
+    """Test that adding records updates count and dates"""
+    assert pet.medical_record_count == 0
+    assert pet.last_treat_date is None
+
+    add_record(pet, date(2024, 1, 10), vaccines='Rabies')
+    add_record(pet, date(2024, 3, 5), vaccines='None')
+    add_record(pet, date(2023, 12, 1))
+
+    assert pet.medical_record_count == 3
+    assert pet.last_treat_date == date(2024, 3, 5)
+    # 'None' is how the forms record a treatment without vaccines
+    assert pet.last_vaccine_date == date(2024, 1, 10)
+
+def test_summary_follows_updates_and_deletes(pet):
+    """Test that editing and deleting records recomputes the summary"""
+    first = add_record(pet, date(2024, 1, 10), vaccines='Rabies')
+    latest = add_record(pet, date(2024, 3, 5))
+
+    latest.vaccines = 'DHPP'
+    db.session.commit()
+    assert pet.last_vaccine_date == date(2024, 3, 5)
+
+    db.session.delete(latest)
+    db.session.commit()
+    assert pet.medical_record_count == 1
+    assert pet.last_treat_date == date(2024, 1, 10)
+
+    other = Pet(pet_name='Mia', breed='Tabby', age=1, gender='female')
+    db.session.add(other)
+    db.session.flush()
+    first.pet_id = other.pet_id
+    db.session.commit()
+    assert pet.medical_record_count == 0
+    assert pet.last_treat_date is None
+    assert other.medical_record_count == 1
+
+def test_summary_follows_bulk_delete(pet):
+    """Test that Query.delete() on medical records is picked up"""
+    add_record(pet, date(2024, 1, 10))
+    add_record(pet, date(2024, 2, 10))
+
+    MedicalRecord.query.filter(MedicalRecord.treat_date > date(2024, 2, 1)).delete()
+    db.session.commit()
+    assert pet.medical_record_count == 1
+    assert pet.last_treat_date == date(2024, 1, 10)
+
+def test_rolled_back_records_leave_summary(pet):
+    """Test that a rolled-back insert doesn't change the pet"""
+    db.session.add(MedicalRecord(pet_id=pet.pet_id, treatment_type='Checkup', treat_date=date(2024, 1, 1)))
+    db.session.flush()
+    db.session.rollback()
+
+    assert pet.medical_record_count == 0
+
+def test_backfill_repairs_core_writes(pet):
+    """Test that rows inserted behind the ORM are counted by the backfill"""
+    db.session.execute(db.insert(MedicalRecord), [
+        {'pet_id': pet.pet_id, 'treatment_type': 'Checkup', 'treat_date': date(2024, 5, 1)},
+        {'pet_id': pet.pet_id, 'treatment_type': 'Vaccination', 'treat_date': date(2024, 4, 1),
+         'vaccines': 'Rabies'}
+    ])
+    db.session.commit()
+    assert pet.medical_record_count == 0
+
+    assert backfill(batch_size=1) == 1
+    assert pet.medical_record_count == 2
+    assert pet.last_vaccine_date == date(2024, 4, 1)
+
+def test_backfill_command(app, pet):
+    """Test the flask CLI command"""
+    db.session.execute(db.insert(MedicalRecord), [
+        {'pet_id': pet.pet_id, 'treatment_type': 'Checkup', 'treat_date': date(2024, 5, 1)}
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['backfill-medical-summary', '--batch-size', '10'])
+    assert 'Recomputed the medical summary of 1 pets' in result.output
+    assert pet.medical_record_count == 1
+
+def test_delete_pet_with_records(client, admin_user, pet):
+    """Test that delete_pet's bulk delete of records still works"""
+    add_record(pet, date(2024, 1, 10))
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.post(f'/admin/pets/{pet.pet_id}/delete', json={})
+    assert response.get_json() == {'success': True}
+    assert Pet.query.count() == 0
+
+def test_pets_list_health_filter(client, admin_user, pet):
+    """Test filtering and sorting the admin pets list by the summary"""
+    treated = Pet(pet_name='Mia', breed='Tabby', age=1, gender='female')
+    db.session.add(treated)
+    db.session.commit()
+    add_record(treated, date.today(), vaccines='Rabies')
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    body = client.get('/admin/pets?health=untreated').get_data(as_text=True)
+    assert 'Rex' in body and 'Mia' not in body
+
+    body = client.get('/admin/pets?health=vaccine_overdue').get_data(as_text=True)
+    assert 'Rex' in body and 'Mia' not in body
+
+    body = client.get('/admin/pets?sort=last_treated').get_data(as_text=True)
+    assert body.index('Rex') < body.index('Mia')
@@ -0,0 +1,90 @@
+"""
+Test cases for the Prometheus metrics endpoint
+"""
+
+import json
+import os
+import pytest
+
+@pytest.fixture
+def app(app, tmp_path):
+    """Test application sharing metrics snapshots through tmp_path"""
+    app.config['METRICS_MULTIPROC_DIR'] = str(tmp_path)
+    return app
+
+def test_metrics_exposition_format(client, admin_user):
+    """Test that request latency is exported per endpoint"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    client.get('/admin/dashboard')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="admin.dashboard",le="+Inf",method="GET"}' in text \
+        or 'http_request_duration_seconds_bucket{endpoint="admin.dashboard",method="GET",le="+Inf"}' in text
+    assert 'db_queries_total{endpoint="admin.dashboard"}' in text
+    assert 'db_pool_checkout_wait_seconds_count' in text
+
+def scrape_value(client, series):
+    """Read one sample value from /metrics"""
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        if line.startswith(series + ' '):
+            return float(line.split()[-1])
+    return 0.0
+
+def test_metrics_aggregate_worker_snapshots(client, app):
+    """Test that snapshots written by other workers are summed in"""
+    before = scrape_value(client, 'upload_bytes_total')
+    other = {
+        'pid': os.getppid(),
+        'counters': [['upload_bytes_total', [], 1000.0]],
+        'gauges': [],
+        'histograms': []
+    }
+    with open(os.path.join(app.config['METRICS_MULTIPROC_DIR'], 'metrics_1.json'), 'w') as f:
+        json.dump(other, f)
+
+    assert scrape_value(client, 'upload_bytes_total') == before + 1000
+
+def test_metrics_token(client, app):
+    """Test that a configured token is required to scrape"""
+    app.config['METRICS_TOKEN'] = 'secret'
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+
+def test_metrics_archive_exited_workers(client, app):
+    """Test that an exited worker's counters are kept after its snapshot is removed"""
+    before = scrape_value(client, 'upload_bytes_total')
+    queued = scrape_value(client, 'audit_queue_depth')
+    path = os.path.join(app.config['METRICS_MULTIPROC_DIR'], 'metrics_999999999.json')
+    with open(path, 'w') as f:
+        json.dump({'pid': 999999999,
+                   'counters': [['upload_bytes_total', [], 1000.0]],
+                   'gauges': [['audit_queue_depth', [], 5.0]],
+                   'histograms': [['db_pool_checkout_wait_seconds', [],
+                                   [1] + [0] * 10, 0.001, 1]]}, f)
+
+    assert scrape_value(client, 'upload_bytes_total') == before + 1000
+    assert not os.path.exists(path)
+    # Archived once: a later scrape doesn't add it again
+    assert scrape_value(client, 'upload_bytes_total') == before + 1000
+    assert scrape_value(client, 'audit_queue_depth') == queued
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'db_pool_checkout_wait_seconds_count' in text
+
+def test_metrics_worker_of_another_user_is_alive(client, app, monkeypatch):
+    """Test that a worker we may not signal is treated as running"""
+    def kill(pid, signal):
+        raise PermissionError
+    monkeypatch.setattr(os, 'kill', kill)
+    before = scrape_value(client, 'upload_bytes_total')
+    path = os.path.join(app.config['METRICS_MULTIPROC_DIR'], 'metrics_999999999.json')
+    with open(path, 'w') as f:
+        json.dump({'pid': 999999999, 'counters': [['upload_bytes_total', [], 1000.0]],
+                   'gauges': [], 'histograms': []}, f)
+
+    assert scrape_value(client, 'upload_bytes_total') == before + 1000
+    assert os.path.exists(path)
@@ -3,22 +3,10 @@ Test cases for database models
 """
 
 import pytest
-from app import create_app, db
+from app import db
 from app.models import User, Pet, Donation, Adoption, MedicalRecord
 from datetime import date, datetime
 
-@pytest.fixture
-def app():
-    """Create test application"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-
 def test_user_model(app):
     """Test User model functionality"""
     with app.app_context():
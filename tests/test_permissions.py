@@ -3,47 +3,8 @@ Test cases for role-based permissions
 """
 
 import pytest
-from app import create_app, db
-from app.models import User, Pet, Donation
-
-@pytest.fixture
-def app():
-    """Create test application"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-
-@pytest.fixture
-def client(app):
-    """Create test client"""
-    return app.test_client()
-
-@pytest.fixture
-def admin_user(app):
-    """Create admin user"""
-    user = User(username='admin', email='admin@test.com', role='admin')
-    user.set_password('password123')
-    
-    with app.app_context():
-        db.session.add(user)
-        db.session.commit()
-        yield user
-
-@pytest.fixture
-def employee_user(app):
-    """Create employee user"""
-    user = User(username='employee', email='emp@test.com', role='employee')
-    user.set_password('password123')
-    
-    with app.app_context():
-        db.session.add(user)
-        db.session.commit()
-        yield user
+from app import db
+from app.models import Pet, Donation
 
 @pytest.fixture
 def sample_pet(app):
@@ -0,0 +1,131 @@
+"""
+Query-count budgets for list and dashboard routes
+
+Each route is requested with 10 and with 1,000 rows per table; the
+number of SQL statements must not grow with the data (no N+1 loops).
+"""
+
+import re
+from datetime import date, timedelta
+
+import pytest
+from app import db
+from app.models import User, Pet, Donation, Adoption, MedicalRecord
+from tests.query_budget import query_budget
+
+@pytest.fixture
+def users(app):
+    """Create an admin and an employee"""
+    admin = User(username='admin', email='admin@test.com', role='admin')
+    admin.set_password('password123')
+    employee = User(username='employee', email='employee@test.com', role='employee')
+    employee.set_password('password123')
+    db.session.add_all([admin, employee])
+    db.session.commit()
+    return {'admin': admin.id, 'employee': employee.id}
+
+def seed_rows(total, employee_id):
+    """Top every table up to total rows, with related rows spread across pets and donors"""
+    start = Pet.query.count()
+    for i in range(start, total):
+        pet = Pet(pet_name=f'Pet {i}', breed='Beagle', age=i % 15, gender='male',
+                  status='available' if i % 2 else 'adopted', description='Friendly dog. ' * 40)
+        donation = Donation(amount=10 + i, donor_name=f'Donor {i}', donor_email=f'donor{i}@test.com',
+                            user_id=employee_id if i % 2 else None)
+        db.session.add_all([pet, donation])
+        db.session.flush()
+        db.session.add_all([
+            Adoption(adopt_name=f'Adopter {i}', adopt_email=f'adopter{i}@test.com',
+                     pet_id=pet.pet_id, user_id=employee_id),
+            MedicalRecord(pet_id=pet.pet_id, treatment_type='Checkup',
+                          treat_date=date.today() - timedelta(days=i), donor_id=donation.id,
+                          description='Routine checkup. ' * 40)
+        ])
+    # Committing expires everything, so the next request reloads what it renders
+    db.session.commit()
+
+LIST_ROUTES = [
+    ('admin', '/admin/dashboard'),
+    ('admin', '/admin/pets'),
+    ('admin', '/admin/donations'),
+    ('admin', '/admin/adoptions'),
+    ('admin', '/admin/medical-records'),
+    ('admin', '/admin/audit'),
+    ('employee', '/employee/dashboard'),
+    ('employee', '/employee/pets'),
+    ('employee', '/employee/adopt'),
+    ('employee', '/employee/medical-records'),
+    ('employee', '/employee/my-donations'),
+    ('employee', '/employee/my-adoptions'),
+]
+
+@pytest.mark.parametrize('role,url', LIST_ROUTES)
+def test_query_count_independent_of_row_count(client, users, query_counter, role, url):
+    """Test that a list route issues the same number of queries for 10 and 1,000 rows"""
+    client.post('/login', data={'username': role, 'password': 'password123'})
+
+    seed_rows(10, users['employee'])
+    response = client.get(url)
+    assert response.status_code == 200
+    small = query_counter.per_request[-1]
+
+    seed_rows(1000, users['employee'])
+    response = client.get(url)
+    assert response.status_code == 200
+    large = query_counter.per_request[-1]
+
+    assert large == small, f'{url}: {small} queries with 10 rows, {large} with 1,000'
+
+@query_budget(5)
+def test_query_budget_decorator(client, users):
+    """Test the decorator on a route well within its budget"""
+    seed_rows(10, users['employee'])
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    assert client.get('/admin/pets').status_code == 200
+
+def test_query_budget_decorator_fails_over_budget(client, users):
+    """Test that the decorator reports requests over budget"""
+    @query_budget(0)
+    def over_budget():
+        client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    with pytest.raises(AssertionError, match='exceeded the budget of 0 queries'):
+        over_budget()
+
+def test_query_counter_count(query_counter, users):
+    """Test counting the statements of a single call"""
+    assert query_counter.count(lambda: Pet.query.all()) == 1
+    assert query_counter.count(lambda: None) == 0
+
+# Large text columns that list pages must not fetch (snippets are computed in SQL)
+LARGE_TEXT = re.compile(r'(?<!substr\()\b(pets\.description|medical_records\.description|adoptions\.address)\b')
+
+@pytest.mark.parametrize('role,url', [
+    ('admin', '/admin/dashboard'),
+    ('admin', '/admin/pets'),
+    ('admin', '/admin/adoptions'),
+    ('admin', '/admin/medical-records'),
+    ('employee', '/employee/dashboard'),
+    ('employee', '/employee/pets'),
+    ('employee', '/employee/adopt'),
+    ('employee', '/employee/medical-records'),
+])
+def test_list_pages_skip_large_text(client, users, query_counter, role, url):
+    """Test that list pages select snippets instead of whole text columns"""
+    seed_rows(10, users['employee'])
+    client.post('/login', data={'username': role, 'password': 'password123'})
+    query_counter.statements.clear()
+
+    response = client.get(url)
+    assert response.status_code == 200
+    fetched = [s for s in query_counter.statements if LARGE_TEXT.search(s)]
+    assert not fetched, fetched
+
+def test_snippet_rendered_with_ellipsis(client, users):
+    """Test that a long description shows its first characters and an ellipsis"""
+    seed_rows(1, users['employee'])
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+
+    body = client.get('/employee/pets').get_data(as_text=True)
+    assert ('Friendly dog. ' * 40)[:100] + '...' in body
+    assert ('Friendly dog. ' * 40)[:101] not in body
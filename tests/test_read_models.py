@@ -0,0 +1,79 @@
+"""
+Test cases for the read models behind read-only employee views
+"""
+
+from datetime import date
+
+import pytest
+from app import db, read_models
+from app.models import Pet, Donation, MedicalRecord
+
+@pytest.fixture
+def records(app):
+    """Two pets, one with a donor-funded medical record"""
+    rex = Pet(pet_name='Rex', breed='Beagle', age=24, gender='male', description='A' * 150)
+    mia = Pet(pet_name='Mia', breed='Tabby', age=12, gender='female', status='adopted')
+    donation = Donation(amount=42.5, donor_name='Jane', donor_email='jane@test.com')
+    db.session.add_all([rex, mia, donation])
+    db.session.flush()
+    db.session.add_all([
+        MedicalRecord(pet_id=rex.pet_id, treatment_type='Vaccination', treat_date=date(2024, 3, 1),
+                      vaccines='Rabies', donor_id=donation.id),
+        MedicalRecord(pet_id=mia.pet_id, treatment_type='Checkup', treat_date=date(2024, 4, 1))
+    ])
+    db.session.commit()
+    return {'rex': rex.pet_id, 'mia': mia.pet_id}
+
+def test_rows_are_tuples_outside_the_session(records):
+    """Test that read models don't create ORM instances"""
+    db.session.expunge_all()
+    pets = read_models.pets().all()
+
+    assert {pet.pet_name for pet in pets} == {'Rex', 'Mia'}
+    assert all(isinstance(pet, tuple) and not hasattr(pet, '__dict__') for pet in pets)
+    assert len(db.session.identity_map) == 0
+
+def test_pets_filtered_and_snippet(records):
+    """Test the status filter and the 101-character description snippet"""
+    pets = read_models.pets(status='available').all()
+
+    assert [pet.pet_name for pet in pets] == ['Rex']
+    assert pets[0].description_snippet == 'A' * 101
+
+def test_medical_records_nest_pet_and_donation(records):
+    """Test that list rows carry their pet and optional donation"""
+    rows = {row.treatment_type: row for row in read_models.medical_records().all()}
+
+    assert rows['Vaccination'].pet.pet_name == 'Rex'
+    assert rows['Vaccination'].donation.donor_name == 'Jane'
+    assert rows['Checkup'].pet.breed == 'Tabby'
+    assert rows['Checkup'].donation is None
+
+def test_pet_detail_json(client, employee_user, records):
+    """Test the JSON form of the pet detail page"""
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+
+    data = client.get(f"/employee/pets/{records['rex']}", headers={'Accept': 'application/json'}).get_json()
+    assert data['pet']['pet_name'] == 'Rex'
+    assert data['pet']['description'] == 'A' * 150
+    assert data['medical_records'][0]['treat_date'] == '2024-03-01'
+
+    assert client.get('/employee/pets/9999').status_code == 404
+
+def test_medical_records_json(client, employee_user, records):
+    """Test the JSON form of the medical records list"""
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+
+    data = client.get('/employee/medical-records', headers={'Accept': 'application/json'}).get_json()
+    assert data['summary']['total'] == 2
+    donated = [r for r in data['medical_records'] if r['donation']]
+    assert donated[0]['donation'] == {'id': donated[0]['donation']['id'], 'donor_name': 'Jane', 'amount': 42.5}
+
+def test_read_only_pages_render(client, employee_user, records):
+    """Test that the HTML views render from read-model rows"""
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+
+    assert b'Rex' in client.get('/employee/pets').data
+    assert b'Mia' not in client.get('/employee/adopt').data
+    assert b'Jane' in client.get('/employee/medical-records').data
+    assert b'Rabies' in client.get(f"/employee/pets/{records['rex']}").data
@@ -0,0 +1,119 @@
+"""
+Test cases for shelters and their occupancy counters
+"""
+
+from app import db
+from app.models import Pet, Shelter
+from app.shelters import normalize, normalize_existing
+
+def add_pet(shelter_no, status='available', pet_name='Rex'):
+    pet = Pet(pet_name=pet_name, breed='Beagle', age=2, gender='male', status=status, shelter_no=shelter_no)
+    db.session.add(pet)
+    db.session.commit()
+    return pet
+
+def counts():
+    db.session.expire_all()
+    return {shelter.shelter_no: (shelter.available_count, shelter.foster_count, shelter.adopted_count)
+            for shelter in Shelter.query}
+
+def test_normalize():
+    """Test that spelling variants of a shelter number collapse to one"""
+    assert normalize(' sh 001 ') == normalize('SH-001') == normalize('Sh_001') == 'SH001'
+    assert normalize('') is None and normalize('  ') is None and normalize(None) is None
+
+def test_counters_follow_pet_changes(app):
+    """Test that creating, moving, fostering and deleting pets adjusts the counters"""
+    rex = add_pet('sh-001')
+    add_pet('SH001', status='foster', pet_name='Luna')
+    assert rex.shelter_no == 'SH001'
+    assert counts() == {'SH001': (1, 1, 0)}
+
+    rex.shelter_no = 'sh 002'
+    db.session.commit()
+    assert rex.shelter_no == 'SH002'
+    assert counts() == {'SH001': (0, 1, 0), 'SH002': (1, 0, 0)}
+
+    rex.status = 'foster'
+    rex.shelter_no = 'SH001'
+    db.session.commit()
+    assert counts() == {'SH001': (0, 2, 0), 'SH002': (0, 0, 0)}
+
+    # Saving unrelated changes leaves the counters alone
+    rex.description = 'Loves walks'
+    db.session.commit()
+    assert counts()['SH001'] == (0, 2, 0)
+
+    db.session.delete(rex)
+    db.session.commit()
+    assert counts()['SH001'] == (0, 1, 0)
+
+def test_unnormalized_numbers_count_against_their_shelter(app):
+    """Test that moving or deleting a pet stored before normalization never creates a raw-number shelter"""
+    add_pet('SH001')
+    db.session.execute(db.insert(Pet), [
+        {'pet_id': 10, 'pet_name': 'A', 'breed': 'Beagle', 'age': 1, 'gender': 'male', 'status': 'available',
+         'shelter_no': 'sh 001'},
+        {'pet_id': 11, 'pet_name': 'B', 'breed': 'Beagle', 'age': 1, 'gender': 'male', 'status': 'available',
+         'shelter_no': 'sh-001'}
+    ])
+    db.session.commit()
+    db.session.execute(db.update(Shelter).values(available_count=3))
+    db.session.commit()
+
+    moved = db.session.get(Pet, 10)
+    moved.shelter_no = 'SH002'
+    db.session.delete(db.session.get(Pet, 11))
+    db.session.commit()
+    assert counts() == {'SH001': (1, 0, 0), 'SH002': (1, 0, 0)}
+
+def test_routes_keep_occupancy(client, admin_user, employee_user):
+    """Test create, edit, adopt and delete through the routes, and the occupancy report"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    for name in ('Rex', 'Luna', 'Max'):
+        response = client.post('/admin/pets/create', json={
+            'pet_name': name, 'breed': 'Beagle', 'age': 2, 'gender': 'male', 'shelter_no': 'sh001'
+        })
+        assert response.status_code in (200, 201)
+    rex, luna, max_ = Pet.query.order_by(Pet.pet_id).all()
+
+    client.post(f'/admin/pets/{luna.pet_id}/edit', json={
+        'pet_name': 'Luna', 'breed': 'Beagle', 'age': 2, 'gender': 'male', 'status': 'foster', 'shelter_no': 'SH-002'
+    })
+    client.post(f'/admin/pets/{max_.pet_id}/delete', json={})
+
+    client.get('/logout')
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    client.post(f'/employee/adopt/{rex.pet_id}', json={'adopt_name': 'Ann', 'adopt_email': 'ann@example.com'})
+    assert counts() == {'SH001': (0, 0, 1), 'SH002': (0, 1, 0)}
+
+    client.get('/logout')
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    data = client.get('/admin/shelters', headers={'Accept': 'application/json'}).get_json()
+    assert [(shelter['shelter_no'], shelter['in_care']) for shelter in data['shelters']] == [('SH001', 0), ('SH002', 1)]
+    assert data['totals'] == {'available': 0, 'foster': 1, 'adopted': 1, 'in_care': 1}
+    response = client.get('/admin/shelters')
+    assert response.status_code == 200
+    assert 'SH002' in response.get_data(as_text=True)
+
+def test_normalize_existing_in_batches(app):
+    """Test that the migration normalizes Core-written shelter numbers and recounts"""
+    db.session.execute(db.insert(Pet), [
+        {'pet_id': 1, 'pet_name': 'A', 'breed': 'Beagle', 'age': 1, 'gender': 'male', 'status': 'available',
+         'shelter_no': 'sh 7'},
+        {'pet_id': 2, 'pet_name': 'B', 'breed': 'Beagle', 'age': 1, 'gender': 'male', 'status': 'adopted',
+         'shelter_no': 'SH-7'},
+        {'pet_id': 3, 'pet_name': 'C', 'breed': 'Beagle', 'age': 1, 'gender': 'male', 'status': 'available',
+         'shelter_no': 'SH8'},
+        {'pet_id': 4, 'pet_name': 'D', 'breed': 'Beagle', 'age': 1, 'gender': 'male', 'status': 'available',
+         'shelter_no': ' '}
+    ])
+    db.session.commit()
+
+    assert normalize_existing(batch_size=2) == 3
+    assert [pet.shelter_no for pet in Pet.query.order_by(Pet.pet_id)] == ['SH7', 'SH7', 'SH8', None]
+    assert counts() == {'SH7': (1, 0, 1), 'SH8': (1, 0, 0)}
+
+    result = app.test_cli_runner().invoke(args=['normalize-shelters'])
+    assert 'Normalized the shelter number of 0 pets' in result.output
+    assert counts() == {'SH7': (1, 0, 1), 'SH8': (1, 0, 0)}
@@ -0,0 +1,136 @@
+"""
+Test cases for the pet status history and length-of-stay totals
+"""
+
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Pet, Adoption, PetStatusChange, PetStayTotal
+from app.status_history import backfill, report
+
+def add_pet(days_ago=10, **fields):
+    values = dict(pet_name='Rex', breed='Beagle', age=2, gender='male', shelter_no='SH001',
+                  created_at=datetime.utcnow() - timedelta(days=days_ago))
+    values.update(fields)
+    pet = Pet(**values)
+    db.session.add(pet)
+    db.session.commit()
+    return pet
+
+def history(pet):
+    return [(row.from_status, row.to_status) for row in
+            PetStatusChange.query.filter_by(pet_id=pet.pet_id).order_by(PetStatusChange.id)]
+
+def total(metric, dimension='all', key=''):
+    row = db.session.get(PetStayTotal, (metric, dimension, key))
+    return (row.stay_count, round(row.total_days)) if row else None
+
+def test_new_pet_records_intake(app):
+    """Test that creating a pet records its intake at created_at"""
+    pet = add_pet(days_ago=3)
+    assert history(pet) == [(None, 'available')]
+    assert PetStatusChange.query.one().changed_at == pet.created_at
+    assert total('intake') == (1, 0)
+    assert total('adoption') is None
+
+def test_foster_and_adoption_totals(app):
+    """Test that foster stays and intake-to-adoption days are added to every dimension"""
+    pet = add_pet(days_ago=30, age=1)
+    pet.status = 'foster'
+    db.session.commit()
+    # Pretend the foster stay began twelve days ago
+    db.session.execute(db.update(PetStatusChange).where(PetStatusChange.to_status == 'foster')
+                       .values(changed_at=datetime.utcnow() - timedelta(days=12)))
+    db.session.commit()
+
+    pet.status = 'available'
+    db.session.commit()
+    pet.status = 'adopted'
+    db.session.commit()
+
+    assert history(pet) == [(None, 'available'), ('available', 'foster'),
+                            ('foster', 'available'), ('available', 'adopted')]
+    assert total('foster') == (1, 12)
+    assert total('adoption') == (1, 30)
+    assert total('adoption', 'breed', 'Beagle') == (1, 30)
+    assert total('adoption', 'age_band', '1-2') == (1, 30)
+    assert total('adoption', 'shelter', 'SH001') == (1, 30)
+
+    # Saving without a status change records nothing
+    pet.description = 'Adopted by a family'
+    db.session.commit()
+    assert len(history(pet)) == 4
+
+def test_routes_record_status_changes(client, admin_user, employee_user):
+    """Test that edit_pet, create_adoption and adopt_pet all reach the history"""
+    edited = add_pet(pet_name='Edited')
+    adopted_by_admin = add_pet(pet_name='Admin', breed='Tabby')
+    adopted_by_employee = add_pet(pet_name='Employee', breed='Tabby')
+
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    response = client.post(f'/admin/pets/{edited.pet_id}/edit', json={
+        'pet_name': 'Edited', 'breed': 'Beagle', 'age': 2, 'gender': 'male', 'status': 'foster'
+    })
+    assert response.get_json()['success'] is True
+    response = client.post('/admin/adoptions/create', json={
+        'adopt_name': 'Ann', 'adopt_email': 'ann@example.com', 'pet_id': adopted_by_admin.pet_id
+    })
+    assert response.get_json()['success'] is True
+
+    client.get('/logout')
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    client.post(f'/employee/adopt/{adopted_by_employee.pet_id}', json={
+        'adopt_name': 'Bob', 'adopt_email': 'bob@example.com'
+    })
+
+    assert history(edited)[-1] == ('available', 'foster')
+    assert history(adopted_by_admin)[-1] == ('available', 'adopted')
+    assert history(adopted_by_employee)[-1] == ('available', 'adopted')
+    change = PetStatusChange.query.filter_by(pet_id=adopted_by_employee.pet_id, to_status='adopted').one()
+    assert change.user_id == employee_user.id
+    assert total('adoption', 'breed', 'Tabby') == (2, 20)
+
+def test_backfill_seeds_core_writes(app):
+    """Test that pets inserted behind the ORM are seeded by the backfill and CLI"""
+    created_at = datetime(2024, 1, 1)
+    db.session.execute(db.insert(Pet), [
+        {'pet_id': 1, 'pet_name': 'Old', 'breed': 'Beagle', 'age': 4, 'gender': 'male',
+         'status': 'adopted', 'created_at': created_at},
+        {'pet_id': 2, 'pet_name': 'Waiting', 'breed': 'Beagle', 'age': 4, 'gender': 'male',
+         'status': 'available', 'created_at': created_at}
+    ])
+    db.session.execute(db.insert(Adoption), [
+        {'adopt_name': 'Ann', 'adopt_email': 'ann@example.com', 'pet_id': 1,
+         'date': created_at + timedelta(days=45)}
+    ])
+    db.session.commit()
+    assert PetStatusChange.query.count() == 0
+
+    assert backfill(batch_size=1) == 2
+    assert PetStatusChange.query.count() == 3
+    assert total('intake') == (2, 0)
+    assert total('adoption', 'age_band', '3-6') == (1, 45)
+
+    result = app.test_cli_runner().invoke(args=['backfill-status-history'])
+    assert 'Seeded the status history of 0 pets' in result.output
+    db.session.execute(PetStayTotal.__table__.delete())
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['rebuild-stay-totals'])
+    assert 'Rebuilt the stay totals from 3 status changes' in result.output
+    assert total('adoption') == (1, 45)
+
+def test_length_of_stay_report(client, admin_user):
+    """Test the funnel and averages served by the admin report"""
+    add_pet(days_ago=20).status = 'adopted'
+    add_pet(days_ago=10, breed='Tabby')
+    db.session.commit()
+    assert report()['adoption']['breed'] == [{'key': 'Beagle', 'count': 1, 'average_days': 20.0}]
+
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    data = client.get('/admin/reports/length-of-stay', headers={'Accept': 'application/json'}).get_json()
+    assert data['funnel'] == {'intake': 2, 'fostered': 0, 'adopted': 1, 'adoption_rate': 0.5}
+    assert data['stays']['adoption']['all'] == [{'key': None, 'count': 1, 'average_days': 20.0}]
+
+    response = client.get('/admin/reports/length-of-stay')
+    assert response.status_code == 200
+    assert 'Days from Intake to Adoption' in response.get_data(as_text=True)
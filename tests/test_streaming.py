@@ -0,0 +1,87 @@
+"""
+Test cases for streamed rendering of list pages
+"""
+
+from datetime import date
+
+from app import db
+from app.models import Pet, MedicalRecord
+from app.instrumentation import request_profiler
+
+def add_pets(count):
+    """Add count pets, each with one medical record"""
+    for i in range(count):
+        pet = Pet(pet_name=f'Pet {i}', breed='Beagle', age=2, gender='male')
+        db.session.add(pet)
+        db.session.flush()
+        db.session.add(MedicalRecord(pet_id=pet.pet_id, treatment_type='Checkup',
+                                     treat_date=date.today(), vaccines='Rabies' if i % 2 else None))
+    db.session.commit()
+
+def test_pets_list_is_streamed(app, client, admin_user):
+    """Test that the page arrives in several chunks with every row in it"""
+    app.config['STREAM_YIELD_PER'] = 10
+    app.config['STREAM_BUFFER_SIZE'] = 1024
+    add_pets(50)
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get('/admin/pets', buffered=False)
+    assert response.status_code == 200
+    assert response.content_length is None
+    chunks = list(response.response)
+    response.close()
+
+    assert len(chunks) > 1
+    body = b''.join(chunks).decode()
+    assert all(f'Pet {i}<' in body or f'Pet {i} ' in body for i in range(50))
+
+def test_flash_shown_once_on_streamed_page(client, admin_user):
+    """Test that a flash rendered by a streamed page is not shown again"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    client.post('/admin/pets/create', data={'pet_name': 'Rex', 'breed': 'Beagle', 'age': '2',
+                                            'gender': 'male'})
+
+    assert 'Pet created successfully!' in client.get('/admin/pets').get_data(as_text=True)
+    assert 'Pet created successfully!' not in client.get('/admin/pets').get_data(as_text=True)
+
+def test_streaming_disabled(app, client, admin_user):
+    """Test that the page is rendered in one piece when streaming is off"""
+    app.config['STREAM_LIST_PAGES'] = False
+    add_pets(3)
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get('/admin/pets')
+    assert response.status_code == 200
+    assert response.content_length == len(response.data)
+    assert b'Pet 2' in response.data
+
+def test_empty_list_page(client, admin_user):
+    """Test that the empty-state markup still renders from a streamed page"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    streamed = client.get('/admin/pets').data
+
+    client.application.config['STREAM_LIST_PAGES'] = False
+    rendered = client.get('/admin/pets').data
+
+    assert streamed == rendered
+
+def test_medical_records_summary(client, admin_user):
+    """Test that the summary cards come from the aggregate query"""
+    add_pets(4)
+    assert MedicalRecord.summary() == {'total': 4, 'pets': 4, 'with_vaccines': 2, 'with_donor': 0}
+
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    response = client.get('/admin/medical-records')
+    assert response.status_code == 200
+    assert b'Pet 3' in response.data
+
+def test_streamed_request_profiled_after_body(client, admin_user):
+    """Test that queries issued while streaming count towards the request"""
+    add_pets(5)
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    request_profiler.reset()
+
+    client.get('/admin/pets')
+    rows = {row['endpoint']: row for row in request_profiler.summary()}
+    assert rows['admin.pets_list']['requests'] == 1
+    assert rows['admin.pets_list']['avg_queries'] >= 2
@@ -0,0 +1,136 @@
+"""
+Test cases for the Jinja bytecode cache and fragment caching
+"""
+
+import os
+from datetime import datetime
+
+from app import create_app, db
+from app.models import Pet
+from app.template_cache import fragment_cache
+
+def render(app, source, **context):
+    """Render a template string through the app's environment"""
+    return app.jinja_env.from_string(source).render(**context)
+
+def test_fragment_rendered_once_per_key(app):
+    """Test that a cached fragment is reused until its key changes"""
+    source = "{% cache ('card', pet_id, version) %}{{ name }}{% endcache %}"
+
+    assert render(app, source, pet_id=1, version=1, name='Rex') == 'Rex'
+    # Same key: the stored markup is served, not the new context
+    assert render(app, source, pet_id=1, version=1, name='Max') == 'Rex'
+    # A new version re-renders
+    assert render(app, source, pet_id=1, version=2, name='Max') == 'Max'
+
+    stats = fragment_cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+
+def test_fragment_ttl_expires(app):
+    """Test that an entry past its ttl is rendered again"""
+    source = "{% cache 'key', ttl %}{{ name }}{% endcache %}"
+
+    assert render(app, source, ttl=-1, name='Rex') == 'Rex'
+    assert render(app, source, ttl=-1, name='Max') == 'Max'
+
+def test_fragment_cache_is_bounded(app):
+    """Test that the least recently used entries are evicted"""
+    app.config['FRAGMENT_CACHE_SIZE'] = 2
+    fragment_cache.init_app(app)
+    source = "{% cache key %}{{ key }}{% endcache %}"
+    for key in ('a', 'b', 'c'):
+        render(app, source, key=key)
+
+    assert fragment_cache.stats()['size'] == 2
+
+def test_fragment_cache_disabled(app):
+    """Test that the tag renders its body directly when disabled"""
+    app.config['FRAGMENT_CACHE_ENABLED'] = False
+    fragment_cache.init_app(app)
+    source = "{% cache 'key' %}{{ name }}{% endcache %}"
+
+    assert render(app, source, name='Rex') == 'Rex'
+    assert render(app, source, name='Max') == 'Max'
+
+def test_pet_card_refreshed_after_edit(client, admin_user):
+    """Test that editing a pet invalidates its cached card"""
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male')
+    db.session.add(pet)
+    db.session.commit()
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    assert b'Rex' in client.get('/admin/pets').data
+    assert b'Rex' in client.get('/admin/pets').data
+    assert fragment_cache.stats()['hits'] >= 1
+
+    client.post(f'/admin/pets/{pet.pet_id}/edit',
+                data={'pet_name': 'Rocky', 'breed': 'Beagle', 'age': '2', 'gender': 'male',
+                      'status': 'available'})
+    response = client.get('/admin/pets')
+    assert b'Rocky' in response.data
+    assert b'Rex' not in response.data
+
+def test_pet_card_not_reused_for_recycled_id(client, admin_user):
+    """Test that a new pet reusing a deleted pet's id gets its own card"""
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male')
+    db.session.add(pet)
+    db.session.commit()
+    pet_id = pet.pet_id
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    assert b'Rex' in client.get('/admin/pets').data
+
+    db.session.delete(pet)
+    db.session.commit()
+    # SQLite hands out the deleted id again, and the new pet starts at version 1
+    db.session.add(Pet(pet_id=pet_id, pet_name='Rocky', breed='Beagle', age=2, gender='male'))
+    db.session.commit()
+
+    response = client.get('/admin/pets')
+    assert b'Rocky' in response.data
+    assert b'Rex' not in response.data
+
+def test_employee_pet_card_not_reused_for_recycled_id(client, employee_user):
+    """Test that the employee list keys its cards on created_at as well"""
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male',
+              created_at=datetime(2024, 1, 1))
+    db.session.add(pet)
+    db.session.commit()
+    pet_id = pet.pet_id
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+    assert b'Rex' in client.get('/employee/pets').data
+    assert b'Rex' in client.get('/employee/adopt').data
+
+    db.session.delete(pet)
+    db.session.commit()
+    db.session.add(Pet(pet_id=pet_id, pet_name='Rocky', breed='Beagle', age=2, gender='male',
+                       created_at=datetime(2024, 1, 2)))
+    db.session.commit()
+
+    for url in ('/employee/pets', '/employee/adopt'):
+        response = client.get(url)
+        assert b'Rocky' in response.data
+        assert b'Rex' not in response.data
+
+def test_fragment_hits_counted_in_metrics(client, admin_user):
+    """Test that cache lookups show up in /metrics"""
+    db.session.add(Pet(pet_name='Rex', breed='Beagle', age=2, gender='male'))
+    db.session.commit()
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    client.get('/admin/pets')
+    client.get('/admin/pets')
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'cache_requests_total{cache="fragment",result="hit"}' in body
+    assert 'cache_requests_total{cache="fragment",result="miss"}' in body
+
+def test_bytecode_cache_written(tmp_path, monkeypatch):
+    """Test that compiled templates are persisted to the cache directory"""
+    monkeypatch.setenv('JINJA_BYTECODE_CACHE_DIR', str(tmp_path / 'jinja'))
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.test_request_context():
+        app.jinja_env.get_template('auth/login.html')
+
+    assert os.listdir(tmp_path / 'jinja')
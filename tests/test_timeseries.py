@@ -0,0 +1,105 @@
+"""
+Test cases for the downsampled time-series API
+"""
+
+from datetime import datetime, date, timedelta
+
+from app import db
+from app.models import Pet, Donation, Adoption
+from app.timeseries import lttb, aggregate
+
+def add_donation(amount, day):
+    db.session.add(Donation(amount=amount, donor_name='Jane', donor_email='jane@example.com',
+                            date=datetime.combine(day, datetime.min.time())))
+    db.session.commit()
+
+def test_lttb_keeps_ends_and_spikes():
+    """Test the downsampled series keeps its first, last and extreme points"""
+    points = [(i, 0.0) for i in range(1000)]
+    points[500] = (500, 100.0)
+    points[700] = (700, -50.0)
+
+    sampled = lttb(points, 20)
+    assert len(sampled) == 20
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert (500, 100.0) in sampled and (700, -50.0) in sampled
+    assert [x for x, _ in sampled] == sorted(x for x, _ in sampled)
+    assert lttb(points[:10], 20) == points[:10]
+
+def test_aggregate_buckets_and_zero_fills(app):
+    """Test donations are summed per week from the rollups with empty weeks filled"""
+    add_donation(10, date(2024, 1, 1))
+    add_donation(15, date(2024, 1, 7))
+    add_donation(20, date(2024, 1, 16))
+
+    assert aggregate('donations', date(2024, 1, 3), date(2024, 1, 21), 'week') == [
+        (date(2024, 1, 1), 25.0), (date(2024, 1, 8), 0.0), (date(2024, 1, 15), 20.0)
+    ]
+    assert aggregate('donations', date(2024, 1, 1), date(2024, 2, 1), 'month', 'count') == [
+        (date(2024, 1, 1), 3.0), (date(2024, 2, 1), 0.0)
+    ]
+
+def test_timeseries_endpoint(client, admin_user):
+    """Test the endpoint stays within its point budget over a long range"""
+    start = date(2020, 1, 1)
+    for offset in range(0, 1500, 7):
+        add_donation(10 + offset % 30, start + timedelta(days=offset))
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male', created_at=datetime(2024, 1, 2))
+    db.session.add(pet)
+    db.session.flush()
+    db.session.add(Adoption(adopt_name='Ann', adopt_email='ann@example.com', pet_id=pet.pet_id,
+                            date=datetime(2024, 1, 5)))
+    db.session.commit()
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    body = client.get('/api/v1/timeseries/donations?from=2020-01-01&to=2024-12-31&resolution=day'
+                      '&points=100').get_json()
+    assert body['buckets'] == 1827 and body['downsampled'] is True
+    assert len(body['points']) == 100
+    assert body['points'][0][0] == '2020-01-01' and body['points'][-1][0] == '2024-12-31'
+
+    body = client.get('/api/v1/timeseries/donations?from=2020-01-01&to=2024-12-31').get_json()
+    assert body['resolution'] == 'week' and body['downsampled'] is False
+
+    body = client.get('/api/v1/timeseries/adoptions?from=2024-01-01&to=2024-01-31').get_json()
+    assert body['resolution'] == 'day' and body['metric'] == 'count'
+    assert ['2024-01-05', 1.0] in body['points']
+
+    body = client.get('/api/v1/timeseries/intakes?from=2024-01-01&to=2024-03-31&resolution=month').get_json()
+    assert body['points'] == [['2024-01-01', 1.0], ['2024-02-01', 0.0], ['2024-03-01', 0.0]]
+
+    assert client.get('/api/v1/timeseries/vaccines').status_code == 404
+    assert client.get('/api/v1/timeseries/donations?from=2024-13-01').status_code == 400
+    assert client.get('/api/v1/timeseries/donations?points=1').status_code == 400
+    assert client.get('/api/v1/timeseries/adoptions?metric=amount').status_code == 400
+
+def test_timeseries_donations_admin_only(client, employee_user):
+    """Test that employees can chart adoptions and intakes but not donation amounts"""
+    add_donation(50, date(2024, 1, 10))
+    client.post('/login', data={'username': 'employee', 'password': 'password123'})
+
+    response = client.get('/api/v1/timeseries/donations?from=2024-01-01&to=2024-01-31')
+    assert response.status_code == 403
+    assert '50' not in response.get_data(as_text=True)
+    assert client.get('/api/v1/timeseries/donations?metric=count').status_code == 403
+    assert client.get('/api/v1/timeseries/adoptions?from=2024-01-01&to=2024-01-31').status_code == 200
+    assert client.get('/api/v1/timeseries/intakes?from=2024-01-01&to=2024-01-31').status_code == 200
+
+def test_timeseries_range_limits(client, admin_user):
+    """Test the calendar's edges and over-long ranges give 200 or 400, never 500"""
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    body = client.get('/api/v1/timeseries/intakes?to=9999-12-31').get_json()
+    assert body['points'][-1][0] == '9999-12-31'
+    body = client.get('/api/v1/timeseries/donations?from=9999-12-01&to=9999-12-31&resolution=month').get_json()
+    assert body['points'] == [['9999-12-01', 0.0]]
+    body = client.get('/api/v1/timeseries/adoptions?from=9999-12-20&to=9999-12-31&resolution=week').get_json()
+    assert body['points'][-1][0] == '9999-12-27'
+    assert client.get('/api/v1/timeseries/intakes?to=0001-01-05').status_code == 200
+
+    response = client.get('/api/v1/timeseries/donations?from=0001-01-01&to=9999-12-01&resolution=day')
+    assert response.status_code == 400
+    assert 'coarser resolution' in response.get_json()['error']
+    assert client.get('/api/v1/timeseries/donations?from=0001-01-01&to=9999-12-01').status_code == 400
+    assert client.get('/api/v1/timeseries/donations?from=1900-01-01&to=2024-12-31').get_json()['resolution'] == 'month'
+
@@ -0,0 +1,134 @@
+"""
+Test cases for the normalized vaccinations table
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from app import db
+from app.models import Pet, MedicalRecord, Vaccination
+from app.vaccinations import parse_vaccines, backfill
+
+@pytest.fixture
+def pet(app):
+    """Create a pet without medical records"""
+    pet = Pet(pet_name='Rex', breed='Beagle', age=2, gender='male')
+    db.session.add(pet)
+    db.session.commit()
+    return pet
+
+def add_record(pet, treat_date, vaccines=None):
+    record = MedicalRecord(pet_id=pet.pet_id, treatment_type='Vaccination', treat_date=treat_date,
+                           vaccines=vaccines)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+def vaccinations():
+    return [(v.pet_id, v.vaccine_code, v.given_date, v.due_date)
+            for v in Vaccination.query.order_by(Vaccination.given_date, Vaccination.vaccine_code)]
+
+def test_parse_vaccines():
+    """Test parsing the free-text vaccines field"""
+    assert parse_vaccines('Rabies, DHPP') == ['RABIES', 'DHPP']
+    assert parse_vaccines('rabies and  Kennel Cough; rabies') == ['RABIES', 'BORDETELLA']
+    assert parse_vaccines('First round of puppy vaccines') == ['PUPPY_SERIES']
+    assert parse_vaccines('Canine Influenza') == ['CANINE_INFLUENZA']
+    assert parse_vaccines('None') == []
+    assert parse_vaccines('') == []
+    assert parse_vaccines(None) == []
+
+def test_rows_follow_record_writes(pet):
+    """Test that creating, editing and deleting records rewrites the rows"""
+    record = add_record(pet, date(2024, 1, 10), vaccines='Rabies, Bordetella')
+    assert vaccinations() == [
+        (pet.pet_id, 'BORDETELLA', date(2024, 1, 10), date(2024, 1, 10) + timedelta(days=180)),
+        (pet.pet_id, 'RABIES', date(2024, 1, 10), date(2024, 1, 10) + timedelta(days=365))
+    ]
+
+    record.vaccines = 'DHPP'
+    db.session.commit()
+    assert [row[1] for row in vaccinations()] == ['DHPP']
+
+    record.vaccines = 'None'
+    db.session.commit()
+    assert vaccinations() == []
+
+    record.vaccines = 'Rabies'
+    db.session.commit()
+    db.session.delete(record)
+    db.session.commit()
+    assert vaccinations() == []
+
+def test_rows_follow_bulk_delete(pet):
+    """Test that Query.delete() on records also removes their vaccinations"""
+    add_record(pet, date(2024, 1, 10), vaccines='Rabies')
+    add_record(pet, date(2024, 2, 10), vaccines='DHPP')
+
+    MedicalRecord.query.filter(MedicalRecord.treat_date > date(2024, 2, 1)).delete()
+    db.session.commit()
+    assert [row[1] for row in vaccinations()] == ['RABIES']
+    # The medical summary's bulk-delete handler still ran
+    assert pet.medical_record_count == 1
+
+def test_rolled_back_records_leave_no_rows(pet):
+    """Test that a rolled-back insert writes no vaccinations"""
+    db.session.add(MedicalRecord(pet_id=pet.pet_id, treatment_type='Vaccination',
+                                 treat_date=date(2024, 1, 1), vaccines='Rabies'))
+    db.session.flush()
+    db.session.rollback()
+
+    assert vaccinations() == []
+
+def test_backfill_parses_core_writes(app, pet):
+    """Test that rows inserted behind the ORM are parsed by the backfill and CLI"""
+    db.session.execute(db.insert(MedicalRecord), [
+        {'pet_id': pet.pet_id, 'treatment_type': 'Vaccination', 'treat_date': date(2024, 5, 1),
+         'vaccines': 'Rabies, DHPP'},
+        {'pet_id': pet.pet_id, 'treatment_type': 'Checkup', 'treat_date': date(2024, 4, 1),
+         'vaccines': 'None'}
+    ])
+    db.session.commit()
+    assert vaccinations() == []
+
+    assert backfill(batch_size=1) == 2
+    assert len(vaccinations()) == 2
+
+    result = app.test_cli_runner().invoke(args=['backfill-vaccinations', '--batch-size', '10'])
+    assert 'Wrote 2 vaccinations' in result.output
+    assert len(vaccinations()) == 2
+
+def test_delete_pet_removes_vaccinations(client, admin_user, pet):
+    """Test that delete_pet's bulk delete of records also clears vaccinations"""
+    add_record(pet, date(2024, 1, 10), vaccines='Rabies')
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.post(f'/admin/pets/{pet.pet_id}/delete', json={})
+    assert response.get_json() == {'success': True}
+    assert vaccinations() == []
+
+def test_vaccinations_due(client, admin_user, pet):
+    """Test the due endpoint only reports the latest dose per pet and vaccine"""
+    other = Pet(pet_name='Mia', breed='Tabby', age=1, gender='female')
+    db.session.add(other)
+    db.session.commit()
+    today = date.today()
+    add_record(pet, today - timedelta(days=400), vaccines='Rabies')
+    add_record(pet, today - timedelta(days=362), vaccines='Rabies, DHPP')
+    add_record(other, today - timedelta(days=500), vaccines='Rabies')
+    add_record(other, today - timedelta(days=10), vaccines='Rabies')
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    response = client.get('/admin/vaccinations/due?vaccine=rabies', headers={'Accept': 'application/json'})
+    due = response.get_json()['due']
+    assert [(row['pet_name'], row['vaccine_code']) for row in due] == [('Rex', 'RABIES')]
+    assert due[0]['due_date'] == (today + timedelta(days=3)).isoformat()
+
+    response = client.get('/admin/vaccinations/due?within_days=0', headers={'Accept': 'application/json'})
+    assert response.get_json()['due'] == []
+
+    response = client.get('/admin/vaccinations/due?within_days=soon', headers={'Accept': 'application/json'})
+    assert response.status_code == 400
+
+    body = client.get('/admin/vaccinations/due').get_data(as_text=True)
+    assert 'RABIES' in body and 'DHPP' in body and 'Mia' not in body